@@ -2,15 +2,21 @@
 
 import os
 import sys
+import json
 import datetime
+import tempfile
 import unittest
 
+import numpy as np
+
 
 # Add the parent directory of the terraform module to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 # Correct the import statement to match the actual structure
 from terraform.src.lambda_function import lambda_handler
+from terraform.src import recommend_function
+from src.compact_model import CompactCFModel
 
 
 class TestLambdaHandler(unittest.TestCase):
@@ -34,5 +40,90 @@ class TestLambdaHandler(unittest.TestCase):
 
         self.assertEqual(result, expected_training_job_name)
 
+
+class TestRecommendHandler(unittest.TestCase):
+    """
+    A unittest class to test the recommendation Lambda handler.
+
+    A tiny compact model with 3 users and 4 items is written to a temporary
+    directory and served through MODEL_DIR.
+    """
+    def setUp(self):
+        self.model_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        arrays = {
+            'user_ids': np.array([10, 20, 30]),
+            'item_ids': np.array([1, 2, 3, 4]),
+            'user_factors': np.array([[1.0], [-1.0], [0.0]], dtype=np.float32),
+            'item_factors': np.array([[0.1], [0.2], [0.3], [0.4]], dtype=np.float32),
+            'user_bias': np.zeros(3, dtype=np.float32),
+            'item_bias': np.zeros(4, dtype=np.float32),
+            'seen_indptr': np.array([0, 1, 1, 1]),
+            'seen_indices': np.array([3], dtype=np.int32),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(self.model_dir.name, f'{name}.npy'), array)
+        with open(os.path.join(self.model_dir.name, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'format_version': 1, 'global_mean': 3.0, 'rating_scale': [1, 5]}, f)
+        os.environ['MODEL_DIR'] = self.model_dir.name
+        recommend_function._STATE.clear()  # pylint: disable=protected-access
+
+    def tearDown(self):
+        del os.environ['MODEL_DIR']
+        recommend_function._STATE.clear()  # pylint: disable=protected-access
+        self.model_dir.cleanup()
+
+    def test_batched_recommendations(self):
+        """
+        Verifies that every user in the batch is ranked and seen items are excluded.
+        """
+        result = recommend_function.lambda_handler({'user_ids': [10, 20], 'top_n': 2}, None)
+        recommendations = result['recommendations']
+
+        self.assertEqual([r['user_id'] for r in recommendations], [10, 20])
+        self.assertEqual(recommendations[0]['items'], [3, 2])
+        self.assertEqual(recommendations[1]['items'], [1, 2])
+        self.assertAlmostEqual(recommendations[0]['scores'][0], 3.3, places=5)
+
+    def test_matches_compact_model(self):
+        """
+        Verifies that the handler serves exactly what CompactCFModel.recommend ranks.
+        """
+        result = recommend_function.lambda_handler({'user_ids': [10, 20, 30], 'top_n': 3}, None)
+        expected = CompactCFModel.load(self.model_dir.name).recommend([10, 20, 30], top_n=3)
+
+        for recommendation, (items, scores) in zip(result['recommendations'], expected):
+            self.assertEqual(recommendation['items'], items.tolist())
+            self.assertEqual(recommendation['scores'], scores.tolist())
+
+    def test_unknown_user(self):
+        """
+        Verifies that unknown users get an empty recommendation list.
+        """
+        result = recommend_function.lambda_handler({'user_id': 99}, None)
+        self.assertEqual(result['recommendations'], [{'user_id': 99, 'items': [], 'scores': []}])
+
+    def test_warm_invocation_reuses_model(self):
+        """
+        Verifies that the model is loaded once and cached across invocations.
+        """
+        first = recommend_function.lambda_handler({'user_ids': [30]}, None)
+        model = recommend_function._STATE['model']  # pylint: disable=protected-access
+        second = recommend_function.lambda_handler({'user_ids': [30]}, None)
+
+        self.assertTrue(first['cold_start'])
+        self.assertFalse(second['cold_start'])
+        self.assertIs(recommend_function._STATE['model'], model)  # pylint: disable=protected-access
+
+    def test_init_within_budget(self):
+        """
+        Verifies that import and model load times are reported and fit the init budget.
+        """
+        timings = recommend_function.lambda_handler({'user_ids': [10]}, None)['timings']
+
+        for key in ('import_ms', 'model_load_ms', 'init_ms', 'request_ms'):
+            self.assertIn(key, timings)
+        self.assertTrue(timings['within_budget'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+"""Local stand-in for a SageMaker endpoint, for testing and load-testing the endpoint invoker."""
+
+import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+from botocore.config import Config
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.test import EndpointInvoker, RECORDIO_MAGIC, split_recordio  # pylint: disable=wrong-import-position
+
+
+class LocalEndpointHandler(BaseHTTPRequestHandler):
+    """
+    HTTP stand-in for the SageMaker runtime `InvokeEndpoint` API.
+
+    Returns one prediction per record and throttles a configurable fraction of requests. The score
+    of a record is the number in its first 8 bytes (see make_recordio_body), so callers can check
+    that reassembled predictions are in record order.
+    """
+    protocol_version = 'HTTP/1.1'
+    throttle_rate = 0.0
+    latency = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.throttle_rate:
+            self._reply(400, {'message': 'Rate exceeded'}, error_type='ThrottlingException')
+            return
+        scores = [float(record_id(record)) for record in split_recordio(body, 1)]
+        self._reply(200, {'predictions': [{'score': score, 'predicted_label': float(score % 2)} for score in scores]})
+
+    def _reply(self, status, payload, error_type=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if error_type:
+            self.send_header('x-amzn-ErrorType', error_type)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_endpoint(port=0, throttle_rate=0.0, latency=0.0):
+    """
+    Starts the local endpoint stand-in on a background thread and returns the server.
+    """
+    handler = type('Handler', (LocalEndpointHandler,), {'throttle_rate': throttle_rate, 'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def local_client(server, max_concurrency=8):
+    """
+    A sagemaker-runtime client pointed at the local endpoint, making a single attempt per call.
+    """
+    return boto3.client(
+        'sagemaker-runtime',
+        region_name='us-east-1',
+        endpoint_url=f'http://127.0.0.1:{server.server_address[1]}',
+        aws_access_key_id='local',
+        aws_secret_access_key='local',
+        config=Config(max_pool_connections=max_concurrency, retries={'total_max_attempts': 1}),
+    )
+
+
+def make_recordio_body(n_records, record_size=64, first_id=0, parts=1):
+    """
+    Builds a recordio body of `n_records` opaque records, enough for framing-level tests.
+
+    Each record starts with its id (`first_id`, `first_id + 1`, ...) as a little-endian uint64.
+    With `parts` > 1 every record is written as that many frames with continuation flags.
+    """
+    frames = []
+    for i in range(n_records):
+        record = struct.pack('<Q', first_id + i).ljust(record_size, b'\x00')
+        if parts == 1:
+            pieces, flags = [record], [0]
+        else:
+            size = -(-len(record) // parts)
+            pieces = [record[start:start + size] for start in range(0, len(record), size)]
+            flags = [1] + [2] * (len(pieces) - 2) + [3]
+        for piece, flag in zip(pieces, flags):
+            frames.append(struct.pack('<II', RECORDIO_MAGIC, len(piece) | flag << 29) + piece
+                          + b'\x00' * (-len(piece) % 4))
+    return b''.join(frames)
+
+
+def record_id(record):
+    """
+    Id written by make_recordio_body into a single framed record.
+    """
+    return struct.unpack_from('<Q', record, 8)[0]
+
+
+def run_local_load_test(n_requests=2000, max_concurrency=16, throttle_rate=0.05):
+    """
+    Load-tests the invoker against the local HTTP stand-in and prints requests/second.
+    """
+    server = start_local_endpoint(throttle_rate=throttle_rate, latency=0.002)
+    invoker = EndpointInvoker('local-endpoint', max_concurrency=max_concurrency,
+                              client=local_client(server, max_concurrency))
+    try:
+        predictions = invoker.predict(make_recordio_body(5000))
+        if [prediction['score'] for prediction in predictions] != list(range(5000)):
+            raise AssertionError("Split request predictions came back out of record order")
+        print(f"Split request returned {len(predictions)} predictions in record order")
+        stats = invoker.load_test(make_recordio_body(100), n_requests=n_requests)
+        print(f"{stats['requests_per_s']:.1f} requests/s, p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+        return stats
+    finally:
+        invoker.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    run_local_load_test()
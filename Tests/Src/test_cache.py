@@ -0,0 +1,112 @@
+"""Unit tests for the stage result cache."""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.cache import StageCache, cached_stage, fingerprint, trainset_ratings  # pylint: disable=wrong-import-position
+
+
+class TestFingerprint(unittest.TestCase):
+    """
+    A unittest class for content hashing of stage inputs.
+    """
+    def test_equal_content_equal_fingerprint(self):
+        """
+        Verifies that equal frames and arrays hash alike and a changed cell changes the hash.
+        """
+        df = pd.DataFrame({'movie_id': [1, 2], 'genre_names': [['Drama'], ['Comedy', 'Drama']]})
+        self.assertEqual(fingerprint(df, np.arange(3)), fingerprint(df.copy(), np.arange(3)))
+        changed = df.copy()
+        changed.loc[1, 'movie_id'] = 3
+        self.assertNotEqual(fingerprint(df), fingerprint(changed))
+
+    def test_objects_need_a_key(self):
+        """
+        Verifies that mutable objects are rejected instead of being hashed by their attributes.
+        """
+        class Model:  # pylint: disable=too-few-public-methods
+            def __init__(self):
+                self.mean = None
+
+        with self.assertRaises(TypeError):
+            fingerprint(Model())
+
+    def test_trainset_key_ignores_lazy_attributes(self):
+        """
+        Verifies that a Trainset's key does not change when it computes its global mean.
+        """
+        from surprise import Dataset, Reader  # pylint: disable=import-outside-toplevel
+        ratings = pd.DataFrame({'userId': [1, 1, 2], 'movieId': [10, 20, 10], 'rating': [4.0, 3.0, 5.0]})
+        trainset = Dataset.load_from_df(ratings, Reader(rating_scale=(1, 5))).build_full_trainset()
+
+        before = fingerprint(trainset_ratings(trainset))
+        self.assertEqual(trainset.global_mean, 4.0)
+        self.assertEqual(fingerprint(trainset_ratings(trainset)), before)
+
+
+class TestCachedStage(unittest.TestCase):
+    """
+    A unittest class for cache hits and misses of decorated stages.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.calls = []
+        self.env = mock.patch.dict(os.environ, {'RECOMM_CACHE': '1'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp_dir.cleanup()
+
+    def _stage(self, **options):
+        @cached_stage(name='double', cache=StageCache(self.tmp_dir.name), **options)
+        def double(values):
+            self.calls.append(values)
+            return values * 2
+        return double
+
+    def test_hit_and_miss(self):
+        """
+        Verifies that equal inputs are served from the cache and changed inputs are recomputed.
+        """
+        double = self._stage()
+        np.testing.assert_array_equal(double(np.arange(3)), [0, 2, 4])
+        np.testing.assert_array_equal(double(np.arange(3)), [0, 2, 4])
+        double(np.arange(4))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_changed_input_file_misses(self):
+        """
+        Verifies that a stage reading a file is recomputed when the file content changes.
+        """
+        path = os.path.join(self.tmp_dir.name, 'input.csv')
+        double = self._stage(files=lambda values: [path])
+        for mtime, content in enumerate(('a', 'a', 'b'), start=1):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            # Digests are memoized on size and mtime; give every write its own mtime
+            os.utime(path, ns=(mtime, mtime))
+            double(np.arange(2))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_disabled(self):
+        """
+        Verifies that RECOMM_CACHE=0 always runs the stage.
+        """
+        double = self._stage()
+        with mock.patch.dict(os.environ, {'RECOMM_CACHE': '0'}):
+            double(np.arange(3))
+            double(np.arange(3))
+        self.assertEqual(len(self.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
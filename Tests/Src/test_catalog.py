@@ -0,0 +1,128 @@
+"""Unit tests for the compact movie catalog."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.catalog import CompactCatalog, StringColumn, DictionaryColumn, ListColumn, memory_report  # pylint: disable=wrong-import-position
+
+
+def processed_frame():
+    """
+    Three preprocessed movies with non-ASCII text, a missing director and empty lists.
+    """
+    return pd.DataFrame({
+        'movie_id': [19995, 285, 206647],
+        'title': ['Avatar', 'Amélie', ''],
+        'overview': ['Blue people', 'Un café à Paris', 'Bond returns'],
+        'director': ['James Cameron', np.nan, 'Sam Mendes'],
+        'original_language': ['en', 'fr', 'en'],
+        'genre_names': [['Action', 'Science Fiction'], ['Comedy', 'Romance'], ['Action']],
+        'cast_names': [['Sam Worthington', 'Zoe Saldana'], ['Audrey Tautou'], []],
+        'keyword_names': [['future'], [], ['spy']],
+        'language': [['English'], ['Français'], ['English', 'Italiano']],
+        'production_company_names': [['Lightstorm'], [], ['Eon', 'Columbia']],
+        'year': [2009, 2001, 2015],
+        'runtime': [162.0, 122.0, 148.0],
+        'popularity': [150.4, 21.5, 107.4],
+        'vote_average': [7.2, 7.8, 6.3],
+        'vote_count': [11800, 3700, 4466],
+        'crew': [[{'job': 'Director'}], [], []],
+    })
+
+
+class TestCompactCatalog(unittest.TestCase):
+    """
+    Verifies that the catalog encodes and decodes the catalog columns losslessly.
+    """
+
+    def assert_frame_round_trip(self, catalog):
+        frame = processed_frame()
+        decoded = catalog.to_frame()
+        self.assertNotIn('crew', decoded.columns)
+        for name in ('title', 'overview', 'original_language', 'genre_names', 'cast_names', 'keyword_names',
+                     'language', 'production_company_names', 'movie_id', 'year', 'vote_count'):
+            self.assertEqual(decoded[name].tolist(), frame[name].tolist(), name)
+        self.assertEqual(decoded['director'][[0, 2]].tolist(), ['James Cameron', 'Sam Mendes'])
+        self.assertTrue(pd.isna(decoded['director'][1]))
+        np.testing.assert_allclose(decoded['popularity'], frame['popularity'], rtol=1e-6)
+
+    def test_column_encodings(self):
+        """
+        Verifies the column types and the narrow dtypes of codes and numbers.
+        """
+        catalog = CompactCatalog.from_frame(processed_frame())
+        self.assertIsInstance(catalog['title'], StringColumn)
+        self.assertIsInstance(catalog['director'], DictionaryColumn)
+        self.assertIsInstance(catalog['genre_names'], ListColumn)
+        self.assertEqual(catalog['director'].codes.dtype, np.int8)
+        self.assertEqual(catalog['year'].dtype, np.int16)
+        # 'Action' appears twice but is stored once
+        self.assertEqual(catalog['genre_names'].values.dictionary.to_list().count('Action'), 1)
+
+    def test_frame_round_trip(self):
+        """
+        Verifies that to_frame returns the values from_frame was given.
+        """
+        catalog = CompactCatalog.from_frame(processed_frame())
+        self.assert_frame_round_trip(catalog)
+        self.assertEqual(catalog.row(1)['title'], 'Amélie')
+        self.assertEqual(catalog.row(2)['cast_names'], [])
+
+    def test_index(self):
+        """
+        Verifies that movie ids map to their rows and unknown ids raise KeyError.
+        """
+        catalog = CompactCatalog.from_frame(processed_frame())
+        self.assertEqual(catalog.index(206647), 2)
+        self.assertEqual(catalog['title'][catalog.index(285)], 'Amélie')
+        with self.assertRaises(KeyError):
+            catalog.index(1)
+
+    def test_save_load_round_trip(self):
+        """
+        Verifies that a saved catalog loads memory-mapped with the same contents.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            CompactCatalog.from_frame(processed_frame()).save(tmp_dir)
+            catalog = CompactCatalog.load(tmp_dir)
+            self.assertIsInstance(catalog['title'].data, np.memmap)
+            self.assertEqual(len(catalog), 3)
+            self.assert_frame_round_trip(catalog)
+            del catalog
+
+    def test_memory_report(self):
+        """
+        Verifies that the report counts nested objects and finds the catalog smaller.
+        """
+        frame = processed_frame()
+        catalog = CompactCatalog.from_frame(frame)
+        report = memory_report(frame, catalog)
+        self.assertEqual(report['movies'], 3)
+        self.assertEqual(report['catalog_bytes'], catalog.nbytes)
+        self.assertGreater(report['frame_bytes'], frame.memory_usage(deep=True).sum())
+        self.assertGreater(report['reduction_same_columns'], 1)
+        self.assertNotIn('reduction_with_kept_frame', report)
+
+    def test_memory_report_with_kept_frame(self):
+        """
+        Verifies that the reduction counts the columns the frame keeps next to the catalog.
+        """
+        frame = processed_frame()
+        catalog = CompactCatalog.from_frame(frame)
+        kept = frame[['movie_id', 'genre_names']].copy()
+        report = memory_report(frame, catalog, kept)
+        self.assertGreater(report['kept_frame_bytes'], 0)
+        self.assertAlmostEqual(report['reduction_with_kept_frame'],
+                               report['frame_bytes'] / (report['kept_frame_bytes'] + catalog.nbytes))
+        self.assertLess(report['reduction_with_kept_frame'], report['reduction'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Unit tests for the compact CF model export."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from surprise import Dataset, Reader, SVD, SVDpp
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.compact_model import CompactCFModel, benchmark_load  # pylint: disable=wrong-import-position
+
+
+def fitted(algo_class, **params):
+    """
+    A Surprise model fitted on 600 random ratings of 40 users and 30 items.
+    """
+    rng = np.random.default_rng(0)
+    ratings = pd.DataFrame({'userId': rng.integers(1, 41, 600), 'movieId': rng.integers(100, 130, 600),
+                            'rating': rng.integers(1, 6, 600)}).drop_duplicates(['userId', 'movieId'])
+    trainset = Dataset.load_from_df(ratings, Reader(rating_scale=(1, 5))).build_full_trainset()
+    algo = algo_class(n_factors=4, n_epochs=5, random_state=0, **params)
+    algo.fit(trainset)
+    return algo
+
+
+class TestCompactCFModel(unittest.TestCase):
+    """
+    Verifies that the compact export scores like the Surprise model it comes from.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.algo = fitted(SVDpp)
+        cls.model = CompactCFModel.from_surprise(cls.algo)
+
+    def test_predict_matches_surprise(self):
+        """
+        Verifies that estimates match Surprise for known and unknown users and items.
+        """
+        users = [1, 5, 40, 999, 1]
+        items = [100, 129, 115, 100, 999]
+        expected = [self.algo.predict(user, item).est for user, item in zip(users, items)]
+        np.testing.assert_allclose(self.model.predict(users, items), expected, atol=1e-4)
+
+    def test_unbiased_svd_matches_surprise(self):
+        """
+        Verifies that models fitted with biased=False score without biases and fall back to the trainset mean.
+        """
+        algo = fitted(SVD, biased=False)
+        model = CompactCFModel.from_surprise(algo)
+        users, items = [1, 2, 999, 1], [100, 101, 100, 999]
+        expected = [algo.predict(user, item).est for user, item in zip(users, items)]
+        # Surprise cannot score the unknown user and item and falls back to the trainset mean
+        self.assertAlmostEqual(expected[2], algo.trainset.global_mean)
+        np.testing.assert_allclose(model.predict(users, items), expected, atol=1e-4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            np.testing.assert_allclose(CompactCFModel.load(model.save(tmp_dir)).predict(users, items), expected,
+                                       atol=1e-4)
+
+    def test_recommend_matches_surprise_ranking(self):
+        """
+        Verifies that recommend returns Surprise's top unseen items, best first.
+        """
+        trainset = self.algo.trainset
+        for user_id in (1, 7, 33):
+            seen = {item for item, _ in trainset.ur[trainset.to_inner_uid(user_id)]}
+            estimates = {trainset.to_raw_iid(item): self.algo.predict(user_id, trainset.to_raw_iid(item)).est
+                         for item in trainset.all_items() if item not in seen}
+            items, scores = self.model.recommend([user_id], top_n=5)[0]
+
+            self.assertEqual(len(items), min(5, len(estimates)))
+            self.assertTrue(set(items).isdisjoint(trainset.to_raw_iid(item) for item in seen))
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+            np.testing.assert_allclose(scores, [estimates[item] for item in items], atol=1e-4)
+            np.testing.assert_allclose(scores, sorted(estimates.values(), reverse=True)[:len(items)], atol=1e-4)
+
+    def test_recommend_unknown_user(self):
+        """
+        Verifies that unknown users get empty recommendations without affecting the rest of the batch.
+        """
+        (unknown_items, unknown_scores), (items, _) = self.model.recommend([999, 1], top_n=3)
+        self.assertEqual(len(unknown_items), 0)
+        self.assertEqual(len(unknown_scores), 0)
+        self.assertEqual(len(items), 3)
+
+    def test_string_ids_are_not_truncated(self):
+        """
+        Verifies that an unknown id is not matched to a known id that is a prefix of it.
+        """
+        arrays = {
+            'user_ids': np.array(['ann', 'bob']),
+            'item_ids': np.array(['m1', 'm2']),
+            'user_factors': np.ones((2, 1), dtype=np.float32),
+            'item_factors': np.ones((2, 1), dtype=np.float32),
+            'user_bias': np.array([1.0, 0.0], dtype=np.float32),
+            'item_bias': np.zeros(2, dtype=np.float32),
+            'seen_indptr': np.zeros(3, dtype=np.int64),
+            'seen_indices': np.zeros(0, dtype=np.int32),
+        }
+        model = CompactCFModel(arrays, 2.0, (1, 5))
+        np.testing.assert_allclose(model.predict(['ann', 'annabel'], ['m1', 'm1']), [4.0, 2.0])
+        self.assertEqual(len(model.recommend(['annabel'])[0][0]), 0)
+
+    def test_empty_model(self):
+        """
+        Verifies that a model without users or items treats every id as unknown.
+        """
+        arrays = {name: getattr(self.model, name)[:0] for name in ('user_ids', 'item_ids', 'user_factors',
+                                                                  'item_factors', 'user_bias', 'item_bias',
+                                                                  'seen_indices')}
+        arrays['seen_indptr'] = np.zeros(1, dtype=np.int64)
+        model = CompactCFModel(arrays, 3.0, (1, 5))
+        np.testing.assert_allclose(model.predict([1], [100]), [3.0])
+        self.assertEqual(len(model.recommend([1])[0][0]), 0)
+
+    def test_save_load_round_trip(self):
+        """
+        Verifies that a saved model loads memory-mapped and scores identically.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            loaded = CompactCFModel.load(self.model.save(tmp_dir))
+            self.assertIsInstance(loaded.user_factors, np.memmap)
+            self.assertEqual(loaded.rating_scale, self.model.rating_scale)
+            np.testing.assert_array_equal(loaded.predict([1, 2], [100, 101]), self.model.predict([1, 2], [100, 101]))
+            for (items, scores), (expected_items, expected_scores) in zip(loaded.recommend([1, 2]),
+                                                                          self.model.recommend([1, 2])):
+                np.testing.assert_array_equal(items, expected_items)
+                np.testing.assert_array_equal(scores, expected_scores)
+
+    def test_benchmark_load(self):
+        """
+        Verifies that both formats are measured in fresh interpreters and report the same fields.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = benchmark_load(self.algo, tmp_dir, user_id=1, top_n=5)
+        for fmt in ('pickle', 'compact'):
+            self.assertEqual(set(results[fmt]), {'load_s', 'first_score_s', 'rss_delta_kb', 'size_bytes'})
+
+
+if __name__ == '__main__':
+    unittest.main()
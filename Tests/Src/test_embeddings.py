@@ -0,0 +1,85 @@
+"""Unit tests for the LSA movie embeddings."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.embeddings import (fit_lsa_embeddings, embedding_similarity, top_k_neighbors, neighbor_overlap,  # pylint: disable=wrong-import-position
+                            save_embeddings, load_embeddings)
+
+
+def tfidf_like(n_movies=120, n_terms=400, seed=0):
+    """
+    A random sparse matrix with L2-normalized rows, like TfidfVectorizer output.
+    """
+    matrix = sp.random(n_movies, n_terms, density=0.05, random_state=seed, format='csr', dtype=np.float64)
+    return normalize(matrix + sp.eye(n_movies, n_terms, format='csr'))
+
+
+class TestLsaEmbeddings(unittest.TestCase):
+    """
+    Verifies the embedding dimensions and the neighbors computed from them.
+    """
+
+    def test_dimensions_and_normalization(self):
+        """
+        Verifies that embeddings are float32 unit rows of the requested dimension, capped by the matrix shape.
+        """
+        features = tfidf_like()
+        _, embeddings = fit_lsa_embeddings(features, 16)
+        self.assertEqual(embeddings.shape, (120, 16))
+        self.assertEqual(embeddings.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1, atol=1e-5)
+
+        _, capped = fit_lsa_embeddings(features[:10], 64)
+        self.assertEqual(capped.shape, (10, 9))
+
+    def test_top_k_matches_full_similarity(self):
+        """
+        Verifies that blockwise top-k neighbors equal the ranking of the full similarity matrix.
+        """
+        _, embeddings = fit_lsa_embeddings(tfidf_like(), 16)
+        indices, scores = top_k_neighbors(embeddings, k=5, batch_size=7)
+
+        similarity = embedding_similarity(embeddings)
+        np.fill_diagonal(similarity, -np.inf)
+        expected = -np.sort(-similarity, axis=1)[:, :5]
+        np.testing.assert_allclose(scores, expected, atol=1e-6)
+        np.testing.assert_allclose(np.take_along_axis(similarity, indices, axis=1), expected, atol=1e-6)
+        self.assertFalse((indices == np.arange(120)[:, None]).any())
+
+    def test_full_rank_embeddings_keep_every_neighbor(self):
+        """
+        Verifies that overlap@k is 1 when the embeddings span the whole matrix, and lower with fewer dimensions.
+        """
+        rng = np.random.default_rng(0)
+        topics = sp.random(8, 300, density=0.1, random_state=1, format='csr')
+        features = normalize(sp.csr_matrix(rng.random((60, 8)) ** 4) @ topics)
+        _, full = fit_lsa_embeddings(features, 8)
+        _, small = fit_lsa_embeddings(features, 2)
+        self.assertAlmostEqual(neighbor_overlap(features, full, k=5), 1.0)
+        self.assertLess(neighbor_overlap(features, small, k=5), 1.0)
+
+    def test_save_load_round_trip(self):
+        """
+        Verifies that saved embeddings load memory-mapped with their movie ids.
+        """
+        embeddings = np.random.default_rng(0).random((5, 3), dtype=np.float32)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_embeddings(tmp_dir, embeddings, [10, 20, 30, 40, 50])
+            loaded, movie_ids = load_embeddings(tmp_dir)
+            self.assertIsInstance(loaded, np.memmap)
+            np.testing.assert_array_equal(loaded, embeddings)
+            np.testing.assert_array_equal(movie_ids, [10, 20, 30, 40, 50])
+            del loaded
+
+
+if __name__ == '__main__':
+    unittest.main()
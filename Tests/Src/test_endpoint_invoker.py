@@ -0,0 +1,82 @@
+"""Unit tests for the pooled SageMaker endpoint invoker."""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.test import EndpointInvoker, split_recordio  # pylint: disable=wrong-import-position
+from Tests.Src.local_endpoint import local_client, make_recordio_body, record_id, start_local_endpoint  # pylint: disable=wrong-import-position
+
+
+def local_invoker(server, **kwargs):
+    """
+    An invoker talking to the local endpoint stand-in.
+    """
+    return EndpointInvoker('local-endpoint', client=local_client(server), **kwargs)
+
+
+class TestSplitRecordio(unittest.TestCase):
+    """
+    Verifies that recordio bodies are split on record boundaries.
+    """
+
+    def test_split_keeps_every_record_in_order(self):
+        """
+        Verifies that chunks hold at most records_per_request records and concatenate back to the body.
+        """
+        body = make_recordio_body(25, record_size=13)
+        chunks = split_recordio(body, 10)
+
+        self.assertEqual(b''.join(chunks), body)
+        self.assertEqual([len(split_recordio(chunk, 1)) for chunk in chunks], [10, 10, 5])
+        self.assertEqual([record_id(record) for record in split_recordio(body, 1)], list(range(25)))
+
+    def test_multi_part_records_stay_whole(self):
+        """
+        Verifies that a record split over several frames counts once and is never cut across chunks.
+        """
+        body = make_recordio_body(7, record_size=40, first_id=3, parts=3)
+        chunks = split_recordio(body, 2)
+
+        self.assertEqual(b''.join(chunks), body)
+        self.assertEqual([len(split_recordio(chunk, 1)) for chunk in chunks], [2, 2, 2, 1])
+        self.assertEqual([record_id(record) for record in split_recordio(body, 1)], list(range(3, 10)))
+
+    def test_invalid_magic(self):
+        """
+        Verifies that a body that is not recordio is rejected.
+        """
+        with self.assertRaises(ValueError):
+            split_recordio(b'\x00' * 16, 1)
+
+
+class TestEndpointInvoker(unittest.TestCase):
+    """
+    Verifies that split, concurrent and retried requests are reassembled in record order.
+    """
+
+    def setUp(self):
+        self.server = start_local_endpoint(throttle_rate=0.2, latency=0.001)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_predictions_in_record_order(self):
+        """
+        Verifies that every record's own score comes back at its position, despite throttled retries.
+        """
+        invoker = local_invoker(self.server, max_concurrency=8, records_per_request=50, max_retries=50,
+                                base_delay=0.001, max_delay=0.01)
+        try:
+            predictions = invoker.predict(make_recordio_body(1234, first_id=7))
+        finally:
+            invoker.close()
+
+        self.assertEqual([prediction['score'] for prediction in predictions], list(range(7, 1241)))
+
+
+if __name__ == '__main__':
+    unittest.main()
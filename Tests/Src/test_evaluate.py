@@ -0,0 +1,110 @@
+"""Unit tests for the batched FM endpoint evaluation."""
+
+import io
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+try:
+    import sagemaker.amazon.common as smac
+    from src.evaluate import (serialize_batch, records_to_matrix, split_into_batches,  # pylint: disable=wrong-import-position
+                              BatchedEvaluationClient, LocalStubPredictor, evaluate_model)
+    SKIP_REASON = None
+except ImportError as e:
+    # src.evaluate uses sagemaker.Predictor and sagemaker.amazon.common, which SDK v3 removed
+    SKIP_REASON = f"src.evaluate needs the SageMaker Python SDK v2 pinned in requirements.txt: {e}"
+
+
+def one_hot_ratings(n_rows=3000, n_users=50, n_movies=200, seed=0):
+    """
+    User and movie one-hot rows, as the FM training data is encoded, with random binary labels.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.repeat(np.arange(n_rows), 2)
+    cols = np.column_stack([rng.integers(0, n_users, n_rows), n_users + rng.integers(0, n_movies, n_rows)]).ravel()
+    X = sparse.csr_matrix((np.ones(rows.size, dtype='float32'), (rows, cols)), shape=(n_rows, n_users + n_movies))
+    return X, rng.integers(0, 2, n_rows).astype('float32')
+
+
+@unittest.skipIf(SKIP_REASON, SKIP_REASON)
+class TestRecordioEncoding(unittest.TestCase):
+    """
+    Verifies that request bodies decode back to the rows they were built from.
+    """
+
+    def test_sparse_round_trip(self):
+        """
+        Verifies that sparse rows survive serialize_batch and records_to_matrix.
+        """
+        X, _ = one_hot_ratings(n_rows=20)
+        decoded, labels = records_to_matrix(smac.read_records(io.BytesIO(serialize_batch(X))), X.shape[1])
+        self.assertEqual(decoded.shape, X.shape)
+        self.assertEqual((decoded != X).nnz, 0)
+        self.assertTrue(np.isnan(labels).all())
+
+    def test_dense_round_trip(self):
+        """
+        Verifies that dense rows are encoded as dense tensors and decode to the same values.
+        """
+        X = np.arange(12, dtype='float32').reshape(4, 3)
+        decoded, _ = records_to_matrix(smac.read_records(io.BytesIO(serialize_batch(X))))
+        np.testing.assert_array_equal(decoded.toarray(), X)
+
+
+@unittest.skipIf(SKIP_REASON, SKIP_REASON)
+class TestBatchedEvaluation(unittest.TestCase):
+    """
+    Verifies that the test set is scored once, in bounded batches, in row order.
+    """
+
+    def test_batches_cover_rows_under_payload_limit(self):
+        """
+        Verifies that batches are contiguous, cover every row and respect the payload limit.
+        """
+        X, _ = one_hot_ratings()
+        batches = split_into_batches(X, max_payload_bytes=16 * 1024, probe_rows=10)
+
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(batches[0][0], 0)
+        self.assertEqual(batches[-1][1], X.shape[0])
+        for (_, stop, _), (start, _, _) in zip(batches, batches[1:]):
+            self.assertEqual(stop, start)
+        self.assertTrue(all(len(payload) <= 16 * 1024 for _, _, payload in batches))
+
+    def test_scores_in_row_order(self):
+        """
+        Verifies that concurrent batched scores equal scoring the whole matrix in one request.
+        """
+        X, _ = one_hot_ratings()
+        stub = LocalStubPredictor(X.shape[1], latency=0.001)
+        client = BatchedEvaluationClient(stub, max_payload_bytes=16 * 1024, max_workers=8)
+
+        scores = client.predict(X)
+        expected = [prediction['score'] for prediction in stub.predict(serialize_batch(X))['predictions']]
+        np.testing.assert_allclose(scores, expected, rtol=1e-6)
+        self.assertEqual(client.last_stats['batches'], len(split_into_batches(X, 16 * 1024)))
+
+    def test_endpoint_called_once_per_batch(self):
+        """
+        Verifies that evaluate_model sends every row once and derives all metrics from those scores.
+        """
+        X, y = one_hot_ratings()
+        stub = LocalStubPredictor(X.shape[1])
+        calls = []
+        predict = stub.predict
+        stub.predict = lambda payload: calls.append(payload) or predict(payload)
+
+        accuracy, confusion, _, stats = evaluate_model(stub, X, y, max_payload_bytes=16 * 1024)
+
+        self.assertEqual(len(calls), stats['batches'])
+        self.assertEqual(confusion.sum(), X.shape[0])
+        self.assertAlmostEqual(accuracy, np.trace(confusion) / X.shape[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
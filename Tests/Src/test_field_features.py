@@ -0,0 +1,111 @@
+"""Unit tests for per-field content features."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.field_features import (FieldMatrices, WeightedFieldVectorizer, combined_features, entity_tokens,  # pylint: disable=wrong-import-position
+                                tuned_weights, DEFAULT_WEIGHTS)
+
+
+def catalog():
+    """
+    Four movies with every field filled in, except one missing director.
+    """
+    return pd.DataFrame({
+        'cast_names': [['Ann Lee', 'Bo Chen'], ['Ann Lee'], ['Cy Diaz'], ['Bo Chen', 'Cy Diaz']],
+        'language': [['English'], ['English'], ['French'], ['English', 'French']],
+        'keyword_names': [['heist'], ['heist', 'space'], ['space'], ['love']],
+        'genre_names': [['Crime'], ['Crime', 'Science Fiction'], ['Science Fiction'], ['Romance']],
+        'director': ['Dee Park', 'Dee Park', np.nan, 'Eve Ross'],
+        'overview': ['A crew plans a heist', 'A heist in space', 'Lost in deep space', 'Two strangers fall in love'],
+    })
+
+
+class TestFieldMatrices(unittest.TestCase):
+    """
+    A unittest class for fitting and combining per-field TF-IDF matrices.
+    """
+    def setUp(self):
+        self.field_matrices = FieldMatrices.fit(catalog())
+
+    def test_one_matrix_per_field(self):
+        """
+        Verifies that every field gets a matrix with one row per movie and names are single tokens.
+        """
+        self.assertEqual(self.field_matrices.fields, list(DEFAULT_WEIGHTS))
+        self.assertEqual(self.field_matrices.n_movies, 4)
+        self.assertIn('ann lee', self.field_matrices.vectorizers['cast_names'].vocabulary_)
+        self.assertEqual(self.field_matrices.matrices['director'][2].nnz, 0)
+
+    def test_combination_is_weighted_mean_of_field_cosines(self):
+        """
+        Verifies that row dot products of the combination are the weighted mean of the per-field cosines.
+        """
+        weights = {'cast_names': 2.0, 'keyword_names': 0.5, 'overview': 1.0}
+        combined = self.field_matrices.combine(weights).toarray()
+
+        expected = sum(weight * (self.field_matrices.matrices[field] @ self.field_matrices.matrices[field].T).toarray()
+                       for field, weight in weights.items()) / sum(weights.values())
+        np.testing.assert_allclose(combined @ combined.T, expected, atol=1e-6)
+
+    def test_zero_weights_drop_fields(self):
+        """
+        Verifies that fields without a positive weight are left out, and that at least one is required.
+        """
+        combined = self.field_matrices.combine({'director': 1.0, 'overview': 0.0})
+        self.assertEqual(combined.shape[1], self.field_matrices.matrices['director'].shape[1])
+        with self.assertRaises(ValueError):
+            self.field_matrices.combine({'overview': 0.0})
+
+    def test_tuned_weights(self):
+        """
+        Verifies that swept weights are applied and fields that were not tuned keep their default.
+        """
+        weights = tuned_weights({'weight_overview': 0.25, 'weight_cast_names': 1.5})
+        self.assertEqual(weights['overview'], 0.25)
+        self.assertEqual(weights['cast_names'], 1.5)
+        self.assertEqual(weights['genre_names'], DEFAULT_WEIGHTS['genre_names'])
+
+    def test_model_reproduces_combination(self):
+        """
+        Verifies that the model's transform returns the combined rows, also after an MLflow round trip.
+        """
+        import mlflow.sklearn  # pylint: disable=import-outside-toplevel
+
+        weights = {'cast_names': 2.0, 'director': 0.5, 'overview': 1.0}
+        expected = self.field_matrices.combine(weights).toarray()
+        model = self.field_matrices.model(weights)
+        np.testing.assert_allclose(model.transform(catalog()).toarray(), expected, atol=1e-6)
+        np.testing.assert_allclose(clone(model).fit(catalog()).transform(catalog()).toarray(), expected, atol=1e-6)
+
+        trusted = [f'{obj.__module__}.{obj.__qualname__}' for obj in (WeightedFieldVectorizer, entity_tokens)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mlflow.sklearn.save_model(model, os.path.join(tmp_dir, 'model'), skops_trusted_types=trusted)
+            loaded = mlflow.sklearn.load_model(os.path.join(tmp_dir, 'model'))
+        np.testing.assert_allclose(loaded.transform(catalog().iloc[[2]]).toarray(), expected[[2]], atol=1e-6)
+
+
+class TestCombinedFeatures(unittest.TestCase):
+    """
+    A unittest class for the single-string document of the whole-document TF-IDF model.
+    """
+    def test_matches_row_wise_join(self):
+        """
+        Verifies that the column-wise build equals joining str() of every field per row.
+        """
+        df = catalog()
+        fields = list(DEFAULT_WEIGHTS)
+        expected = df.apply(lambda row: ' '.join(str(row[field]) for field in fields), axis=1)
+        self.assertEqual(combined_features(df).tolist(), expected.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
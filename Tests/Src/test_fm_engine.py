@@ -0,0 +1,164 @@
+"""Unit tests for the local factorization-machines inference engine."""
+
+import io
+import os
+import struct
+import sys
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from itertools import combinations
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.fm_engine import (FactorizationMachineEngine, read_mxnet_params,  # pylint: disable=wrong-import-position
+                           NDARRAY_LIST_MAGIC, NDARRAY_V2_MAGIC)
+
+
+def mxnet_params(arrays):
+    """
+    Serialize float32 arrays as an MXNet NDArray list file, the format of the FM model's .params file.
+    """
+    out = [struct.pack('<QQQ', NDARRAY_LIST_MAGIC, 0, len(arrays))]
+    for array in arrays.values():
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        out.append(struct.pack('<IiI', NDARRAY_V2_MAGIC, 0, array.ndim))
+        out.append(struct.pack(f'<{array.ndim}q', *array.shape))
+        out.append(struct.pack('<iii', 1, 0, 0))  # cpu(0), float32
+        out.append(array.tobytes())
+    out.append(struct.pack('<Q', len(arrays)))
+    for name in arrays:
+        encoded = f'arg:{name}'.encode()
+        out.append(struct.pack('<Q', len(encoded)) + encoded)
+    return b''.join(out)
+
+
+def model_tar_gz(arrays):
+    """
+    A model.tar.gz laid out like SageMaker's: model_algo-1 is a zip holding the symbol and params.
+    """
+    algo = io.BytesIO()
+    with zipfile.ZipFile(algo, 'w') as archive:
+        archive.writestr('manifest.json', '{}')
+        archive.writestr('mx-mod-symbol.json', '{}')
+        archive.writestr('mx-mod-0000.params', mxnet_params(arrays))
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode='w:gz') as tar:
+        info = tarfile.TarInfo('model_algo-1')
+        info.size = len(algo.getvalue())
+        tar.addfile(info, io.BytesIO(algo.getvalue()))
+    return out.getvalue()
+
+
+def random_model(feature_dim=30, num_factors=4, seed=0):
+    """
+    FM parameters named as in the SageMaker model: bias w0_weight, linear w1_weight and factors v.
+    """
+    rng = np.random.default_rng(seed)
+    return {'w0_weight': np.array([0.3]), 'w1_weight': rng.normal(0, 0.5, (feature_dim, 1)),
+            'v': rng.normal(0, 0.5, (feature_dim, num_factors))}
+
+
+def naive_fm(params, X):
+    """
+    FM score by the definition, summing <v_i, v_j> x_i x_j over every pair of features.
+    """
+    w0, w, v = params['w0_weight'][0], params['w1_weight'].ravel(), params['v']
+    scores = []
+    for row in X.toarray():
+        pairs = sum(v[i] @ v[j] * row[i] * row[j] for i, j in combinations(np.flatnonzero(row), 2))
+        scores.append(w0 + w @ row + pairs)
+    return np.array(scores)
+
+
+class TestModelArtifact(unittest.TestCase):
+    """
+    Verifies that FM parameters are read from the SageMaker artifact without MXNet.
+    """
+
+    def test_read_params(self):
+        """
+        Verifies that names lose their arg: prefix and arrays keep their shapes and values.
+        """
+        params = random_model()
+        parsed = read_mxnet_params(mxnet_params(params))
+        self.assertEqual(set(parsed), set(params))
+        for name, array in params.items():
+            np.testing.assert_allclose(parsed[name], array.astype(np.float32))
+
+    def test_from_artifact_path_and_bytes(self):
+        """
+        Verifies that the engine loads from model.tar.gz bytes and from a local path alike.
+        """
+        artifact = model_tar_gz(random_model())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'model.tar.gz')
+            with open(path, 'wb') as f:
+                f.write(artifact)
+            from_path = FactorizationMachineEngine.from_artifact(path)
+        from_bytes = FactorizationMachineEngine.from_artifact(artifact)
+        self.assertEqual(from_path.feature_dim, 30)
+        np.testing.assert_array_equal(from_path.factors, from_bytes.factors)
+        self.assertAlmostEqual(float(from_bytes.bias), 0.3, places=6)
+
+    def test_rejects_other_files(self):
+        """
+        Verifies that a buffer without the NDArray list magic is rejected.
+        """
+        with self.assertRaises(ValueError):
+            read_mxnet_params(b'\x00' * 24)
+
+
+class TestFactorizationMachineEngine(unittest.TestCase):
+    """
+    Verifies that vectorized scoring and ranking equal the FM definition.
+    """
+
+    def setUp(self):
+        self.params = random_model()
+        self.engine = FactorizationMachineEngine(self.params['w0_weight'][0], self.params['w1_weight'],
+                                                 self.params['v'])
+        self.X = sparse.random(25, 30, density=0.2, random_state=1, format='csr', dtype=np.float32)
+
+    def test_decision_function_matches_definition(self):
+        """
+        Verifies the O(k * nnz) identity against the pairwise sum, independently of the batch size.
+        """
+        expected = naive_fm(self.params, self.X)
+        np.testing.assert_allclose(self.engine.decision_function(self.X), expected, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(self.engine.decision_function(self.X, batch_size=4), expected, rtol=1e-4, atol=1e-5)
+
+    def test_predict_applies_link(self):
+        """
+        Verifies that classifiers return sigmoid probabilities and regressors raw scores.
+        """
+        raw = self.engine.decision_function(self.X)
+        np.testing.assert_allclose(self.engine.predict(self.X), 1 / (1 + np.exp(-raw)), rtol=1e-6)
+        regressor = FactorizationMachineEngine(self.engine.bias, self.engine.linear, self.engine.factors, 'regressor')
+        np.testing.assert_array_equal(regressor.predict(self.X), raw)
+
+    def test_recommend_matches_one_hot_scores(self):
+        """
+        Verifies that ranking one-hot users equals scoring every user-item row, with excluded items skipped.
+        """
+        users, items = np.array([0, 3, 7]), np.arange(10, 30)
+        exclude = sparse.csr_matrix(([1, 1], ([0, 2], [5, 0])), shape=(3, items.size))
+        top_items, top_scores = self.engine.recommend(users, items, top_n=4, exclude=exclude, batch_size=2)
+
+        for u, user in enumerate(users):
+            rows = sparse.csr_matrix((np.ones(2 * items.size), (np.repeat(np.arange(items.size), 2),
+                                                                np.column_stack([np.full(items.size, user), items]).ravel())),
+                                     shape=(items.size, 30))
+            scores = self.engine.predict(rows)
+            scores[exclude[u].indices] = -np.inf
+            expected = np.argsort(-scores, kind='stable')[:4]
+            np.testing.assert_array_equal(top_items[u], expected)
+            np.testing.assert_allclose(top_scores[u], scores[expected], rtol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
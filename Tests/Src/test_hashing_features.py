@@ -0,0 +1,127 @@
+"""Unit tests for the out-of-core hashed TF-IDF features."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.exceptions import NotFittedError
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.hashing_features import StreamingTfidf, fit_chunks, iter_catalog_chunks  # pylint: disable=wrong-import-position
+from src.preprocess import load_movie_data, preprocess_and_feature_extraction, handling_missing_values  # pylint: disable=wrong-import-position
+from src.synthetic import write_tmdb_csvs  # pylint: disable=wrong-import-position
+
+DOCUMENTS = [
+    'a crew plans a heist in the city',
+    'a heist in deep space',
+    'lost in deep space with a robot',
+    'two strangers fall in love in paris',
+    'the robot falls in love',
+    'paris heist gone wrong',
+]
+
+
+class TestStreamingTfidf(unittest.TestCase):
+    """
+    Verifies that the hashed vectorizer matches the exact TfidfVectorizer.
+    """
+
+    def test_matches_exact_tfidf_up_to_column_order(self):
+        """
+        Verifies that, without collisions, documents have the same pairwise similarities.
+        """
+        hashed = StreamingTfidf(n_features=2 ** 20).fit_transform(DOCUMENTS)
+        exact = TfidfVectorizer(stop_words='english').fit_transform(DOCUMENTS)
+        np.testing.assert_allclose((hashed @ hashed.T).toarray(), (exact @ exact.T).toarray(), atol=1e-6)
+        self.assertEqual(hashed.nnz, exact.nnz)
+
+    def test_chunked_and_merged_fits_equal_one_fit(self):
+        """
+        Verifies that partial_fit over chunks and merging shard vectorizers give the statistics of one fit.
+        """
+        full = StreamingTfidf(n_features=2 ** 12).fit(DOCUMENTS)
+        chunked = StreamingTfidf(n_features=2 ** 12)
+        fit_chunks(chunked, [DOCUMENTS[:2], DOCUMENTS[2:5], DOCUMENTS[5:]])
+        merged = StreamingTfidf(n_features=2 ** 12).fit(DOCUMENTS[:3]).merge(
+            StreamingTfidf(n_features=2 ** 12).fit(DOCUMENTS[3:]))
+        for other in (chunked, merged):
+            self.assertEqual(other.n_documents_, full.n_documents_)
+            np.testing.assert_array_equal(other.document_frequency_, full.document_frequency_)
+
+    def test_fit_discards_earlier_statistics(self):
+        """
+        Verifies that fit starts over, unlike partial_fit, as sklearn estimators do.
+        """
+        vectorizer = StreamingTfidf(n_features=2 ** 12).fit(DOCUMENTS)
+        vectorizer.fit(DOCUMENTS[:2])
+        self.assertEqual(vectorizer.n_documents_, 2)
+
+    def test_sklearn_estimator_contract(self):
+        """
+        Verifies that construction stores only params, so clone and set_params give unfitted vectorizers.
+        """
+        vectorizer = StreamingTfidf(n_features=2 ** 12)
+        self.assertFalse(hasattr(vectorizer, 'document_frequency_'))
+        with self.assertRaises(NotFittedError):
+            vectorizer.transform(DOCUMENTS)
+
+        fitted = vectorizer.fit(DOCUMENTS)
+        copy = clone(fitted)
+        self.assertEqual(copy.get_params(), fitted.get_params())
+        self.assertFalse(hasattr(copy, 'document_frequency_'))
+
+        copy.set_params(n_features=2 ** 10)
+        self.assertEqual(copy.fit_transform(DOCUMENTS).shape, (len(DOCUMENTS), 2 ** 10))
+        self.assertEqual(copy.partial_fit(DOCUMENTS[:1]).n_documents_, len(DOCUMENTS) + 1)
+
+
+class TestCatalogChunks(unittest.TestCase):
+    """
+    Verifies that the chunked catalog matches the catalog loaded in memory.
+    """
+
+    def test_missing_values_do_not_depend_on_chunk_size(self):
+        """
+        Verifies that missing runtimes and years get the whole-catalog means, whatever the chunk size.
+        """
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_tmdb_csvs(data_dir, 3000, vocabulary_size=500)
+            expected = handling_missing_values(preprocess_and_feature_extraction(load_movie_data(data_dir)))
+            chunked = pd.concat(iter_catalog_chunks(data_dir, chunk_size=250), ignore_index=True)
+        expected = expected.set_index('movie_id').sort_index()
+        chunked = chunked.set_index('movie_id').sort_index()
+        self.assertEqual(len(chunked), len(expected))
+        for column in ('runtime', 'year'):
+            self.assertFalse(chunked[column].isna().any())
+            np.testing.assert_allclose(chunked[column].astype(float), expected[column].astype(float))
+
+    def test_unaligned_files(self):
+        """
+        Verifies that credits in another order, and read after the movies file ends, are still matched.
+        """
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_tmdb_csvs(data_dir, 600, vocabulary_size=200)
+            expected = handling_missing_values(preprocess_and_feature_extraction(load_movie_data(data_dir)))
+            movies_path = os.path.join(data_dir, 'tmdb_5000_movies.csv')
+            credits_path = os.path.join(data_dir, 'tmdb_5000_credits.csv')
+            # Movies in reverse order; credits shuffled behind unmatched rows, so many are read after the movies end
+            pd.read_csv(movies_path).iloc[::-1].to_csv(movies_path, index=False)
+            credits = pd.read_csv(credits_path)
+            extra = credits.iloc[:300].assign(movie_id=lambda frame: frame['movie_id'] + 10 ** 6)
+            pd.concat([extra, credits.sample(frac=1, random_state=0)]).to_csv(credits_path, index=False)
+            chunked = pd.concat(iter_catalog_chunks(data_dir, chunk_size=100), ignore_index=True)
+        self.assertEqual(sorted(chunked['movie_id']), sorted(expected['movie_id']))
+        chunked = chunked.set_index('movie_id').sort_index()
+        expected = expected.set_index('movie_id').sort_index()
+        self.assertEqual(chunked['cast_names'].tolist(), expected['cast_names'].tolist())
+        self.assertEqual(chunked['title'].tolist(), expected['title'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Unit tests for task spans."""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src import instrumentation  # pylint: disable=wrong-import-position
+from src.instrumentation import span, get_trace, reset_trace, trace_metrics, log_trace_to_mlflow  # pylint: disable=wrong-import-position
+
+
+class TestSpans(unittest.TestCase):
+    """
+    A unittest class for span recording, memory attribution and trace reset.
+    """
+    def setUp(self):
+        instrumentation.enable(True)
+        reset_trace()
+
+    def tearDown(self):
+        reset_trace()
+        instrumentation.enable(False)
+
+    def test_memory_is_attributed_to_the_allocating_span(self):
+        """
+        Verifies that only the span that grows the process gets its memory, not later spans.
+        """
+        with span('flow'):
+            with span('allocate'):
+                block = np.ones(64 * 2 ** 20 // 8)
+            with span('idle'):
+                pass
+        del block
+
+        metrics = trace_metrics()
+        self.assertGreater(metrics['trace/flow/allocate/rss_delta_mb'], 32)
+        self.assertLess(abs(metrics['trace/flow/idle/rss_delta_mb']), 8)
+        self.assertLess(metrics['trace/flow/idle/max_rss_growth_mb'], 8)
+
+    def test_logged_spans_are_dropped(self):
+        """
+        Verifies that logging a trace removes exactly the logged spans from the recorded trace.
+        """
+        with span('first') as first:
+            pass
+        with span('second'):
+            pass
+
+        with mock.patch('mlflow.log_metrics') as log_metrics, mock.patch('mlflow.log_artifacts'):
+            log_trace_to_mlflow([first])
+            self.assertEqual([s.name for s in get_trace()], ['second'])
+            log_trace_to_mlflow()
+        self.assertEqual(get_trace(), [])
+        self.assertEqual(log_metrics.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""Unit tests for the recommendation service."""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.compact_model import CompactCFModel  # pylint: disable=wrong-import-position
+from src.serve import TTLCache, MicroBatcher, RecommendationService, notify_model_version  # pylint: disable=wrong-import-position
+
+
+def compact_model(item_factors):
+    """
+    A compact CF model with 2 users and 3 items; user 10 rated item 1.
+    """
+    arrays = {
+        'user_ids': np.array([10, 20]),
+        'item_ids': np.array([1, 2, 3]),
+        'user_factors': np.array([[1.0], [-1.0]], dtype=np.float32),
+        'item_factors': np.array(item_factors, dtype=np.float32).reshape(-1, 1),
+        'user_bias': np.zeros(2, dtype=np.float32),
+        'item_bias': np.zeros(3, dtype=np.float32),
+        'seen_indptr': np.array([0, 1, 1]),
+        'seen_indices': np.array([0], dtype=np.int32),
+    }
+    return CompactCFModel(arrays, 3.0, (1, 5))
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    A unittest class for the LRU/TTL result cache.
+    """
+    def test_entries_expire(self):
+        """
+        Verifies that an entry is served until its time-to-live has passed.
+        """
+        cache = TTLCache(maxsize=10, ttl=5.0)
+        with mock.patch('src.serve.time.monotonic', return_value=100.0):
+            cache.put('key', 'value')
+        with mock.patch('src.serve.time.monotonic', return_value=104.0):
+            self.assertEqual(cache.get('key'), 'value')
+        with mock.patch('src.serve.time.monotonic', return_value=106.0):
+            self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        Verifies that the least recently read entry is dropped when the cache is full.
+        """
+        cache = TTLCache(maxsize=2, ttl=60.0)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """
+    A unittest class for request micro-batching.
+    """
+    def test_concurrent_requests_share_a_batch(self):
+        """
+        Verifies that concurrent requests are scored together and each gets its own result.
+        """
+        batcher = MicroBatcher(lambda requests: [entity_id * 10 for entity_id, _ in requests],
+                               max_batch_size=8, max_wait_ms=50)
+
+        async def scenario():
+            return await asyncio.gather(*(batcher.submit(entity_id, 5) for entity_id in range(5)))
+
+        self.assertEqual(asyncio.run(scenario()), [0, 10, 20, 30, 40])
+        self.assertEqual(batcher.batch_sizes, [5])
+
+
+class TestModelVersionNotification(unittest.TestCase):
+    """
+    A unittest class for switching the served model through POST /model-version.
+
+    The service starts with a model ranking item 3 first for user 20; the new model
+    written to a temporary directory ranks item 1 first.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.new_model_dir = compact_model([-0.3, -0.2, -0.1]).save(os.path.join(self.tmp_dir.name, 'compact_model'))
+        self.old_model = compact_model([0.1, 0.2, -0.3])
+        self.service = RecommendationService(cf_model=self.old_model, model_version='1')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _with_server(self, callback):
+        async def scenario():
+            await self.service.recommend('cf', 20, 1)
+            server = await self.service.start('127.0.0.1', 0)
+            url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, callback, url)
+            finally:
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(scenario())
+
+    def test_notify_swaps_model(self):
+        """
+        Verifies that a notification loads the new model, bumps the version and invalidates the cache.
+        """
+        self._with_server(lambda url: notify_model_version('2', self.new_model_dir, url))
+
+        self.assertEqual(self.service.model_version, '2')
+        self.assertEqual(len(self.service.cache), 0)
+        self.assertIsNot(self.service.cf_model, self.old_model)
+        [(items, scores)] = self.service._score_cf([(20, 1)])  # pylint: disable=protected-access
+        self.assertEqual(items, [1])
+        self.assertAlmostEqual(scores[0], 3.3, places=5)
+
+    def test_failed_load_keeps_model(self):
+        """
+        Verifies that an artifact that cannot be loaded gets a 500 JSON response and the old model stays.
+        """
+        missing_dir = tempfile.mkdtemp(dir=self.tmp_dir.name)
+        payload = json.dumps({'version': '2', 'artifact_uri': missing_dir}).encode()
+
+        def post(url):
+            request = urllib.request.Request(f'{url}/model-version', data=payload, method='POST')
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(request, timeout=30)  # pylint: disable=consider-using-with
+            with raised.exception:
+                return raised.exception.code, json.loads(raised.exception.read())
+
+        status, body = self._with_server(post)
+
+        self.assertEqual(status, 500)
+        self.assertIn(missing_dir, body['error'])
+        self.assertEqual(body['model_version'], '2')
+        self.assertIs(self.service.cf_model, self.old_model)
+        self.assertEqual(len(self.service.cache), 0)
+
+
+
+class BlockingModel:
+    """
+    Wraps a CF model so that scoring waits until `release` is set, signalling `started` first.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def recommend(self, user_ids, top_n=10):
+        self.started.set()
+        self.release.wait(10)
+        return self.model.recommend(user_ids, top_n=top_n)
+
+
+class TestRecommendationService(unittest.TestCase):
+    """
+    A unittest class for request validation and cache consistency across model swaps.
+    """
+    def test_swap_during_scoring_is_not_cached(self):
+        """
+        Verifies that a result scored by the old model is not cached once the new model is swapped in,
+        although the version string is the same before and after the swap.
+        """
+        old_model = BlockingModel(compact_model([0.1, 0.2, -0.3]))
+        service = RecommendationService(cf_model=old_model, model_version='1')
+
+        async def scenario():
+            service.set_model_version('2')
+            in_flight = asyncio.ensure_future(service.recommend('cf', 20, 1))
+            await asyncio.get_running_loop().run_in_executor(None, old_model.started.wait, 10)
+            service.set_model_version('2', cf_model=compact_model([-0.3, -0.2, -0.1]))
+            old_model.release.set()
+            stale = await in_flight
+            return stale, len(service.cache), await service.recommend('cf', 20, 1)
+
+        stale, cached, fresh = asyncio.run(scenario())
+        self.assertEqual(stale['items'], [3])
+        self.assertEqual(cached, 0)
+        self.assertEqual(fresh['items'], [1])
+        self.assertEqual(len(service.cache), 1)
+
+    def test_top_n_must_be_positive(self):
+        """
+        Verifies that a zero or negative top_n is rejected with 400 before it reaches the batchers.
+        """
+        service = RecommendationService(cf_model=compact_model([0.1, 0.2, -0.3]))
+        for top_n in (0, -2):
+            status, body = asyncio.run(service.handle_request('GET', f'/recommendations/cf/20?top_n={top_n}', b''))
+            self.assertEqual(status, 400)
+            self.assertIn('top_n', body['error'])
+        self.assertEqual(service.batchers['cf'].batch_sizes, [])
+
+    def test_malformed_request_gets_400(self):
+        """
+        Verifies that a malformed request line or header gets a 400 response and the connection is closed.
+        """
+        service = RecommendationService(cf_model=compact_model([0.1, 0.2, -0.3]))
+
+        async def send(raw):
+            server = await service.start('127.0.0.1', 0)
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+                writer.write(raw)
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(), 10)
+                writer.close()
+                return response
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        for raw in (b'GARBAGE\r\n\r\n', b'GET /health HTTP/1.1\r\nno colon here\r\n\r\n'):
+            response = asyncio.run(send(raw))
+            self.assertTrue(response.startswith(b'HTTP/1.1 400'), response)
+            self.assertIn(b'Malformed request', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Unit tests for the synthetic MovieLens and TMDB data generator."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.synthetic import (generate_ratings, generate_movies, write_ratings_csv, write_tmdb_csvs,  # pylint: disable=wrong-import-position
+                           RATING_VALUES, HALF_STARS_FROM, USERS_PER_BLOCK)
+from src.preprocess import load_movie_data, preprocess_and_feature_extraction  # pylint: disable=wrong-import-position
+
+
+def ratings(n_rows=30000, **kwargs):
+    """
+    All generated rating chunks as one frame.
+    """
+    return pd.concat(generate_ratings(n_rows, **kwargs), ignore_index=True)
+
+
+class TestGenerateRatings(unittest.TestCase):
+    """
+    Verifies the shape, value ranges and seeding of the generated ratings.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ratings = ratings(n_users=1500, n_movies=2000, chunk_size=5000)
+
+    def test_shape_and_ranges(self):
+        """
+        Verifies the row count, the ids, the half-star values and whole stars before 2003.
+        """
+        frame = self.ratings
+        self.assertEqual(list(frame.columns), ['userId', 'movieId', 'rating', 'timestamp'])
+        self.assertEqual(len(frame), 30000)
+        self.assertEqual(frame['userId'].nunique(), 1500)
+        self.assertTrue(frame['movieId'].between(1, 2000).all())
+        self.assertTrue(frame['rating'].isin(RATING_VALUES).all())
+        early = frame['timestamp'] < HALF_STARS_FROM
+        self.assertTrue((frame.loc[early, 'rating'] % 1 == 0).all())
+        self.assertTrue((frame.loc[~early, 'rating'] % 1 == 0.5).any())
+
+    def test_min_ratings_and_no_duplicates(self):
+        """
+        Verifies that every user rates at least min_ratings distinct movies, at most once each.
+        """
+        self.assertGreaterEqual(self.ratings.groupby('userId').size().min(), 20)
+        self.assertFalse(self.ratings.duplicated(['userId', 'movieId']).any())
+
+    def test_deterministic_and_chunk_size_independent(self):
+        """
+        Verifies that the output depends on the seed but not on chunk_size.
+        """
+        rechunked = ratings(n_users=1500, n_movies=2000, chunk_size=700)
+        pd.testing.assert_frame_equal(rechunked, self.ratings)
+        other_seed = ratings(n_users=1500, n_movies=2000, seed=7)
+        self.assertFalse(other_seed['movieId'].equals(self.ratings['movieId']))
+
+    def test_chunks_are_user_blocks(self):
+        """
+        Verifies that chunks end on user block boundaries.
+        """
+        chunks = list(generate_ratings(30000, n_users=2500, n_movies=2000, chunk_size=1))
+        self.assertEqual(len(chunks), -(-2500 // USERS_PER_BLOCK))
+        self.assertEqual(chunks[1]['userId'].min(), USERS_PER_BLOCK + 1)
+
+    def test_write_ratings_csv(self):
+        """
+        Verifies that the streamed CSV holds every generated row once, with one header.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'ratings.csv')
+            written = write_ratings_csv(path, 30000, n_users=1500, n_movies=2000, chunk_size=5000)
+            frame = pd.read_csv(path)
+        self.assertEqual(written, len(frame))
+        pd.testing.assert_frame_equal(frame, self.ratings, check_dtype=False)
+
+
+class TestGenerateMovies(unittest.TestCase):
+    """
+    Verifies that the generated metadata has the TMDB layout and is seeded.
+    """
+
+    def test_tmdb_csvs_preprocess(self):
+        """
+        Verifies that the written CSVs load and parse like the TMDB 5000 files, one row per movie.
+        """
+        with tempfile.TemporaryDirectory() as data_dir:
+            self.assertEqual(write_tmdb_csvs(data_dir, 1500, vocabulary_size=500), 1500)
+            processed = preprocess_and_feature_extraction(load_movie_data(data_dir))
+        self.assertEqual(len(processed), 1500)
+        self.assertEqual(processed['movie_id'].tolist(), list(range(1, 1501)))
+        self.assertTrue(processed['genre_names'].map(len).ge(1).all())
+        self.assertGreater(processed['director'].notna().mean(), 0.9)
+
+    def test_deterministic_and_chunk_size_independent(self):
+        """
+        Verifies that movie records depend on the seed but not on chunk_size.
+        """
+        whole = pd.concat([movies for movies, _ in generate_movies(2500, chunk_size=10_000)], ignore_index=True)
+        chunked = pd.concat([movies for movies, _ in generate_movies(2500, chunk_size=1)], ignore_index=True)
+        pd.testing.assert_frame_equal(whole, chunked)
+        other_seed = pd.concat([movies for movies, _ in generate_movies(2500, seed=7)], ignore_index=True)
+        self.assertFalse(other_seed['title'].equals(whole['title']))
+        self.assertTrue(np.array_equal(other_seed['id'], whole['id']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Unit tests for the asynchronous MLflow tracker."""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('MLFLOW_DISABLE_AGENT_HINT', '1')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from mlflow.tracking import MlflowClient  # pylint: disable=wrong-import-position
+from src.tracking import AsyncTracker, REJECTED_SUFFIX  # pylint: disable=wrong-import-position
+
+
+class TestAsyncTracker(unittest.TestCase):
+    """
+    A unittest class for spooling and replaying MLflow operations.
+
+    Every test uses its own SQLite tracking store and spool file; an outage is simulated
+    by making the tracker's requests fail with a connection error.
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.tracking_uri = 'sqlite:///' + os.path.join(self.tmp_dir.name, 'mlflow.db')
+        self.spool_path = os.path.join(self.tmp_dir.name, 'spool.jsonl')
+        self.client = MlflowClient(self.tracking_uri)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _tracker(self):
+        return AsyncTracker(self.tracking_uri, self.spool_path, retry_interval=3600)
+
+    def _spooled(self, path=None):
+        with open(path or self.spool_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def _replay_in_new_tracker(self):
+        tracker = self._tracker()
+        tracker._client = MlflowClient(self.tracking_uri)  # pylint: disable=protected-access
+        tracker._replay()  # pylint: disable=protected-access
+        return tracker
+
+    def test_offline_operations_are_spooled_with_run_ids(self):
+        """
+        Verifies that logging during an outage is spooled, referencing the created run by its id.
+        """
+        tracker = self._tracker()
+        handle = tracker.start_run(run_name='trial', experiment_id='0', nested=False)
+        self.assertTrue(tracker.flush(30))
+        with mock.patch.object(tracker, '_apply', side_effect=ConnectionError('server down')):
+            handle.log_metrics({'rmse': 0.9})
+            self.assertTrue(tracker.flush(30))
+        tracker.close()
+
+        records = self._spooled()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['run'], handle.run_id)
+        self.assertEqual(records[0]['metrics'][0][:2], ['rmse', 0.9])
+
+    def test_replay_in_new_tracker(self):
+        """
+        Verifies that another tracker instance replays the spool, creating spooled runs, and goes back online.
+        """
+        tracker = self._tracker()
+        with mock.patch.object(tracker, '_apply', side_effect=ConnectionError('server down')):
+            handle = tracker.start_run(run_name='offline', experiment_id='0', nested=False)
+            handle.log_params({'n_factors': 50})
+            handle.end()
+            self.assertTrue(tracker.flush(30))
+        tracker.close()
+        self.assertEqual(len(self._spooled()), 3)
+
+        replayer = self._replay_in_new_tracker()
+
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(replayer._offline)  # pylint: disable=protected-access
+        runs = self.client.search_runs(['0'])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0].data.params, {'n_factors': '50'})
+        self.assertEqual(runs[0].info.status, 'FINISHED')
+
+    def test_unresolved_handle_is_set_aside(self):
+        """
+        Verifies that an operation on a handle that was never created is rejected without blocking the spool.
+        """
+        run_id = self.client.create_run('0').info.run_id
+        with open(self.spool_path, 'w', encoding='utf-8') as f:
+            for run in ('handle:never-created', run_id):
+                f.write(json.dumps({'tracking_uri': self.tracking_uri, 'op': 'log', 'run': run,
+                                    'metrics': [['rmse', 0.8, 0, 0]], 'params': {}, 'tags': {}}) + '\n')
+
+        replayer = self._replay_in_new_tracker()
+
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(replayer._offline)  # pylint: disable=protected-access
+        self.assertEqual(self.client.get_run(run_id).data.metrics, {'rmse': 0.8})
+        rejected = self._spooled(self.spool_path + REJECTED_SUFFIX)
+        self.assertEqual([record['run'] for record in rejected], ['handle:never-created'])
+
+
+if __name__ == '__main__':
+    unittest.main()
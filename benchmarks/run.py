@@ -0,0 +1,353 @@
+"""
+Performance benchmark suite for the recommendation pipeline.
+
+Every stage is timed (median and min over several repeats) and memory-profiled (tracemalloc
+peak of one extra run) at several data scales. Results are written as JSON and compared
+against a saved baseline; a stage that is slower or uses more memory than the baseline
+allows fails the run. Input data comes from the deterministic generator in src/synthetic.py.
+
+Usage:
+    python -m benchmarks.run --scales small,medium
+    python -m benchmarks.run --scales small --save-baseline
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'latest.json')
+
+SCALES = {
+    'small': {'ratings': 10_000, 'movies': 500},
+    'medium': {'ratings': 100_000, 'movies': 5_000},
+    'large': {'ratings': 1_000_000, 'movies': 20_000},
+}
+
+
+class _SkippedStage(Exception):
+    '''Raised when a stage needs the result of a stage that was skipped.'''
+
+
+class _Context(dict):
+    # Stage results by name; reading the result of a skipped stage skips the reader too
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.skipped = set()
+
+    def __missing__(self, key):
+        if key in self.skipped:
+            raise _SkippedStage(f"needs the skipped stage {key}")
+        raise KeyError(key)
+
+
+def _skip_reason(error):
+    '''
+    Why a stage cannot run here, or None if the error is a failure that must not be hidden.
+
+    Only missing optional dependencies, missing NLTK data and skipped upstream stages are skipped.
+    '''
+    # KeyError and IndexError are LookupErrors too; nltk.data.find raises a plain LookupError
+    nltk_resource = type(error) is LookupError and 'nltk' in str(error).lower()
+    if not isinstance(error, (ImportError, _SkippedStage)) and not nltk_resource:
+        return None
+    # NLTK frames its message with lines of asterisks
+    lines = [line.strip() for line in str(error).splitlines() if any(c.isalnum() for c in line)]
+    return f"{type(error).__name__}: {lines[0] if lines else ''}"
+
+
+def _task_fn(task):
+    # Prefect tasks keep the undecorated function on .fn
+    return getattr(task, 'fn', task)
+
+
+def make_ratings(n_rows, seed=42):
+    '''
+    Build a synthetic MovieLens-style ratings frame of n_rows.
+    '''
+    from src.synthetic import generate_ratings
+    return pd.concat(generate_ratings(n_rows, seed=seed), ignore_index=True)
+
+
+# --- Stages -----------------------------------------------------------------------------------
+# Each stage is (name, setup, run). setup(ctx) builds fresh arguments outside the timed region
+# (stages mutate their inputs), run(*args) is timed and its result is stored in ctx[name].
+
+def _load_movie_data(data_dir):
+    from src.preprocess import load_movie_data
+    return load_movie_data(data_dir)
+
+
+def _preprocess(merged_df):
+    from src.preprocess import preprocess_and_feature_extraction, handling_missing_values
+    return handling_missing_values(preprocess_and_feature_extraction(merged_df))
+
+
+def _normalize_text(df):
+    from src.preprocess import normalize_text_features
+    return normalize_text_features(df)
+
+
+def _combined_features(df):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.preprocess_text_features)(df)
+
+
+def _tfidf(features):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.create_tfidf_matrix)(features)
+
+
+def _hashing_tfidf(features, chunk_size=10000):
+    import scipy.sparse as sp
+    from src.hashing_features import StreamingTfidf, fit_chunks, transform_chunks
+    documents = list(features)
+    chunks = [documents[start:start + chunk_size] for start in range(0, len(documents), chunk_size)]
+    vectorizer = fit_chunks(StreamingTfidf(), chunks)
+    return vectorizer, sp.vstack(list(transform_chunks(vectorizer, chunks)), format='csr')
+
+
+def _compact_catalog(df):
+    from src.catalog import CompactCatalog
+    return CompactCatalog.from_frame(df)
+
+
+def _similarity(features_matrix):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.calculate_cosine_similarity)(features_matrix)
+
+
+def _field_matrices(df):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.create_field_matrices)(df)
+
+
+def _combine_field_matrices(field_matrices):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.combine_field_matrices)(field_matrices, {'overview': 0.5})
+
+
+def _lsa_embeddings(features_matrix):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.create_lsa_embeddings)(features_matrix, 128)
+
+
+def _embedding_similarity(embeddings):
+    from src.cb import MovieRecommendationSystem
+    return _task_fn(MovieRecommendationSystem.calculate_embedding_similarity)(embeddings)
+
+
+def _cb_lookup(cosine_sim, catalog, movie_ids):
+    from src.cb import MovieRecommendationSystem
+    lookup = _task_fn(MovieRecommendationSystem.get_content_based_recommendations)
+    return [lookup(movie_id, cosine_sim, catalog) for movie_id in movie_ids]
+
+
+def _prepare_data(ratings):
+    from src.cf import MovieRecommendationFlow
+    return _task_fn(MovieRecommendationFlow.prepare_data)(ratings)
+
+
+def _svdpp_fit(train_data):
+    from src.cf import MovieRecommendationFlow
+    return _task_fn(MovieRecommendationFlow.train_svd_model)(train_data)
+
+
+def _cf_recommendations(model, ratings, user_id):
+    from src.cf import MovieRecommendationFlow
+    return _task_fn(MovieRecommendationFlow.get_cf_recommendations)(user_id, model, ratings)
+
+
+def _prepare_features_and_protobuf(ratings):
+    from src.train import MovieRecommendationFlowSageMaker
+    import sagemaker.amazon.common as smac
+    X, y = MovieRecommendationFlowSageMaker.prepare_features(ratings)
+    buf = io.BytesIO()
+    smac.write_spmatrix_to_sparse_tensor(buf, X, y.reset_index(drop=True))
+    return buf.getbuffer().nbytes
+
+
+STAGES = [
+    ('load_movie_data', lambda ctx: (ctx['data_dir'],), _load_movie_data, 'movies'),
+    ('preprocess_and_feature_extraction', lambda ctx: (ctx['load_movie_data'].copy(),), _preprocess, 'movies'),
+    ('compact_catalog', lambda ctx: (ctx['preprocess_and_feature_extraction'],), _compact_catalog, 'movies'),
+    ('text_normalization', lambda ctx: (ctx['preprocess_and_feature_extraction'].copy(),), _normalize_text, 'movies'),
+    ('combined_features', lambda ctx: (ctx['preprocess_and_feature_extraction'].copy(),), _combined_features, 'movies'),
+    ('create_tfidf_matrix', lambda ctx: (ctx['combined_features']['combined_features'],), _tfidf, 'movies'),
+    ('hashing_tfidf', lambda ctx: (ctx['combined_features']['combined_features'],), _hashing_tfidf, 'movies'),
+    ('similarity', lambda ctx: (ctx['create_tfidf_matrix'][1],), _similarity, 'movies'),
+    ('field_matrices', lambda ctx: (ctx['preprocess_and_feature_extraction'],), _field_matrices, 'movies'),
+    ('combine_field_matrices', lambda ctx: (ctx['field_matrices'],), _combine_field_matrices, 'movies'),
+    ('lsa_embeddings', lambda ctx: (ctx['create_tfidf_matrix'][1],), _lsa_embeddings, 'movies'),
+    ('embedding_similarity', lambda ctx: (ctx['lsa_embeddings'][1],), _embedding_similarity, 'movies'),
+    ('cb_lookup', lambda ctx: (ctx['similarity'], ctx['compact_catalog'],
+                               ctx['combined_features']['movie_id'].iloc[:100].tolist()), _cb_lookup, None),
+    ('prepare_data', lambda ctx: (ctx['ratings'].copy(),), _prepare_data, 'ratings'),
+    ('svdpp_fit', lambda ctx: (ctx['prepare_data'][0],), _svdpp_fit, 'ratings'),
+    ('get_cf_recommendations', lambda ctx: (ctx['svdpp_fit'][0], ctx['ratings'], int(ctx['ratings']['userId'].iloc[0])),
+     _cf_recommendations, None),
+    ('prepare_features_protobuf', lambda ctx: (ctx['ratings'].copy(),), _prepare_features_and_protobuf, 'ratings'),
+]
+
+
+def _measure(setup, run, ctx, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        args = setup(ctx)
+        started = time.perf_counter()
+        result = run(*args)
+        times.append(time.perf_counter() - started)
+
+    args = setup(ctx)
+    tracemalloc.start()
+    run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def run_benchmarks(scales, repeat=3, stages=None, workdir=None):
+    '''
+    Run every stage at every scale.
+
+    Args:
+        scales (list): Names from SCALES.
+        repeat (int): Timed repeats per stage.
+        stages (list, optional): Subset of stage names to run; dependencies still run untimed.
+        workdir (str, optional): Directory for generated data and the local MLflow store.
+
+    Returns:
+        dict: Results keyed by '<stage>@<scale>'. Stages that need a missing optional dependency,
+        missing NLTK data or a skipped stage are reported with status 'skipped' and the reason;
+        any other error fails the run.
+    '''
+    workdir = workdir or tempfile.mkdtemp(prefix='recomm_bench_')
+    # Keep the flows' MLflow calls off the shared tracking server
+    os.environ.setdefault('MLFLOW_TRACKING_URI', 'sqlite:///' + os.path.join(workdir, 'mlflow.db'))
+    # Time the computation, not the stage result cache
+    os.environ['RECOMM_CACHE'] = '0'
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from src.synthetic import write_tmdb_csvs
+    # Import the pipeline modules up front so import time is not charged to the first stage
+    for module in ('src.preprocess', 'src.cb', 'src.cf', 'src.train'):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+    results = {}
+    for scale in scales:
+        size = SCALES[scale]
+        data_dir = os.path.join(workdir, scale)
+        write_tmdb_csvs(data_dir, size['movies'])
+        ctx = _Context(data_dir=data_dir, ratings=make_ratings(size['ratings']))
+        for name, setup, run, rows_key in STAGES:
+            key = f'{name}@{scale}'
+            selected = stages is None or name in stages
+            try:
+                result, stats = _measure(setup, run, ctx, repeat if selected else 1)
+            except Exception as e:
+                reason = _skip_reason(e)
+                if reason is None:
+                    raise
+                ctx.skipped.add(name)
+                results[key] = {'status': 'skipped', 'reason': reason}
+                continue
+            ctx[name] = result
+            if not selected:
+                continue
+            rows = size[rows_key] if rows_key else None
+            stats.update(status='ok', scale=scale, rows=rows,
+                         rows_per_s=rows / stats['median_s'] if rows and stats['median_s'] > 0 else None)
+            results[key] = stats
+            print(f"{key:45s} {stats['median_s'] * 1000:10.1f} ms {stats['peak_mb']:9.1f} MB")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, memory_tolerance=0.25):
+    '''
+    List stages that regressed against the baseline.
+
+    Args:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): Previously saved results.
+        tolerance (float): Allowed relative increase of the median time.
+        memory_tolerance (float): Allowed relative increase of the peak memory.
+
+    Returns:
+        list: Human readable regression messages, empty when nothing regressed. A stage that ran
+        in the baseline but is skipped now is a regression too.
+    '''
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base or base.get('status') != 'ok':
+            continue
+        if stats.get('status') != 'ok':
+            regressions.append(f"{key}: {stats.get('status')} ({stats.get('reason')}) but ran in the baseline")
+            continue
+        if stats['median_s'] > base['median_s'] * (1 + tolerance):
+            regressions.append(f"{key}: median {stats['median_s']:.4f}s vs baseline {base['median_s']:.4f}s")
+        if stats['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance) and stats['peak_mb'] - base['peak_mb'] > 1:
+            regressions.append(f"{key}: peak {stats['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every pipeline stage.')
+    parser.add_argument('--scales', default='small,medium', help=f"Comma separated, from {', '.join(SCALES)}")
+    parser.add_argument('--stages', help='Comma separated subset of stages to time')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales.split(','), args.repeat, args.stages.split(',') if args.stages else None)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Without a baseline nothing can be checked; failing keeps the gate from passing silently
+        print(f"No baseline at {args.baseline}, run with --save-baseline on this machine to create one")
+        return 2
+    with open(args.baseline) as f:
+        regressions = compare_to_baseline(results, json.load(f)['results'], args.tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
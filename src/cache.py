@@ -0,0 +1,206 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+CACHE_ENV = 'RECOMM_CACHE'
+CACHE_DIR_ENV = 'RECOMM_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'stages')
+_file_digests = {}
+
+
+def cache_enabled():
+    '''
+    Stage caching is on unless RECOMM_CACHE is set to 0/false (checked on every call).
+    '''
+    return os.getenv(CACHE_ENV, '1').lower() not in ('0', 'false', 'no')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    '''
+    Content hash of a file, memoized on (path, size, mtime) so unchanged files are read once.
+    '''
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_digests:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        _file_digests[memo_key] = h.hexdigest()
+    return _file_digests[memo_key]
+
+
+def _update(h, obj):
+    h.update(type(obj).__qualname__.encode())
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        h.update(repr(obj).encode())
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(repr(obj.shape).encode())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        h.update(repr(obj.dtypes if isinstance(obj, pd.DataFrame) else obj.dtype).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        except TypeError:
+            # Unhashable cells (parsed JSON lists); pickling is slower but deterministic
+            h.update(pickle.dumps(obj, protocol=4))
+    elif isinstance(obj, np.ndarray):
+        h.update(f'{obj.dtype}{obj.shape}'.encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else pickle.dumps(obj, protocol=4))
+    elif sp.issparse(obj):
+        csr = obj.tocsr()
+        h.update(f'{csr.dtype}{csr.shape}'.encode())
+        for part in (csr.data, csr.indices, csr.indptr):
+            h.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(str(len(obj)).encode())
+        for item in obj:
+            _update(h, item)
+    elif isinstance(obj, dict):
+        h.update(str(len(obj)).encode())
+        for key, value in obj.items():
+            _update(h, key)
+            _update(h, value)
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        h.update(obj.__qualname__.encode())
+    elif hasattr(obj, '__dict__'):
+        # Objects such as a Surprise Trainset fill attributes lazily (global_mean, ...), so their
+        # state changes without their data changing; stages taking them hash the raw data via key=
+        raise TypeError(f"Cannot fingerprint {type(obj).__qualname__} objects, pass key= to cached_stage")
+    else:
+        h.update(pickle.dumps(obj, protocol=4))
+
+
+def fingerprint(*objs):
+    '''
+    Stable content hash of DataFrames, arrays, sparse matrices, plain containers and scalars.
+
+    Returns:
+        str: Hex digest, identical across processes for equal content.
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    for obj in objs:
+        _update(h, obj)
+    return h.hexdigest()
+
+
+def trainset_ratings(trainset):
+    '''
+    The (raw user id, raw item id, rating) rows a Surprise Trainset was built from.
+
+    For `key=` of stages taking a Trainset: it depends only on the ratings, not on attributes
+    the Trainset computes lazily.
+    '''
+    rows = [(trainset.to_raw_uid(u), trainset.to_raw_iid(i), r) for u, i, r in trainset.all_ratings()]
+    return [pd.DataFrame(rows, columns=['user', 'item', 'rating']), tuple(trainset.rating_scale)]
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return getattr(obj, '__qualname__', repr(obj))
+
+
+class StageCache:
+    '''
+    Directory of pickled stage results, one subdirectory per stage, keyed by fingerprint.
+
+    Args:
+        cache_dir (str, optional): Root directory, defaults to $RECOMM_CACHE_DIR or .cache/stages.
+        max_entries (int): Results kept per stage; older ones are removed on write.
+    '''
+    def __init__(self, cache_dir=None, max_entries=3):
+        self.cache_dir = cache_dir or os.getenv(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.max_entries = max_entries
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, stage, f'{key}.joblib')
+
+    def load(self, stage, key, mmap=False):
+        '''
+        Return (True, value) on a hit and (False, None) on a miss or an unreadable entry.
+        '''
+        path = self.path(stage, key)
+        if not os.path.exists(path):
+            return False, None
+        try:
+            value = joblib.load(path, mmap_mode='r' if mmap else None)
+        except Exception as e:
+            print(f"Ignoring unreadable cache entry {path}: {e}")
+            return False, None
+        os.utime(path)
+        return True, value
+
+    def save(self, stage, key, value):
+        path = self.path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self._prune(os.path.dirname(path))
+
+    def _prune(self, stage_dir):
+        entries = sorted((os.path.join(stage_dir, name) for name in os.listdir(stage_dir) if name.endswith('.joblib')),
+                         key=os.path.getmtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            os.remove(stale)
+
+
+def cached_stage(name=None, files=None, depends=(), mmap=False, cache=None, key=None):
+    '''
+    Decorator caching a stage's result on disk under a key derived from its inputs.
+
+    The key covers the stage's source code, the source modules of `depends`, the content of
+    `files` and the fingerprint of every argument (or of what `key` returns), so a rerun only
+    recomputes stages whose code, parameters or upstream data changed. Results are treated as immutable.
+
+    Only the decorated function's own source is read. Code it calls in other modules is not
+    followed, so a stage that delegates its work must list the callee in `depends`; otherwise
+    edits to the callee keep serving the stale result.
+
+    Args:
+        name (str, optional): Stage name, defaults to the function's qualified name.
+        files (callable, optional): Maps the call arguments to the input file paths the stage reads.
+        depends (tuple): Functions or modules whose source is part of the key; a function adds
+            the source of its whole module.
+        mmap (bool): Memory-map array results on a hit instead of reading them into memory.
+        cache (StageCache, optional): Store to use, defaults to a StageCache in $RECOMM_CACHE_DIR.
+        key (callable, optional): Maps the call arguments to the raw data they were built from
+            (e.g. a ratings DataFrame), fingerprinted instead of the arguments. Required for
+            arguments that are mutable objects rather than data.
+    '''
+    def decorator(func):
+        stage = name or func.__qualname__
+        code_parts = [_source(func)] + [_source(inspect.getmodule(d) or d) for d in depends]
+        code_key = fingerprint(code_parts)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not cache_enabled():
+                return func(*args, **kwargs)
+            store = cache or StageCache()
+            input_files = files(*args, **kwargs) if files else ()
+            inputs = key(*args, **kwargs) if key else (args, kwargs)
+            entry = fingerprint(code_key, [file_digest(path) for path in input_files], inputs)
+
+            started = time.perf_counter()
+            hit, value = store.load(stage, entry, mmap)
+            if hit:
+                print(f"Cache hit for {stage} ({time.perf_counter() - started:.2f}s)")
+                return value
+            value = func(*args, **kwargs)
+            store.save(stage, entry, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+import sys
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+STRING_COLUMNS = ('title', 'overview')
+DICTIONARY_COLUMNS = ('director', 'original_language')
+LIST_COLUMNS = ('genre_names', 'cast_names', 'keyword_names', 'language', 'production_company_names')
+NUMERIC_COLUMNS = {
+    'movie_id': np.int32,
+    'year': np.int16,
+    'runtime': np.float32,
+    'popularity': np.float32,
+    'vote_average': np.float32,
+    'vote_count': np.int32,
+}
+
+
+def _code_dtype(n_values):
+    # Smallest signed type that holds every code and the -1 missing marker
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class StringColumn:
+    '''
+    Arrow-style string column: UTF-8 bytes of all values in one buffer plus start offsets.
+
+    Missing values are stored as empty strings.
+    '''
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if offsets[-1] < np.iinfo(np.int32).max:
+            offsets = offsets.astype(np.int32)
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def to_list(self):
+        buffer = self.data.tobytes()
+        return [buffer[start:end].decode('utf-8') for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.data.nbytes
+
+    def arrays(self):
+        return {'offsets': self.offsets, 'data': self.data}
+
+
+class DictionaryColumn:
+    '''
+    Dictionary-encoded strings: a small integer code per row into a StringColumn of distinct values.
+
+    Code -1 marks a missing value.
+    '''
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_values(cls, values):
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        return cls(codes.astype(_code_dtype(len(uniques))), StringColumn.from_values(list(uniques)))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return self.dictionary[code] if code >= 0 else None
+
+    def to_list(self):
+        names = self.dictionary.to_list()
+        return [names[code] if code >= 0 else None for code in self.codes]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.dictionary.nbytes
+
+    def arrays(self):
+        return {'codes': self.codes, **{f'dictionary_{k}': v for k, v in self.dictionary.arrays().items()}}
+
+
+class ListColumn:
+    '''
+    Arrow-style list column: row i holds values[offsets[i]:offsets[i + 1]], the values being
+    dictionary codes, so a name repeated across movies is stored once.
+    '''
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def from_lists(cls, lists):
+        lists = [value if isinstance(value, (list, tuple, np.ndarray)) else [] for value in lists]
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in lists], out=offsets[1:])
+        offsets = offsets.astype(np.int32) if offsets[-1] < np.iinfo(np.int32).max else offsets
+        return cls(offsets, DictionaryColumn.from_values(list(chain.from_iterable(lists))))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        names = self.values.dictionary
+        return [names[code] for code in self.values.codes[self.offsets[i]:self.offsets[i + 1]]]
+
+    def to_list(self):
+        flat = self.values.to_list()
+        return [flat[start:end] for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.values.nbytes
+
+    def arrays(self):
+        return {'offsets': self.offsets, **{f'values_{k}': v for k, v in self.values.arrays().items()}}
+
+
+def _column_from_arrays(kind, arrays):
+    if kind == 'string':
+        return StringColumn(arrays['offsets'], arrays['data'])
+    if kind == 'dictionary':
+        return DictionaryColumn(arrays['codes'], StringColumn(arrays['dictionary_offsets'], arrays['dictionary_data']))
+    if kind == 'list':
+        values = DictionaryColumn(arrays['values_codes'],
+                                  StringColumn(arrays['values_dictionary_offsets'], arrays['values_dictionary_data']))
+        return ListColumn(arrays['offsets'], values)
+    return arrays['values']
+
+
+def _kind(column):
+    if isinstance(column, StringColumn):
+        return 'string'
+    if isinstance(column, DictionaryColumn):
+        return 'dictionary'
+    if isinstance(column, ListColumn):
+        return 'list'
+    return 'numeric'
+
+
+class CompactCatalog:
+    '''
+    Column store of the movie catalog holding only what training and serving use.
+
+    Strings are packed into byte buffers or dictionary-encoded, list columns are stored as
+    offsets + dictionary codes, and numbers use the narrowest dtype. Parsed crew/cast/keyword
+    dicts, raw JSON strings and other unused columns are dropped.
+
+    Args:
+        columns (dict): Column name to StringColumn, DictionaryColumn, ListColumn or np.ndarray.
+    '''
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, processed_df):
+        '''
+        Build the catalog from the frame returned by handling_missing_values.
+        '''
+        columns = {}
+        for name, dtype in NUMERIC_COLUMNS.items():
+            if name in processed_df.columns:
+                values = pd.to_numeric(processed_df[name], errors='coerce')
+                if np.issubdtype(dtype, np.integer):
+                    values = values.fillna(-1)
+                columns[name] = values.to_numpy(dtype=dtype)
+        for name in STRING_COLUMNS:
+            if name in processed_df.columns:
+                columns[name] = StringColumn.from_values(processed_df[name].tolist())
+        for name in DICTIONARY_COLUMNS:
+            if name in processed_df.columns:
+                columns[name] = DictionaryColumn.from_values(processed_df[name].tolist())
+        for name in LIST_COLUMNS:
+            if name in processed_df.columns:
+                columns[name] = ListColumn.from_lists(processed_df[name].tolist())
+        return cls(columns)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def index(self, movie_id):
+        '''
+        Row of a movie id; raises KeyError for ids that are not in the catalog.
+        '''
+        rows = np.flatnonzero(self.columns['movie_id'] == movie_id)
+        if not rows.size:
+            raise KeyError(movie_id)
+        return int(rows[0])
+
+    def row(self, i):
+        return {name: (column[i].item() if isinstance(column, np.ndarray) else column[i])
+                for name, column in self.columns.items()}
+
+    def to_frame(self, columns=None):
+        '''
+        Materialize (a subset of) the catalog as a DataFrame with Python lists in list columns,
+        e.g. for combined_features or FieldMatrices.fit.
+        '''
+        names = columns or list(self.columns)
+        return pd.DataFrame({name: self.columns[name] if isinstance(self.columns[name], np.ndarray)
+                             else self.columns[name].to_list() for name in names})
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def save(self, path):
+        '''
+        Write every buffer as a .npy file plus a schema file; load can memory-map them.
+        '''
+        os.makedirs(path, exist_ok=True)
+        schema = {'format_version': FORMAT_VERSION, 'n_movies': len(self), 'columns': {}}
+        for name, column in self.columns.items():
+            kind = _kind(column)
+            arrays = {'values': column} if kind == 'numeric' else column.arrays()
+            schema['columns'][name] = {'kind': kind, 'arrays': sorted(arrays)}
+            for key, array in arrays.items():
+                np.save(os.path.join(path, f'{name}.{key}.npy'), array)
+        with open(os.path.join(path, 'schema.json'), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'schema.json')) as f:
+            schema = json.load(f)
+        if schema.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog format version {schema.get('format_version')}")
+        columns = {}
+        for name, spec in schema['columns'].items():
+            arrays = {key: np.load(os.path.join(path, f'{name}.{key}.npy'), mmap_mode='r' if mmap else None)
+                      for key in spec['arrays']}
+            columns[name] = _column_from_arrays(spec['kind'], arrays)
+        return cls(columns)
+
+
+def deep_sizeof(obj, seen=None):
+    '''
+    Bytes held by an object and everything it references (each object counted once).
+
+    Unlike DataFrame.memory_usage(deep=True), nested lists and dicts in object columns are followed.
+    '''
+    seen = set() if seen is None else seen
+    if isinstance(obj, pd.DataFrame):
+        return sum(deep_sizeof(obj[name], seen) for name in obj.columns) + obj.index.memory_usage(deep=True)
+    if isinstance(obj, pd.Series):
+        # The Series is a temporary view; only its values are tracked, since freed ids get reused
+        if obj.dtype != object:
+            return int(obj.memory_usage(deep=True, index=False))
+        values = obj.to_numpy()
+        return values.nbytes + sum(deep_sizeof(value, seen) for value in values)
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def memory_report(processed_df, catalog, kept_df=None):
+    '''
+    Compare the resident size of the preprocessed frame with the compact catalog.
+
+    Args:
+        processed_df (pd.DataFrame): The full preprocessed frame.
+        catalog (CompactCatalog): Catalog built from it.
+        kept_df (pd.DataFrame, optional): What is left of the frame once the catalog replaces it.
+
+    Returns:
+        dict: Total and per-movie bytes of the full frame, of the frame restricted to the catalog's
+        columns, and of the catalog, plus the reduction factors. With kept_df, also the bytes of
+        the kept frame and the reduction of keeping it plus the catalog instead of the full frame.
+    '''
+    n = max(len(catalog), 1)
+    frame_bytes = deep_sizeof(processed_df)
+    same_columns_bytes = deep_sizeof(processed_df[[name for name in catalog.columns if name in processed_df]].copy())
+    report = {
+        'movies': len(catalog),
+        'frame_bytes': frame_bytes,
+        'frame_same_columns_bytes': same_columns_bytes,
+        'catalog_bytes': catalog.nbytes,
+        'frame_bytes_per_movie': frame_bytes / n,
+        'frame_same_columns_bytes_per_movie': same_columns_bytes / n,
+        'catalog_bytes_per_movie': catalog.nbytes / n,
+        'reduction': frame_bytes / max(catalog.nbytes, 1),
+        'reduction_same_columns': same_columns_bytes / max(catalog.nbytes, 1),
+    }
+    if kept_df is not None:
+        kept_bytes = deep_sizeof(kept_df)
+        report['kept_frame_bytes'] = kept_bytes
+        report['reduction_with_kept_frame'] = frame_bytes / max(kept_bytes + catalog.nbytes, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the compact movie catalog and report its memory use.')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--output-dir', help='Save the catalog here')
+    args = parser.parse_args()
+
+    from src.preprocess import load_movie_data, preprocess_and_feature_extraction, handling_missing_values
+    processed_df = handling_missing_values(preprocess_and_feature_extraction(load_movie_data(args.data_dir)))
+    catalog = CompactCatalog.from_frame(processed_df)
+    report = memory_report(processed_df, catalog)
+    print(f"{report['movies']} movies: DataFrame {report['frame_bytes_per_movie']:.0f} B/movie "
+          f"({report['frame_same_columns_bytes_per_movie']:.0f} B/movie for the same columns), "
+          f"catalog {report['catalog_bytes_per_movie']:.0f} B/movie, "
+          f"{report['reduction']:.1f}x smaller ({report['reduction_same_columns']:.1f}x for the same columns)")
+    if args.output_dir:
+        catalog.save(args.output_dir)
+        print(f"Catalog saved to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,39 @@
-import pandas as pd
+import os
+import tempfile
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from src.preprocess import load_movie_data, preprocess_and_feature_extraction, handling_missing_values
+from src.instrumentation import instrument, log_trace_to_mlflow, sampling_profiler
+from src.tracking import get_tracker
+from src.cache import cached_stage
+from src.embeddings import fit_lsa_embeddings, embedding_similarity, neighbor_overlap, save_embeddings
+from src.field_features import (FIELDS, FieldMatrices, WeightedFieldVectorizer, combined_features, entity_tokens,
+                                label_overlap_at_k, tuned_weights)
+from src.catalog import CompactCatalog, memory_report
 import mlflow
 from mlflow.tracking import MlflowClient
 from prefect import Flow, task
 import optuna
 from optuna.samplers import TPESampler
 
-mlflow.set_tracking_uri("http://localhost:5000")
+mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000"))
 EXPERIMENT_NAME = 'cb_training'
 mlflow.set_experiment(EXPERIMENT_NAME)
 MODEL_NAME = 'CB_Movie_Recomm_Model'
 HYO_EXPERIMENT_NAME = 'cb_tuning'
+# Frame columns the features are built from; titles and metadata are read from the compact catalog
+FEATURE_COLUMNS = ['movie_id', *FIELDS]
 client = MlflowClient()
+tracker = get_tracker()
 
 
 class MovieRecommendationSystem:
     @staticmethod
     @task
+    @instrument(rows=len)
+    @cached_stage(files=lambda: [os.path.join('data', 'tmdb_5000_movies.csv'), os.path.join('data', 'tmdb_5000_credits.csv')],
+                  depends=(load_movie_data,))
     def load_and_preprocess_data():
         merged_df = load_movie_data()
         processed_df = preprocess_and_feature_extraction(merged_df)
@@ -28,13 +42,16 @@ class MovieRecommendationSystem:
     
     @staticmethod
     @task
+    @instrument(rows=len)
     def preprocess_text_features(processed_df):
-        processed_df['combined_features'] = processed_df[['cast_names', 'language', 'keyword_names', 'genre_names', 'director', 'overview']].apply(lambda x: ' '.join(map(str, x)), axis=1)
+        processed_df['combined_features'] = combined_features(processed_df)
         return processed_df
 
     
     @staticmethod
     @task
+    @instrument(rows=lambda result: result[1].shape[0])
+    @cached_stage()
     def create_tfidf_matrix(features):
         tfidf = TfidfVectorizer(stop_words='english')
         features_matrix = tfidf.fit_transform(features)
@@ -42,35 +59,110 @@ class MovieRecommendationSystem:
     
     @staticmethod
     @task
+    @instrument(rows=lambda result: result.shape[0])
+    @cached_stage(mmap=True)
     def calculate_cosine_similarity(features_matrix):
         return cosine_similarity(features_matrix, features_matrix)
     
     @staticmethod
     @task
-    def get_content_based_recommendations(movie_id, cosine_sim, processed_df, top_n=10):
-        indices = pd.Series(processed_df.index, index=processed_df['movie_id'])
-        idx = indices[movie_id]
+    @instrument(rows=lambda result: result.n_movies)
+    @cached_stage(depends=(FieldMatrices.fit,))
+    def create_field_matrices(processed_df):
+        # One vectorizer and sparse matrix per field, so field weights can change without refitting
+        return FieldMatrices.fit(processed_df)
+
+    @staticmethod
+    @task
+    @instrument(rows=lambda result: result.shape[0])
+    def combine_field_matrices(field_matrices, weights=None):
+        return field_matrices.combine(weights)
+
+    @staticmethod
+    @task
+    @instrument(rows=lambda result: result[1].shape[0])
+    @cached_stage(depends=(fit_lsa_embeddings,))
+    def create_lsa_embeddings(features_matrix, n_components=128):
+        # Optional low-rank stage: dense float32 embeddings instead of the vocabulary-sized TF-IDF space
+        return fit_lsa_embeddings(features_matrix, n_components)
+
+    @staticmethod
+    @task
+    @instrument(rows=lambda result: result.shape[0])
+    def calculate_embedding_similarity(embeddings):
+        return embedding_similarity(embeddings)
+
+    @staticmethod
+    @task
+    @instrument()
+    def log_embeddings(embeddings, processed_df, features_matrix, k=10):
+        overlap = neighbor_overlap(features_matrix, embeddings, k)
+        tracker.log_params({'lsa_dimension': embeddings.shape[1]})
+        tracker.log_metrics({f'lsa_overlap_at_{k}': overlap})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_embeddings(tmp_dir, embeddings, processed_df['movie_id'].to_numpy())
+            mlflow.log_artifacts(tmp_dir, "embeddings")
+        return overlap
+
+    @staticmethod
+    @task
+    @instrument()
+    def log_catalog(processed_df):
+        # Compact column store of the catalog for lookups and serving. The frame keeps only the feature
+        # columns, so the metrics compare the full frame with what is held instead: kept frame + catalog
+        catalog = CompactCatalog.from_frame(processed_df)
+        feature_df = processed_df[FEATURE_COLUMNS].copy()
+        report = memory_report(processed_df, catalog, feature_df)
+        tracker.log_metrics({'catalog_bytes_per_movie': report['catalog_bytes_per_movie'],
+                             'frame_bytes_per_movie': report['frame_bytes_per_movie'],
+                             'kept_frame_bytes_per_movie': report['kept_frame_bytes'] / max(len(catalog), 1),
+                             'catalog_memory_reduction': report['reduction_with_kept_frame']})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            catalog.save(tmp_dir)
+            mlflow.log_artifacts(tmp_dir, "catalog")
+        return catalog, feature_df
+
+    @staticmethod
+    @task
+    @instrument()
+    def get_content_based_recommendations(movie_id, cosine_sim, catalog, top_n=10):
+        # Rows of the similarity matrix follow the catalog order
+        idx = catalog.index(movie_id)
         sim_scores = list(enumerate(cosine_sim[idx]))
         sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
         sim_scores = sim_scores[1:top_n + 1]
         movie_indices = [i[0] for i in sim_scores]
 
-        recommendations = processed_df.iloc[movie_indices]['title'].tolist()
+        titles = catalog['title']
+        recommendations = [titles[i] for i in movie_indices]
         return recommendations
     
     @staticmethod
     @task
-    def log_model_and_artifacts(tfidf_model, processed_df, cosine_sim):
-        mlflow.sklearn.log_model(tfidf_model, "tfidf_model") 
+    @instrument()
+    def log_model_and_artifacts(field_matrices, processed_df, cosine_sim, field_weights=None):
+        # The served features: per-field vectorizers and weights, so the model's transform reproduces them.
+        # The transformer and the name analyzer are repo code, which the skops format only loads when trusted
+        trusted = [f'{obj.__module__}.{obj.__qualname__}' for obj in (WeightedFieldVectorizer, entity_tokens)]
+        mlflow.sklearn.log_model(field_matrices.model(field_weights), "field_model", skops_trusted_types=trusted)
+
+        if field_weights is not None:
+            # Weights the served similarity was built with
+            tracker.log_params({f'field_weight_{field}': weight for field, weight in field_weights.items()})
+            mlflow.log_dict(field_weights, "artifacts/field_weights.json")
 
         np.save("cosine_similarity.npy", cosine_sim)  
         mlflow.log_artifact("cosine_similarity.npy", "artifacts")
+        # Row order of the similarity matrix, needed to serve it by movie id
+        np.save("movie_ids.npy", processed_df['movie_id'].to_numpy())
+        mlflow.log_artifact("movie_ids.npy", "artifacts")
         return "Log and save complete"
     
 
     @staticmethod
     # @task
-    def evaluate_cb(processed_df):
+    @instrument()
+    def evaluate_cb(processed_df, catalog):
         # Select a random movie for evaluation
         random_movie_index = np.random.randint(0, len(processed_df))
         random_movie_id = processed_df.iloc[random_movie_index]['movie_id']
@@ -82,42 +174,42 @@ class MovieRecommendationSystem:
         cosine_sim = MovieRecommendationSystem.calculate_cosine_similarity(features_matrix)
 
         # Get content-based recommendations for the random movie
-        recommendations = MovieRecommendationSystem.get_content_based_recommendations(random_movie_id, cosine_sim, processed_df)
+        recommendations = MovieRecommendationSystem.get_content_based_recommendations(random_movie_id, cosine_sim, catalog)
 
         # Evaluate and print the results
-        print(f"Randomly selected movie: {processed_df.iloc[random_movie_index]['title']}")
+        selected_movie = catalog['title'][random_movie_index]
+        print(f"Randomly selected movie: {selected_movie}")
         print(f"Content-based recommendations: {recommendations}")
 
         # Return the selected movie and recommendations
         return {
-            'selected_movie': processed_df.iloc[random_movie_index]['title'],
+            'selected_movie': selected_movie,
             'recommendations': recommendations
         }
 
     @staticmethod
     # @task
-    def run_optimization(num_trials: int) -> dict:
-        mlflow.set_experiment(HYO_EXPERIMENT_NAME)
-
-        def objective(trial):
-            tfidf_max_features = trial.suggest_int('tfidf_max_features', 1000, 10000)
-            stop_words = trial.suggest_categorical('stop_words', ['english', None])
-
-            # Load and preprocess data
+    @instrument()
+    def run_optimization(num_trials: int, label_field='genre_names', k=10, processed_df=None) -> dict:
+        # Fields are vectorized once; each trial only re-weights the cached per-field matrices
+        if processed_df is None:
             processed_df = MovieRecommendationSystem.load_and_preprocess_data()
+        field_matrices = MovieRecommendationSystem.create_field_matrices(processed_df)
+        tuned_fields = [field for field in field_matrices.fields if field != label_field]
 
-            # Preprocess text features
-            processed_df = MovieRecommendationSystem.preprocess_text_features(processed_df)
+        def objective(trial):
+            weights = {field: trial.suggest_float(f'weight_{field}', 0.0, 2.0) for field in tuned_fields}
+            if not any(weights.values()):
+                return 0.0
 
-            # Evaluate the model
-            recommendations = MovieRecommendationSystem.evaluate_cb(processed_df)
-            metric_value = len(recommendations)  # Just an examplec
+            # The label field is held out of the features and scores the neighbors
+            features_matrix = MovieRecommendationSystem.combine_field_matrices(field_matrices, weights)
+            metric_value = label_overlap_at_k(features_matrix, processed_df[label_field], k)
 
             # Log hyperparameters and metric
-            with mlflow.start_run(nested=True):
-                mlflow.set_tag("model", "ContentBased")
-                mlflow.log_params({'tfidf_max_features': tfidf_max_features, 'stop_words': stop_words})
-                mlflow.log_metric("metric_value", metric_value)
+            with tracker.start_run(experiment_name=HYO_EXPERIMENT_NAME, tags={"model": "ContentBased"}) as run:
+                run.log_params({f'weight_{field}': weight for field, weight in weights.items()})
+                run.log_metric(f"{label_field}_overlap_at_{k}", metric_value)
 
             return metric_value
 
@@ -127,11 +219,18 @@ class MovieRecommendationSystem:
 
         return study.best_params
 
+    @staticmethod
+    @task
+    def log_trace():
+        # Per-task timings, memory and throughput; no-op unless RECOMM_TRACE=1
+        log_trace_to_mlflow()
+        return None
+
     @staticmethod
     @task
     def end_mlflow_run():
         try:
-            # Your existing code here
+            tracker.flush()
             mlflow.end_run()
         except Exception as e:
             print(f"An error occurred: {e}")
@@ -142,16 +241,25 @@ class MovieRecommendationSystem:
     def main_flow():
         MovieRecommendationSystem()
         load_data_task = MovieRecommendationSystem.load_and_preprocess_data()
+        # The full frame is released here; only the feature columns go on
+        catalog_task, load_data_task = MovieRecommendationSystem.log_catalog(load_data_task)
         preprocess_task = MovieRecommendationSystem.preprocess_text_features(load_data_task)
-        matrix_task = MovieRecommendationSystem.create_tfidf_matrix(preprocess_task)
-        log_params_task = MovieRecommendationSystem.log_model_and_artifacts(matrix_task, preprocess_task, matrix_task)
-        recommendations_task = MovieRecommendationSystem.get_content_based_recommendations(movie_id=19995, cosine_sim=log_params_task, processed_df=preprocess_task)
-        ev_metrics = MovieRecommendationSystem.evaluate_cb(processed_df=preprocess_task)
-        optimize_hyperparameters_task = MovieRecommendationSystem.run_optimization(num_trials=1)
+        optimize_hyperparameters_task = MovieRecommendationSystem.run_optimization(num_trials=1, processed_df=preprocess_task)
+        # Serve the similarity of the field-weighted features with the best weights found
+        field_weights = tuned_weights(optimize_hyperparameters_task)
+        field_matrices_task = MovieRecommendationSystem.create_field_matrices(preprocess_task)
+        weighted_matrix_task = MovieRecommendationSystem.combine_field_matrices(field_matrices_task, field_weights)
+        cosine_sim_task = MovieRecommendationSystem.calculate_cosine_similarity(weighted_matrix_task)
+        log_params_task = MovieRecommendationSystem.log_model_and_artifacts(field_matrices_task, preprocess_task, cosine_sim_task, field_weights)
+        recommendations_task = MovieRecommendationSystem.get_content_based_recommendations(movie_id=19995, cosine_sim=cosine_sim_task, catalog=catalog_task)
+        ev_metrics = MovieRecommendationSystem.evaluate_cb(processed_df=preprocess_task, catalog=catalog_task)
         print(recommendations_task)
         print(ev_metrics['recommendations'])
+        trace_task = MovieRecommendationSystem.log_trace()
         end_mlflow_task = MovieRecommendationSystem.end_mlflow_run()
         return end_mlflow_task
 
 if __name__ == "__main__":
-    MovieRecommendationSystem().main_flow()
+    # Set RECOMM_PROFILE=<file> for a sampled flame graph of the whole run
+    with sampling_profiler(os.getenv("RECOMM_PROFILE")):
+        MovieRecommendationSystem().main_flow()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import pandas as pd
 from surprise import Dataset, Reader, SVDpp, accuracy
 from surprise.model_selection import train_test_split
@@ -9,21 +11,30 @@ from mlflow.entities.model_registry.model_version import ModelVersion
 import optuna
 from optuna.samplers import TPESampler
 from prefect import task, Flow
-from config import cf_config
+from src.config import cf_config
+from src.compact_model import CompactCFModel
+from src.serve import notify_model_version
+from src.instrumentation import instrument, log_trace_to_mlflow, sampling_profiler
+from src.tracking import get_tracker
+from src.cache import cached_stage, trainset_ratings
 # Set MLflow tracking URI
-MLFLOW_TRACKING_URI = mlflow.set_tracking_uri("http://localhost:5000")
+MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
+mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
 
 # Set other MLflow configurations
-EXPERIMENT_NAME = cf_config['experiment_name']
-HYO_EXPERIMENT_NAME = cf_config['hyperparameter_opt_experiment_name']
-MODEL_NAME = cf_config['model_name']
+EXPERIMENT_NAME = cf_config.experiment_name
+HYO_EXPERIMENT_NAME = cf_config.hyperparameter_opt_experiment_name
+MODEL_NAME = cf_config.model_name
 mlflow.set_experiment(EXPERIMENT_NAME)
 client = MlflowClient(MLFLOW_TRACKING_URI)
+# Params, metrics and tags are sent in the background so tracking latency never blocks training
+tracker = get_tracker()
 
 
 class MovieRecommendationFlow:
     @staticmethod
     @task
+    @instrument(rows=len)
     def load_rating_data():
         try:
             data = pd.read_csv('data/ratings_small.csv')
@@ -35,12 +46,15 @@ class MovieRecommendationFlow:
     @staticmethod
     @task
     def start_mlflow_run():
-        mlflow.start_run(run_name="SVD++")
+        # Explicit experiment: the module-level set_experiment is process-wide and cb.py sets its own
+        mlflow.start_run(run_name="SVD++", experiment_id=mlflow.get_experiment_by_name(EXPERIMENT_NAME).experiment_id)
         mlflow.set_tag("model", "SVDpp")
         return None
 
     @staticmethod
     @task
+    @instrument(rows=lambda result: result[0].n_ratings)
+    @cached_stage()
     def prepare_data(data):
         print("Data Shape Before Preparation:", data.shape) 
         reader = Reader(rating_scale=(1, 5))
@@ -50,6 +64,8 @@ class MovieRecommendationFlow:
 
     @staticmethod
     @task
+    @instrument(rows=lambda result: result[0].trainset.n_ratings)
+    @cached_stage(key=lambda train_data: trainset_ratings(train_data))
     def train_svd_model(train_data):
         n_factors = 25
         n_epochs = 25
@@ -62,14 +78,22 @@ class MovieRecommendationFlow:
     @staticmethod
     @task
     def log_parameters_and_recommendations(svd_model, n_factors, n_epochs, lr_all, reg_all, test_data):  
-        mlflow.log_param('n_factors', n_factors)
-        mlflow.log_param('n_epochs', n_epochs)
-        mlflow.log_param('lr_all', lr_all)
-        mlflow.log_param('reg_all', reg_all)
+        tracker.log_params({'n_factors': n_factors, 'n_epochs': n_epochs, 'lr_all': lr_all, 'reg_all': reg_all})
         print("Parameters logged successfully.")
 
     @staticmethod
     @task
+    @instrument()
+    def export_compact_model(svd_model):
+        # Scoring-only export next to the pickled model: memory-mappable arrays instead of the full trainset
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            CompactCFModel.from_surprise(svd_model).save(tmp_dir)
+            mlflow.log_artifacts(tmp_dir, "compact_model")
+        print("Compact model exported successfully.")
+
+    @staticmethod
+    @task
+    @instrument()
     def get_cf_recommendations(user_id, model, data, top_n=10):
         print("Data Shape in get_cf_recommendations:", data.shape)  
         print("Data Head in get_cf_recommendations:", data.head()) 
@@ -86,17 +110,15 @@ class MovieRecommendationFlow:
         RMSE = accuracy.rmse(top_predictions, verbose=False)
         MAE = accuracy.mae(top_predictions, verbose=False)
 
-        mlflow.log_metric("RMSE", RMSE)
-        mlflow.log_metric("MAE", MAE)
+        tracker.log_metrics({"RMSE": RMSE, "MAE": MAE})
 
         return recommended_movies
     
 
     @staticmethod
     @task
+    @instrument()
     def run_optimization(num_trials: int, train_data, test_data) -> dict:
-        mlflow.set_experiment(HYO_EXPERIMENT_NAME)
-
         def objective(trial):
             params = {
                 'n_factors': trial.suggest_int('n_factors', 5, 100),
@@ -105,9 +127,8 @@ class MovieRecommendationFlow:
                 'reg_all': trial.suggest_float('reg_all', 0.01, 1.0),
             }
 
-            with mlflow.start_run(nested=True):
-                mlflow.set_tag("model", "SVDpp")
-                mlflow.log_params(params)
+            with tracker.start_run(experiment_name=HYO_EXPERIMENT_NAME, tags={"model": "SVDpp"}) as run:
+                run.log_params(params)
 
                 svd_model = SVDpp(**params)
                 svd_model.fit(train_data)
@@ -116,7 +137,7 @@ class MovieRecommendationFlow:
                 predictions = svd_model.test(test_set)
 
                 rmse = accuracy.rmse(predictions, verbose=False)
-                mlflow.log_metric("rmse", rmse)
+                run.log_metric("rmse", rmse)
 
                 return rmse
 
@@ -129,7 +150,10 @@ class MovieRecommendationFlow:
 
     @staticmethod
     @task
+    @instrument()
     def register_and_set_stage_model(client):
+        # The search below must see everything logged so far
+        tracker.flush()
         # Search for the best model runs
         best_model_runs = client.search_runs(
             experiment_ids=["1"],
@@ -175,13 +199,25 @@ class MovieRecommendationFlow:
             )
 
             print(f'The version {version} of {model_name} model has been set to {new_stage}')
+
+            # Invalidate the serving cache and hot-swap the model when a new version goes live
+            if new_stage == "Production":
+                notify_model_version(version, artifact_uri=f"runs:/{run_id}/compact_model")
         else:
             print("No best model runs found!")
 
 
+    @staticmethod
+    @task
+    def log_trace():
+        # Per-task timings, memory and throughput; no-op unless RECOMM_TRACE=1
+        log_trace_to_mlflow()
+        return None
+
     @staticmethod
     @task
     def end_mlflow_run():
+        tracker.flush()
         mlflow.end_run()
         return None
 
@@ -195,14 +231,17 @@ class MovieRecommendationFlow:
         log_task = MovieRecommendationFlow.log_parameters_and_recommendations(
             trained_model, n_factors, n_epochs, lr_all, reg_all, test_data
         )
-        
+        export_task = MovieRecommendationFlow.export_compact_model(trained_model)
+
         recommendations_task = MovieRecommendationFlow.get_cf_recommendations(user_id=1930, model=trained_model, data=data_task)
         best_params = MovieRecommendationFlow.run_optimization(num_trials=1, train_data=train_data, test_data=test_data)
         register_model_task = MovieRecommendationFlow.register_and_set_stage_model(client)
-        
+        trace_task = MovieRecommendationFlow.log_trace()
         end_mlflow_task = MovieRecommendationFlow.end_mlflow_run()
         return end_mlflow_task
 
 
 if __name__ == '__main__':
-    MovieRecommendationFlow.main_flow()
+    # Set RECOMM_PROFILE=<file> for a sampled flame graph of the whole run
+    with sampling_profiler(os.getenv("RECOMM_PROFILE")):
+        MovieRecommendationFlow.main_flow()
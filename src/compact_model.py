@@ -0,0 +1,287 @@
+import json
+import os
+import pickle
+import subprocess
+import sys
+import numpy as np
+
+FORMAT_VERSION = 1
+ARRAY_NAMES = ['user_ids', 'item_ids', 'user_factors', 'item_factors', 'user_bias', 'item_bias',
+               'seen_indptr', 'seen_indices']
+
+
+class CompactCFModel:
+    '''
+    Scoring-only export of a Surprise matrix-factorization model (SVD or SVDpp).
+
+    Only the arrays needed for scoring are kept: factor and bias arrays ordered by raw id, the
+    sorted raw ids themselves (looked up with np.searchsorted instead of `raw2inner_id` dicts)
+    and a CSR index of the items each user rated. For SVDpp the implicit feedback term
+    |N(u)|^-1/2 * sum_j y_j is folded into the user factors at export time, so the trainset is
+    not needed to score. Arrays are stored as .npy files and loaded memory-mapped.
+
+    Args:
+        arrays (dict): Arrays listed in ARRAY_NAMES.
+        global_mean (float): Global rating mean bias term (0 for unbiased models).
+        rating_scale (tuple): (min, max) rating used to clip estimates.
+        default_estimate (float, optional): Estimate of pairs with an unknown user or item, for models
+            that cannot score them (unbiased SVD, where Surprise falls back to the trainset mean).
+            None for biased models, which score unknowns with the biases they know.
+    '''
+    def __init__(self, arrays, global_mean, rating_scale, default_estimate=None):
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.global_mean = float(global_mean)
+        self.rating_scale = tuple(rating_scale)
+        self.default_estimate = None if default_estimate is None else float(default_estimate)
+
+    @classmethod
+    def from_surprise(cls, algo, dtype=np.float32):
+        '''
+        Build a compact model from a fitted Surprise SVD or SVDpp model.
+
+        Args:
+            algo: Fitted `surprise.SVD` or `surprise.SVDpp` instance.
+            dtype: float32 (default) or float16 storage for factors and biases.
+
+        Returns:
+            CompactCFModel: The exported model.
+        '''
+        # Imported here so the module needs only NumPy to load and score, as in the recommendation Lambda
+        from scipy import sparse
+
+        trainset = algo.trainset
+        raw_users = np.array([trainset.to_raw_uid(u) for u in range(trainset.n_users)])
+        raw_items = np.array([trainset.to_raw_iid(i) for i in range(trainset.n_items)])
+        user_order = np.argsort(raw_users, kind='stable')
+        item_order = np.argsort(raw_items, kind='stable')
+        item_position = np.empty_like(item_order)
+        item_position[item_order] = np.arange(item_order.size)
+
+        rows, cols = [], []
+        for u, ratings in trainset.ur.items():
+            rows.extend([u] * len(ratings))
+            cols.extend(j for j, _ in ratings)
+        rated = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                  shape=(trainset.n_users, trainset.n_items))
+
+        user_factors = np.asarray(algo.pu, dtype=np.float64)
+        if hasattr(algo, 'yj'):
+            counts = np.asarray(rated.sum(axis=1)).ravel()
+            implicit = rated @ np.asarray(algo.yj, dtype=np.float64)
+            user_factors = user_factors + implicit / np.sqrt(np.maximum(counts, 1))[:, None]
+
+        biased = getattr(algo, 'biased', True)
+        user_bias = np.asarray(algo.bu) if biased else np.zeros(trainset.n_users)
+        item_bias = np.asarray(algo.bi) if biased else np.zeros(trainset.n_items)
+
+        seen = rated[user_order].tocsr()
+        seen.indices = item_position[seen.indices]
+        seen.sort_indices()
+
+        arrays = {
+            'user_ids': raw_users[user_order],
+            'item_ids': raw_items[item_order],
+            'user_factors': user_factors[user_order].astype(dtype),
+            'item_factors': np.asarray(algo.qi)[item_order].astype(dtype),
+            'user_bias': user_bias[user_order].astype(dtype),
+            'item_bias': item_bias[item_order].astype(dtype),
+            'seen_indptr': seen.indptr.astype(np.int64),
+            'seen_indices': seen.indices.astype(np.int32),
+        }
+        if biased:
+            return cls(arrays, trainset.global_mean, trainset.rating_scale)
+        return cls(arrays, 0.0, trainset.rating_scale, default_estimate=trainset.global_mean)
+
+    def save(self, path):
+        '''
+        Write the model as one .npy file per array plus a small meta.json.
+        '''
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'global_mean': self.global_mean,
+            'rating_scale': list(self.rating_scale),
+            'default_estimate': self.default_estimate,
+            'n_factors': int(self.user_factors.shape[1]),
+            'dtype': str(self.user_factors.dtype),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''
+        Load a model written by `save`, memory-mapping the arrays by default.
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format {meta['format_version']}")
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(arrays, meta['global_mean'], meta['rating_scale'], meta.get('default_estimate'))
+
+    @staticmethod
+    def _lookup(sorted_ids, ids):
+        # No cast to the stored dtype: it would truncate longer string ids into false matches
+        ids = np.asarray(ids)
+        if sorted_ids.size == 0:
+            return np.zeros(ids.shape, dtype=np.int64), np.zeros(ids.shape, dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), sorted_ids.size - 1)
+        return positions, sorted_ids[positions] == ids
+
+    def predict(self, user_ids, item_ids):
+        '''
+        Estimate ratings for (user, item) pairs given as raw ids, matching Surprise's handling of unknowns.
+
+        Args:
+            user_ids (array-like): Raw user ids.
+            item_ids (array-like): Raw item ids, same length as user_ids.
+
+        Returns:
+            np.ndarray: Clipped rating estimates.
+        '''
+        users, known_users = self._lookup(self.user_ids, user_ids)
+        items, known_items = self._lookup(self.item_ids, item_ids)
+        est = np.full(users.shape, self.global_mean, dtype=np.float32)
+        est[known_users] += self.user_bias[users[known_users]]
+        est[known_items] += self.item_bias[items[known_items]]
+        both = known_users & known_items
+        dots = np.einsum('ij,ij->i', self.user_factors[users[both]].astype(np.float32),
+                         self.item_factors[items[both]].astype(np.float32))
+        est[both] += dots
+        if self.default_estimate is not None:
+            est[~both] = self.default_estimate
+        return np.clip(est, *self.rating_scale)
+
+    def recommend(self, user_ids, top_n=10, exclude_seen=True):
+        '''
+        Rank every item for a batch of raw user ids with one GEMM.
+
+        Args:
+            user_ids (array-like): Raw user ids.
+            top_n (int): Number of items to return per user.
+            exclude_seen (bool): Skip items the user rated in the training set.
+
+        Returns:
+            list: One (item_ids, estimates) tuple per user; empty arrays for unknown users.
+        '''
+        users, known = self._lookup(self.user_ids, user_ids)
+        top_n = min(top_n, self.item_ids.size)
+        item_factors = np.asarray(self.item_factors, dtype=np.float32)
+        base = self.global_mean + np.asarray(self.item_bias, dtype=np.float32)
+        scores = self.user_factors[users[known]].astype(np.float32) @ item_factors.T
+        scores += base
+        scores += self.user_bias[users[known]].astype(np.float32)[:, None]
+
+        results, row = [], 0
+        for user, is_known in zip(users, known):
+            if not is_known:
+                results.append((self.item_ids[:0], np.empty(0, dtype=np.float32)))
+                continue
+            user_scores = scores[row]
+            row += 1
+            if exclude_seen:
+                user_scores[self.seen_indices[self.seen_indptr[user]:self.seen_indptr[user + 1]]] = -np.inf
+            n = min(top_n, int(np.isfinite(user_scores).sum()))
+            if n == 0:
+                results.append((self.item_ids[:0], np.empty(0, dtype=np.float32)))
+                continue
+            candidates = np.argpartition(-user_scores, n - 1)[:n]
+            candidates = candidates[np.argsort(-user_scores[candidates])]
+            results.append((self.item_ids[candidates], np.clip(user_scores[candidates], *self.rating_scale)))
+        return results
+
+
+_LOAD_SNIPPET = '''
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+{imports}
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+rss_before = rss_kb()
+started = time.perf_counter()
+{load}
+load_s = time.perf_counter() - started
+{score}
+print(json.dumps({{'load_s': load_s, 'first_score_s': time.perf_counter() - started - load_s,
+                  'rss_delta_kb': rss_kb() - rss_before}}))
+'''
+
+
+def _measure(code):
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Top-N for one user the way the flow ranks with Surprise: predict every unseen item, then sort
+_SURPRISE_TOP_N = '''
+trainset = model.trainset
+seen = {{item for item, _ in trainset.ur[trainset.to_inner_uid({user_id!r})]}}
+predictions = [model.predict({user_id!r}, trainset.to_raw_iid(item)) for item in trainset.all_items() if item not in seen]
+top = sorted(predictions, key=lambda prediction: prediction.est, reverse=True)[:{top_n}]
+'''
+
+
+def benchmark_load(algo, workdir, user_id, dtype=np.float32, top_n=10):
+    '''
+    Compare cold-start load time and RSS of the pickled Surprise model against the compact export.
+
+    Each format is loaded in a fresh interpreter after its libraries are imported, so the numbers
+    cover only deserialization and the first recommendation. Both sides compute the same thing:
+    the top-N unseen items of `user_id` (Surprise by predicting every unseen item and sorting).
+    RSS is read from /proc (Linux).
+
+    Args:
+        algo: Fitted Surprise SVD/SVDpp model.
+        workdir (str): Directory for the pickled and compact copies.
+        user_id: Raw user id used for the first recommendation; must be in the trainset.
+        dtype: Storage dtype for the compact export.
+        top_n (int): Number of items recommended.
+
+    Returns:
+        dict: Size on disk, load time, first-score time and RSS growth for both formats.
+    '''
+    os.makedirs(workdir, exist_ok=True)
+    pickle_path = os.path.join(workdir, 'model.pkl')
+    compact_path = os.path.join(workdir, 'compact_model')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(algo, f, protocol=pickle.HIGHEST_PROTOCOL)
+    CompactCFModel.from_surprise(algo, dtype=dtype).save(compact_path)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {
+        'pickle': _measure(_LOAD_SNIPPET.format(
+            root=root,
+            imports='import pickle, surprise',
+            load=f'model = pickle.load(open({pickle_path!r}, "rb"))',
+            score=_SURPRISE_TOP_N.format(user_id=user_id, top_n=top_n),
+        )),
+        'compact': _measure(_LOAD_SNIPPET.format(
+            root=root,
+            imports='from src.compact_model import CompactCFModel',
+            load=f'model = CompactCFModel.load({compact_path!r})',
+            score=f'model.recommend([{user_id!r}], top_n={top_n})',
+        )),
+    }
+    results['pickle']['size_bytes'] = os.path.getsize(pickle_path)
+    results['compact']['size_bytes'] = sum(os.path.getsize(os.path.join(compact_path, f))
+                                           for f in os.listdir(compact_path))
+    return results
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from surprise import Dataset, Reader, SVDpp
+
+    ratings = pd.read_csv('data/ratings_small.csv')
+    trainset = Dataset.load_from_df(ratings[['userId', 'movieId', 'rating']], Reader(rating_scale=(1, 5))).build_full_trainset()
+    model = SVDpp(n_factors=25, n_epochs=5)
+    model.fit(trainset)
+    for fmt, stats in benchmark_load(model, 'compact_benchmark', user_id=1).items():
+        print(fmt, stats)
@@ -0,0 +1,157 @@
+import argparse
+import os
+import time
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from src.field_features import sparse_top_k
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+MOVIE_IDS_FILE = 'movie_ids.npy'
+
+
+def fit_lsa_embeddings(features_matrix, n_components=128, n_iter=5, random_state=42):
+    '''
+    Reduce a TF-IDF matrix to dense, L2-normalized LSA embeddings with randomized truncated SVD.
+
+    Dot products between rows of the result are cosine similarities in the latent space.
+
+    Args:
+        features_matrix (scipy.sparse matrix): (n_movies, vocabulary) TF-IDF matrix.
+        n_components (int): Embedding dimension, e.g. 64-256; capped below the matrix rank bound.
+        n_iter (int): Power iterations of the randomized solver.
+        random_state (int): Seed of the randomized solver.
+
+    Returns:
+        tuple: Fitted TruncatedSVD and the (n_movies, n_components) float32 embeddings.
+    '''
+    n_components = min(n_components, min(features_matrix.shape) - 1)
+    svd = TruncatedSVD(n_components=n_components, algorithm='randomized', n_iter=n_iter, random_state=random_state)
+    embeddings = svd.fit_transform(features_matrix).astype(np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.maximum(norms, np.finfo(np.float32).tiny)
+    return svd, embeddings
+
+
+def embedding_similarity(embeddings):
+    '''
+    Full (n_movies, n_movies) float32 cosine similarity of normalized embeddings as a single GEMM.
+    '''
+    return embeddings @ embeddings.T
+
+
+def top_k_neighbors(embeddings, k=10, rows=None, batch_size=1024):
+    '''
+    Most similar movies for each query row, computed blockwise without materializing the full matrix.
+
+    Args:
+        embeddings (np.ndarray): (n_movies, dim) L2-normalized embeddings, may be memory-mapped.
+        k (int): Neighbors per row, the row itself excluded.
+        rows (np.ndarray, optional): Query row indices, defaults to every row.
+        batch_size (int): Query rows per GEMM block; bounds memory to batch_size * n_movies floats.
+
+    Returns:
+        tuple: (len(rows), k) neighbor indices and their similarities, best first.
+    '''
+    rows = np.arange(embeddings.shape[0]) if rows is None else np.asarray(rows)
+    k = min(k, embeddings.shape[0] - 1)
+    indices = np.empty((rows.size, k), dtype=np.int64)
+    scores = np.empty((rows.size, k), dtype=np.float32)
+    for start in range(0, rows.size, batch_size):
+        block_rows = rows[start:start + batch_size]
+        block = embeddings[block_rows] @ embeddings.T
+        block[np.arange(block_rows.size), block_rows] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:start + block_rows.size] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + block_rows.size] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def neighbor_overlap(features_matrix, embeddings, k=10, sample_size=500, seed=42):
+    '''
+    Mean overlap@k between the exact TF-IDF cosine neighbors and the embedding neighbors.
+
+    Args:
+        features_matrix (scipy.sparse matrix): TF-IDF matrix (rows L2-normalized, as TfidfVectorizer returns).
+        embeddings (np.ndarray): LSA embeddings of the same movies.
+        k (int): Neighborhood size.
+        sample_size (int): Number of random query movies.
+        seed (int): Seed of the query sample.
+
+    Returns:
+        float: Average fraction of the exact top-k neighbors the embeddings also return, in [0, 1].
+    '''
+    n = features_matrix.shape[0]
+    k = min(k, n - 1)
+    rows = np.random.default_rng(seed).choice(n, size=min(sample_size, n), replace=False)
+    exact = sparse_top_k(features_matrix, rows, k)
+    approx, _ = top_k_neighbors(embeddings, k, rows)
+    overlaps = [len(set(a) & set(b)) / k for a, b in zip(exact, approx)]
+    return float(np.mean(overlaps))
+
+
+def evaluate_dimensions(features_matrix, dimensions=(64, 128, 256), k=10, sample_size=500, seed=42):
+    '''
+    Compare embedding sizes by neighbor overlap against raw TF-IDF, fit time and artifact size.
+
+    Returns:
+        list: One dict per dimension with overlap_at_k, fit_s, embedding_mb and explained_variance.
+    '''
+    results = []
+    for n_components in dimensions:
+        started = time.perf_counter()
+        svd, embeddings = fit_lsa_embeddings(features_matrix, n_components)
+        fit_s = time.perf_counter() - started
+        results.append({
+            'dimension': embeddings.shape[1],
+            'overlap_at_k': neighbor_overlap(features_matrix, embeddings, k, sample_size, seed),
+            'fit_s': fit_s,
+            'embedding_mb': embeddings.nbytes / 2 ** 20,
+            'explained_variance': float(svd.explained_variance_ratio_.sum()),
+        })
+    return results
+
+
+def save_embeddings(path, embeddings, movie_ids):
+    '''
+    Write embeddings and their movie ids as .npy files that load_embeddings can memory-map.
+    '''
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, EMBEDDINGS_FILE), np.ascontiguousarray(embeddings, dtype=np.float32))
+    np.save(os.path.join(path, MOVIE_IDS_FILE), np.asarray(movie_ids))
+
+
+def load_embeddings(path, mmap=True):
+    '''
+    Returns:
+        tuple: (embeddings, movie_ids); embeddings are memory-mapped read-only when mmap is set.
+    '''
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode='r' if mmap else None)
+    return embeddings, np.load(os.path.join(path, MOVIE_IDS_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate LSA embedding sizes against raw TF-IDF neighbors.')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--dimensions', default='64,128,256')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--sample-size', type=int, default=500)
+    args = parser.parse_args()
+
+    from src.cb import MovieRecommendationSystem
+    from src.preprocess import load_movie_data, preprocess_and_feature_extraction, handling_missing_values
+    processed_df = handling_missing_values(preprocess_and_feature_extraction(load_movie_data(args.data_dir)))
+    processed_df = MovieRecommendationSystem.preprocess_text_features.fn(processed_df)
+    _, features_matrix = MovieRecommendationSystem.create_tfidf_matrix.fn(processed_df['combined_features'])
+
+    print(f"TF-IDF: {features_matrix.shape[0]} movies x {features_matrix.shape[1]} terms")
+    for result in evaluate_dimensions(features_matrix, [int(d) for d in args.dimensions.split(',')],
+                                      args.k, args.sample_size):
+        print(f"dim {result['dimension']:4d}: overlap@{args.k} {result['overlap_at_k']:.1%}, "
+              f"fit {result['fit_s']:.2f}s, {result['embedding_mb']:.1f} MB, "
+              f"explained variance {result['explained_variance']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,279 @@
 import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 from sagemaker import Predictor
 from sagemaker.serializers import IdentitySerializer
-from sagemaker.deserializers import NumpyDeserializer
+from sagemaker.deserializers import JSONDeserializer
 import sagemaker.amazon.common as smac
+from src.perf import summarize_latencies
+
+# SageMaker real-time endpoints reject request bodies larger than 6 MB
+MAX_PAYLOAD_BYTES = 6 * 1024 * 1024
 
 # Define a lambda function for loading protobuf data from S3
 load_protobuf_data = lambda s3_bucket, s3_key: boto3.client('s3').get_object(Bucket=s3_bucket, Key=s3_key)['Body'].read()
 
-# Define a lambda function for evaluating the model
-evaluate_model = lambda predictor, X_test, y_test: (
-    (
-        accuracy_score(y_test, (predictor.predict(X_test) > 0.5).astype('float32')),
-        confusion_matrix(y_test, (predictor.predict(X_test) > 0.5).astype('float32')),
-        classification_report(y_test, (predictor.predict(X_test) > 0.5).astype('float32'))
+
+def serialize_batch(X):
+    '''
+    Serialize a feature matrix to the recordio-protobuf format expected by the FM endpoint.
+
+    Args:
+        X (scipy.sparse matrix or np.ndarray): Feature rows to serialize.
+
+    Returns:
+        bytes: Serialized request body.
+    '''
+    buf = io.BytesIO()
+    if sparse.issparse(X):
+        smac.write_spmatrix_to_sparse_tensor(buf, X.tocoo())
+    else:
+        smac.write_numpy_to_dense_tensor(buf, np.asarray(X, dtype='float32'))
+    return buf.getvalue()
+
+
+def records_to_matrix(records, feature_dim=None):
+    '''
+    Convert deserialized protobuf records back into a sparse feature matrix and labels.
+
+    Args:
+        records (list): Records returned by `smac.read_records`.
+        feature_dim (int, optional): Number of feature columns. Taken from the records if omitted.
+
+    Returns:
+        tuple: (scipy.sparse.csr_matrix, np.ndarray) of features and labels (NaN where unlabeled).
+    '''
+    indptr, indices, values, labels = [0], [], [], []
+    for record in records:
+        tensor = record.features['values'].float32_tensor
+        row_values = list(tensor.values)
+        row_keys = list(tensor.keys) or list(range(len(row_values)))
+        if feature_dim is None and len(tensor.shape):
+            feature_dim = int(tensor.shape[0])
+        indices.extend(row_keys)
+        values.extend(row_values)
+        indptr.append(len(indices))
+        label = record.label['values'].float32_tensor.values if 'values' in record.label else []
+        labels.append(label[0] if len(label) else np.nan)
+    if feature_dim is None:
+        feature_dim = max(indices) + 1 if indices else 0
+    X = sparse.csr_matrix(
+        (np.asarray(values, dtype='float32'), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(records), feature_dim),
     )
-)
+    return X, np.asarray(labels, dtype='float32')
+
+
+def extract_scores(response):
+    '''
+    Extract prediction scores from an FM endpoint response.
+
+    Args:
+        response (dict, bytes, str or array-like): Deserialized or raw endpoint response.
+
+    Returns:
+        np.ndarray: One score per input row.
+    '''
+    if isinstance(response, (bytes, str)):
+        response = json.loads(response)
+    if isinstance(response, dict):
+        return np.asarray([p['score'] for p in response['predictions']], dtype='float32')
+    return np.asarray(response, dtype='float32').ravel()
+
+
+def split_into_batches(X, max_payload_bytes=MAX_PAYLOAD_BYTES, serializer=serialize_batch, probe_rows=1000):
+    '''
+    Split a feature matrix into contiguous mini-batches whose serialized size stays under a payload limit.
+
+    The rows-per-batch is estimated from a serialized probe slice; any batch that still exceeds the
+    limit is halved until it fits.
+
+    Args:
+        X (scipy.sparse matrix or np.ndarray): Feature rows to split.
+        max_payload_bytes (int): Upper bound for each serialized request body.
+        serializer (callable): Function turning a row slice into a request body.
+        probe_rows (int): Number of rows used to estimate the serialized row size.
+
+    Returns:
+        list: (start, stop, payload) tuples covering all rows in order.
+    '''
+    n_rows = X.shape[0]
+    if n_rows == 0:
+        return []
+    probe = min(probe_rows, n_rows)
+    bytes_per_row = max(len(serializer(X[:probe])) / probe, 1.0)
+    # Leave headroom because rows are not all the same size
+    rows_per_batch = max(int(0.9 * max_payload_bytes / bytes_per_row), 1)
+
+    batches = []
+    pending = [(start, min(start + rows_per_batch, n_rows)) for start in range(0, n_rows, rows_per_batch)]
+    while pending:
+        start, stop = pending.pop(0)
+        payload = serializer(X[start:stop])
+        if len(payload) > max_payload_bytes and stop - start > 1:
+            middle = (start + stop) // 2
+            pending[:0] = [(start, middle), (middle, stop)]
+            continue
+        batches.append((start, stop, payload))
+    return batches
+
+
+class BatchedEvaluationClient:
+    '''
+    Score a test matrix against an FM endpoint in concurrent, payload-bounded mini-batches.
+
+    Args:
+        predictor: Object with a `predict(payload)` method, e.g. a SageMaker `Predictor` or `LocalStubPredictor`.
+        max_payload_bytes (int): Upper bound for each serialized request body.
+        max_workers (int): Maximum number of requests in flight.
+        serializer (callable): Function turning a row slice into a request body.
+    '''
+    def __init__(self, predictor, max_payload_bytes=MAX_PAYLOAD_BYTES, max_workers=4, serializer=serialize_batch):
+        self.predictor = predictor
+        self.max_payload_bytes = max_payload_bytes
+        self.max_workers = max_workers
+        self.serializer = serializer
+        self.last_stats = {}
+
+    def _predict_batch(self, batch):
+        start, stop, payload = batch
+        started = time.perf_counter()
+        scores = extract_scores(self.predictor.predict(payload))
+        latency = time.perf_counter() - started
+        if scores.shape[0] != stop - start:
+            raise ValueError(f"Endpoint returned {scores.shape[0]} scores for {stop - start} rows")
+        return scores, latency
+
+    def predict(self, X):
+        '''
+        Score every row of X once.
+
+        Args:
+            X (scipy.sparse matrix or np.ndarray): Feature rows to score.
+
+        Returns:
+            np.ndarray: Scores in the same row order as X. Throughput and latency
+            percentiles of the call are stored in `last_stats`.
+        '''
+        started = time.perf_counter()
+        batches = split_into_batches(X, self.max_payload_bytes, self.serializer)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # map preserves submission order, so the scores line up with the rows of X
+            results = list(executor.map(self._predict_batch, batches))
+        wall_time = time.perf_counter() - started
+
+        scores = np.concatenate([scores for scores, _ in results]) if results else np.empty(0, dtype='float32')
+        self.last_stats = summarize_latencies([latency for _, latency in results], X.shape[0], wall_time)
+        self.last_stats['batches'] = len(batches)
+        return scores
+
+
+class LocalStubPredictor:
+    '''
+    In-process stand-in for the FM endpoint, used to exercise the evaluation client without AWS.
+
+    It decodes recordio-protobuf payloads and scores them with a logistic model over the feature
+    weights, returning the same JSON structure as the SageMaker factorization-machines container.
+
+    Args:
+        feature_dim (int): Number of feature columns.
+        latency (float): Simulated network/inference latency per request in seconds.
+        seed (int): Seed for the random feature weights.
+    '''
+    def __init__(self, feature_dim, latency=0.0, seed=42):
+        rng = np.random.default_rng(seed)
+        self.weights = rng.normal(0.0, 1.0, feature_dim).astype('float32')
+        self.latency = latency
+        self.feature_dim = feature_dim
+
+    def predict(self, payload):
+        X, _ = records_to_matrix(smac.read_records(io.BytesIO(payload)), self.feature_dim)
+        if self.latency:
+            time.sleep(self.latency)
+        scores = 1.0 / (1.0 + np.exp(-(X @ self.weights)))
+        return {'predictions': [{'score': float(s), 'predicted_label': float(s > 0.5)} for s in scores]}
+
+
+def evaluate_model(predictor, X_test, y_test, max_payload_bytes=MAX_PAYLOAD_BYTES, max_workers=4):
+    '''
+    Evaluate the FM endpoint on a test set, scoring it once and reusing the predictions for every metric.
+
+    Args:
+        predictor: Object with a `predict(payload)` method.
+        X_test (scipy.sparse matrix or np.ndarray): Test features.
+        y_test (array-like): Binary test labels.
+        max_payload_bytes (int): Upper bound for each serialized request body.
+        max_workers (int): Maximum number of requests in flight.
+
+    Returns:
+        tuple: Accuracy, confusion matrix, classification report and inference stats.
+    '''
+    client = BatchedEvaluationClient(predictor, max_payload_bytes=max_payload_bytes, max_workers=max_workers)
+    y_pred = (client.predict(X_test) > 0.5).astype('float32')
+    return (
+        accuracy_score(y_test, y_pred),
+        confusion_matrix(y_test, y_pred),
+        classification_report(y_test, y_pred),
+        client.last_stats,
+    )
+
 
 # Define the main lambda handler function
 def lambda_handler(event, context):
     # Define S3 bucket and key for test data
     s3_bucket = "your-s3-bucket"
     s3_key = "test.protobuf"
-    
+
     # Load test data
     data_buffer = load_protobuf_data(s3_bucket, s3_key)
-    
+
     # Deserialize protobuf data
-    data = smac.read_records(data_buffer)
-    features = np.array([r.features.values for r in data])
-    labels = np.array([r.label['values'][0] for r in data])
-    
+    features, labels = records_to_matrix(smac.read_records(io.BytesIO(data_buffer)))
+
     # Load the SageMaker Predictor
     predictor = Predictor(
         endpoint_name="your-endpoint-name",
         serializer=IdentitySerializer(content_type="application/x-recordio-protobuf"),
-        deserializer=NumpyDeserializer()
+        deserializer=JSONDeserializer()
     )
-    
+
     # Evaluate the model
-    accuracy, confusion, classification_report_str = evaluate_model(predictor, features, labels)
-    
+    accuracy, confusion, classification_report_str, stats = evaluate_model(predictor, features, labels)
+
     # Log the evaluation metrics
     print(f"Accuracy: {accuracy}")
     print("Confusion Matrix:")
     print(confusion)
     print("Classification Report:")
     print(classification_report_str)
-    
+    print(f"Inference: {stats['batches']} batches, {stats['throughput_per_s']:.1f} rows/s, "
+          f"p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+
     # Return the evaluation metrics if needed
     return {
         "Accuracy": accuracy,
         "Confusion Matrix": confusion,
-        "Classification Report": classification_report_str
+        "Classification Report": classification_report_str,
+        "Inference Stats": stats
     }
+
+
+if __name__ == "__main__":
+    # Exercise the batched client end to end against the local stub endpoint
+    rng = np.random.default_rng(0)
+    n_rows, n_users, n_movies = 20000, 700, 9000
+    rows = np.repeat(np.arange(n_rows), 2)
+    cols = np.column_stack([rng.integers(0, n_users, n_rows), n_users + rng.integers(0, n_movies, n_rows)]).ravel()
+    X_demo = sparse.csr_matrix((np.ones(rows.size, dtype='float32'), (rows, cols)), shape=(n_rows, n_users + n_movies))
+    y_demo = rng.integers(0, 2, n_rows).astype('float32')
+
+    stub = LocalStubPredictor(X_demo.shape[1], latency=0.01)
+    accuracy, confusion, report, stats = evaluate_model(stub, X_demo, y_demo, max_payload_bytes=256 * 1024, max_workers=8)
+    print(f"Accuracy: {accuracy}")
+    print(pd.Series(stats))
@@ -0,0 +1,225 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+TEXT_FIELDS = ('overview',)
+FIELDS = ('cast_names', 'language', 'keyword_names', 'genre_names', 'director', 'overview')
+DEFAULT_WEIGHTS = dict.fromkeys(FIELDS, 1.0)
+
+
+def entity_tokens(value):
+    '''
+    Analyzer for name fields: every cast member, keyword, genre, language or director is one token.
+    '''
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(name).strip().lower() for name in value if str(name).strip()]
+    if isinstance(value, str) and value.strip():
+        return [value.strip().lower()]
+    return []
+
+
+def field_vectorizer(field):
+    '''
+    TF-IDF vectorizer for one field: words for free text, whole names for the other fields.
+    '''
+    if field in TEXT_FIELDS:
+        return TfidfVectorizer(stop_words='english')
+    return TfidfVectorizer(analyzer=entity_tokens)
+
+
+def field_documents(processed_df, field):
+    '''
+    One document per movie for a field; the vectorizers reject NaN, so a missing value is an empty document.
+    '''
+    values = processed_df[field].astype(object)
+    return values.where(values.notna(), '')
+
+
+def combine_matrices(matrices, weights=None):
+    '''
+    Weighted feature matrix whose row dot products are weighted sums of the per-field cosines.
+
+    Each field block is scaled by sqrt(weight) and the rows are L2-normalized again, so the
+    result plugs into cosine_similarity / linear_kernel like the single TF-IDF matrix.
+
+    Args:
+        matrices (dict): L2-normalized (n_movies, field vocabulary) matrix per field.
+        weights (dict, optional): Weight per field, missing fields get 0; defaults to 1.0 each.
+
+    Returns:
+        scipy.sparse.csr_matrix: (n_movies, total vocabulary) float32 matrix.
+    '''
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    blocks = [np.sqrt(weights[field]) * matrix for field, matrix in matrices.items()
+              if weights.get(field, 0) > 0 and matrix.shape[1]]
+    if not blocks:
+        raise ValueError("At least one field needs a positive weight")
+    return normalize(sp.hstack(blocks, format='csr'), copy=False)
+
+
+class FieldMatrices:
+    '''
+    One L2-normalized sparse TF-IDF matrix per catalog field, fitted once.
+
+    Rows of every matrix follow the catalog order. Weighting the fields differently only needs
+    `combine`, a sparse hstack of the already vectorized fields.
+
+    Args:
+        vectorizers (dict): Fitted vectorizer per field.
+        matrices (dict): (n_movies, field vocabulary) CSR matrix per field.
+    '''
+    def __init__(self, vectorizers, matrices):
+        self.vectorizers = vectorizers
+        self.matrices = matrices
+
+    @property
+    def fields(self):
+        return list(self.matrices)
+
+    @property
+    def n_movies(self):
+        return next(iter(self.matrices.values())).shape[0]
+
+    @classmethod
+    def fit(cls, processed_df, fields=FIELDS):
+        '''
+        Vectorize every field of the catalog.
+
+        Args:
+            processed_df (pd.DataFrame): Catalog after preprocessing and missing value handling.
+            fields (tuple): Columns to vectorize.
+
+        Returns:
+            FieldMatrices: Per-field vectorizers and matrices.
+        '''
+        vectorizers, matrices = {}, {}
+        for field in fields:
+            values = field_documents(processed_df, field)
+            vectorizer = field_vectorizer(field)
+            try:
+                matrices[field] = vectorizer.fit_transform(values).tocsr().astype(np.float32)
+            except ValueError as e:
+                if 'empty vocabulary' not in str(e):
+                    raise
+                # The field is blank for every movie
+                matrices[field] = sp.csr_matrix((len(values), 0), dtype=np.float32)
+            vectorizers[field] = vectorizer
+        return cls(vectorizers, matrices)
+
+    def combine(self, weights=None):
+        '''
+        Weighted feature matrix of the catalog, see combine_matrices.
+        '''
+        return combine_matrices(self.matrices, weights)
+
+    def model(self, weights=None):
+        '''
+        The fitted vectorizers and the weights as a WeightedFieldVectorizer, without the catalog matrices.
+        '''
+        model = WeightedFieldVectorizer(fields=tuple(self.vectorizers), weights=weights)
+        model.vectorizers_ = self.vectorizers
+        return model
+
+
+class WeightedFieldVectorizer(BaseEstimator, TransformerMixin):
+    '''
+    Per-field vectorizers and field weights as one sklearn transformer, the loggable form of FieldMatrices.
+
+    transform maps catalog rows to the rows FieldMatrices.combine returns for the same weights.
+
+    Args:
+        fields (tuple): Columns to vectorize.
+        weights (dict, optional): Weight per field, missing fields get 0; defaults to 1.0 each.
+    '''
+    def __init__(self, fields=FIELDS, weights=None):
+        self.fields = fields
+        self.weights = weights
+
+    def fit(self, processed_df, y=None):
+        self.vectorizers_ = FieldMatrices.fit(processed_df, self.fields).vectorizers
+        return self
+
+    def transform(self, processed_df):
+        matrices = {}
+        for field, vectorizer in self.vectorizers_.items():
+            values = field_documents(processed_df, field)
+            if hasattr(vectorizer, 'vocabulary_'):
+                matrices[field] = vectorizer.transform(values).tocsr().astype(np.float32)
+            else:
+                # The field was blank for the whole training catalog
+                matrices[field] = sp.csr_matrix((len(values), 0), dtype=np.float32)
+        return combine_matrices(matrices, self.weights)
+
+
+def tuned_weights(best_params):
+    '''
+    Field weights for FieldMatrices.combine from the best params of a weight sweep.
+
+    Params are named 'weight_<field>'; fields that were not tuned, such as the label field held
+    out to score the trials, keep their DEFAULT_WEIGHTS value.
+    '''
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update({key[len('weight_'):]: float(value) for key, value in best_params.items()
+                    if key.startswith('weight_')})
+    return weights
+
+
+def sparse_top_k(features_matrix, rows, k=10):
+    '''
+    Indices of the k rows with the highest dot product with each query row, the row itself excluded.
+    '''
+    rows = np.asarray(rows)
+    k = min(k, features_matrix.shape[0] - 1)
+    features_matrix = features_matrix.tocsr()
+    block = (features_matrix[rows] @ features_matrix.T).toarray()
+    block[np.arange(rows.size), rows] = -np.inf
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(block, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def label_overlap_at_k(features_matrix, labels, k=10, sample_size=500, seed=42):
+    '''
+    Mean Jaccard similarity between each sampled movie's labels (e.g. genres) and its top-k neighbors'.
+
+    A proxy relevance score for weight sweeps; the label field itself should not be weighted in.
+
+    Args:
+        features_matrix (scipy.sparse matrix): Row-normalized combined matrix.
+        labels (pd.Series): List of labels per movie, in catalog order.
+        k (int): Neighborhood size.
+        sample_size (int): Number of random query movies.
+        seed (int): Seed of the query sample.
+
+    Returns:
+        float: Score in [0, 1].
+    '''
+    n = features_matrix.shape[0]
+    rows = np.random.default_rng(seed).choice(n, size=min(sample_size, n), replace=False)
+    label_sets = [set(value) if isinstance(value, (list, tuple, np.ndarray)) else set() for value in labels]
+    neighbors = sparse_top_k(features_matrix, rows, k)
+    scores = []
+    for row, row_neighbors in zip(rows, neighbors):
+        own = label_sets[row]
+        for neighbor in row_neighbors:
+            union = own | label_sets[neighbor]
+            scores.append(len(own & label_sets[neighbor]) / len(union) if union else 0.0)
+    return float(np.mean(scores))
+
+
+def combined_features(processed_df, fields=FIELDS):
+    '''
+    The single-string representation used by the whole-document TF-IDF model, built column-wise.
+
+    Produces the same text as joining str() of every field per row. str() still runs once per
+    cell, since list cells have no vectorized rendering; the row-wise apply and join are gone.
+    '''
+    combined = None
+    for field in fields:
+        # str() of every cell, lists and missing values included, exactly as the row-wise join rendered them
+        column = processed_df[field].astype(object).map(str)
+        combined = column if combined is None else combined + ' ' + column
+    return combined.astype(object) if combined is not None else pd.Series(index=processed_df.index, dtype=object)
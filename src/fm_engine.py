@@ -0,0 +1,183 @@
+import io
+import struct
+import tarfile
+import zipfile
+import numpy as np
+from scipy import sparse
+
+# MXNet NDArray serialization constants (see mxnet/src/ndarray/ndarray.cc)
+NDARRAY_LIST_MAGIC = 0x112
+NDARRAY_V2_MAGIC = 0xF993FAC9
+NDARRAY_V3_MAGIC = 0xF993FACA
+MXNET_DTYPES = {0: np.float32, 1: np.float64, 2: np.float16, 3: np.uint8, 4: np.int32, 5: np.int8, 6: np.int64}
+
+
+def read_mxnet_params(buffer: bytes) -> dict:
+    '''
+    Parse an MXNet `.params` file (a saved list of dense NDArrays) without importing MXNet.
+
+    Args:
+        buffer (bytes): Raw contents of the params file.
+
+    Returns:
+        dict: Mapping of parameter name (without the `arg:`/`aux:` prefix) to np.ndarray.
+    '''
+    stream = io.BytesIO(buffer)
+
+    def read(fmt):
+        return struct.unpack('<' + fmt, stream.read(struct.calcsize('<' + fmt)))
+
+    header, _ = read('QQ')
+    if header != NDARRAY_LIST_MAGIC:
+        raise ValueError("Not an MXNet NDArray list file")
+
+    arrays = []
+    for _ in range(read('Q')[0]):
+        magic, = read('I')
+        if magic not in (NDARRAY_V2_MAGIC, NDARRAY_V3_MAGIC):
+            raise ValueError(f"Unsupported NDArray format {magic:#x}")
+        stype, = read('i')
+        if stype != 0:
+            raise ValueError("Only dense NDArrays are supported")
+        ndim, = read('I' if magic == NDARRAY_V2_MAGIC else 'i')
+        shape = read(f'{ndim}q') if ndim > 0 else ()
+        read('ii')  # context: device type and id
+        type_flag, = read('i')
+        dtype = np.dtype(MXNET_DTYPES[type_flag])
+        count = int(np.prod(shape)) if shape else 0
+        arrays.append(np.frombuffer(stream.read(count * dtype.itemsize), dtype=dtype).reshape(shape))
+
+    names = []
+    for _ in range(read('Q')[0]):
+        length, = read('Q')
+        names.append(stream.read(length).decode())
+
+    return {name.split(':', 1)[-1]: array for name, array in zip(names, arrays)}
+
+
+def load_model_artifact(artifact) -> dict:
+    '''
+    Load the parameters of a SageMaker factorization-machines model.
+
+    Args:
+        artifact (str or bytes): Path or S3 URI of `model.tar.gz`, or its raw bytes.
+
+    Returns:
+        dict: Raw MXNet parameters of the model.
+    '''
+    if isinstance(artifact, str) and artifact.startswith('s3://'):
+        import boto3
+        bucket, key = artifact[len('s3://'):].split('/', 1)
+        artifact = boto3.client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+    fileobj = io.BytesIO(artifact) if isinstance(artifact, bytes) else open(artifact, 'rb')
+    with fileobj, tarfile.open(fileobj=fileobj, mode='r:gz') as tar:
+        # model_algo-1 is itself a zip archive holding the MXNet symbol and params
+        model_algo = tar.extractfile(next(m for m in tar.getmembers() if m.name.endswith('model_algo-1'))).read()
+    with zipfile.ZipFile(io.BytesIO(model_algo)) as archive:
+        params_name = next(name for name in archive.namelist() if name.endswith('.params'))
+        return read_mxnet_params(archive.read(params_name))
+
+
+class FactorizationMachineEngine:
+    '''
+    Local NumPy scoring engine for SageMaker factorization-machines models.
+
+    Uses the O(k * nnz) identity
+    sum_{i<j} <v_i, v_j> x_i x_j = 0.5 * sum_f [(sum_i v_if x_i)^2 - sum_i v_if^2 x_i^2]
+    so a batch of sparse rows is scored with two sparse-dense products.
+
+    Args:
+        bias (float): Global bias w0.
+        linear (np.ndarray): Linear weights w, shape (feature_dim,).
+        factors (np.ndarray): Factor matrix V, shape (feature_dim, num_factors).
+        predictor_type (str): 'binary_classifier' applies a sigmoid, 'regressor' returns raw scores.
+    '''
+    def __init__(self, bias, linear, factors, predictor_type='binary_classifier'):
+        self.bias = np.float32(bias)
+        self.linear = np.ascontiguousarray(linear, dtype=np.float32).ravel()
+        self.factors = np.ascontiguousarray(factors, dtype=np.float32)
+        self.factors_sq = self.factors ** 2
+        self.predictor_type = predictor_type
+
+    @classmethod
+    def from_artifact(cls, artifact, predictor_type='binary_classifier'):
+        params = load_model_artifact(artifact)
+        return cls(params['w0_weight'].ravel()[0], params['w1_weight'], params['v'], predictor_type)
+
+    @property
+    def feature_dim(self):
+        return self.factors.shape[0]
+
+    def _link(self, raw):
+        if self.predictor_type == 'binary_classifier':
+            return 1.0 / (1.0 + np.exp(-raw))
+        return raw
+
+    def decision_function(self, X, batch_size=65536):
+        '''
+        Compute raw FM scores for sparse feature rows.
+
+        Args:
+            X (scipy.sparse matrix): Feature rows, shape (n_rows, feature_dim).
+            batch_size (int): Rows scored per vectorized batch, bounds the (batch, k) temporaries.
+
+        Returns:
+            np.ndarray: Raw scores, shape (n_rows,).
+        '''
+        X = sparse.csr_matrix(X, dtype=np.float32)
+        out = np.empty(X.shape[0], dtype=np.float32)
+        for start in range(0, X.shape[0], batch_size):
+            batch = X[start:start + batch_size]
+            xv = batch @ self.factors
+            x2v2 = batch.multiply(batch) @ self.factors_sq
+            pairwise = 0.5 * (np.einsum('ij,ij->i', xv, xv) - np.asarray(x2v2.sum(axis=1)).ravel())
+            out[start:start + batch_size] = self.bias + batch @ self.linear + pairwise
+        return out
+
+    def predict(self, X, batch_size=65536):
+        '''
+        Score sparse feature rows, returning probabilities for binary classifiers.
+        '''
+        return self._link(self.decision_function(X, batch_size))
+
+    def recommend(self, user_columns, item_columns, top_n=10, exclude=None, batch_size=1024):
+        '''
+        Rank candidate items for one-hot encoded users.
+
+        For a row with one user column u and one item column i the FM score reduces to
+        w0 + w_u + w_i + <v_u, v_i>, so a user batch is ranked with a single dense GEMM.
+
+        Args:
+            user_columns (array-like): Feature column of each user to recommend for.
+            item_columns (array-like): Feature columns of the candidate items.
+            top_n (int): Number of items to return per user.
+            exclude (scipy.sparse matrix, optional): (n_users, n_items) mask of items to skip,
+                e.g. already rated movies, aligned with `user_columns` and `item_columns`.
+            batch_size (int): Users ranked per GEMM.
+
+        Returns:
+            tuple: (indices into item_columns, scores), both shape (n_users, top_n), best first.
+        '''
+        user_columns = np.asarray(user_columns)
+        item_columns = np.asarray(item_columns)
+        item_factors = self.factors[item_columns]
+        item_bias = self.linear[item_columns]
+        top_n = min(top_n, item_columns.size)
+        exclude = sparse.csr_matrix(exclude) if exclude is not None else None
+
+        top_items = np.empty((user_columns.size, top_n), dtype=np.int64)
+        top_scores = np.empty((user_columns.size, top_n), dtype=np.float32)
+        for start in range(0, user_columns.size, batch_size):
+            users = user_columns[start:start + batch_size]
+            scores = self.factors[users] @ item_factors.T
+            scores += item_bias
+            scores += (self.bias + self.linear[users])[:, None]
+            if exclude is not None:
+                mask = exclude[start:start + batch_size].tocoo()
+                scores[mask.row, mask.col] = -np.inf
+            candidates = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1)
+            top_items[start:start + batch_size] = np.take_along_axis(candidates, order, axis=1)
+            top_scores[start:start + batch_size] = self._link(np.take_along_axis(candidate_scores, order, axis=1))
+        return top_items, top_scores
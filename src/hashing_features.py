@@ -0,0 +1,308 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils.validation import check_is_fitted
+
+DEFAULT_N_FEATURES = 2 ** 20
+
+
+class StreamingTfidf(BaseEstimator, TransformerMixin):
+    '''
+    TF-IDF with a fixed-size hashed feature space, fitted incrementally.
+
+    Terms are hashed into `n_features` columns instead of being stored in a vocabulary, and the
+    document frequencies are accumulated chunk by chunk, so memory does not grow with the corpus.
+    Without hash collisions the output equals TfidfVectorizer's (with the same tokenization,
+    smooth_idf and l2 norm) up to a column permutation. It is an sklearn transformer, so
+    mlflow.sklearn logs and loads it like the TfidfVectorizer; there is no vocabulary, so
+    get_feature_names_out and vocabulary_ are not available.
+
+    Args:
+        n_features (int): Number of hashed columns.
+        stop_words (str or list, optional): Passed to the HashingVectorizer.
+        sublinear_tf (bool): Use 1 + log(tf) instead of raw counts.
+        dtype (type): dtype of the transformed matrices.
+
+    Attributes:
+        document_frequency_ (np.ndarray): Documents containing each hashed column, set by fitting.
+        n_documents_ (int): Documents seen by fitting.
+    '''
+    def __init__(self, n_features=DEFAULT_N_FEATURES, stop_words='english', sublinear_tf=False, dtype=np.float32):
+        self.n_features = n_features
+        self.stop_words = stop_words
+        self.sublinear_tf = sublinear_tf
+        self.dtype = dtype
+
+    def _hasher(self):
+        # Stateless, so it is built from the current params rather than stored
+        return HashingVectorizer(n_features=self.n_features, stop_words=self.stop_words, alternate_sign=False,
+                                 norm=None, dtype=self.dtype)
+
+    def _counts(self, documents):
+        return self._hasher().transform(documents)
+
+    def _reset(self):
+        self.document_frequency_ = np.zeros(self.n_features, dtype=np.int64)
+        self.n_documents_ = 0
+
+    def fit(self, documents, y=None):
+        '''
+        Document frequencies of the documents, discarding any earlier statistics.
+        '''
+        self._reset()
+        return self.partial_fit(documents)
+
+    def partial_fit(self, documents, y=None):
+        '''
+        Add the document frequencies of a chunk of documents.
+        '''
+        self._add_frequencies(*document_frequencies(self, documents))
+        return self
+
+    def _add_frequencies(self, columns, counts, n_documents):
+        if not hasattr(self, 'document_frequency_'):
+            self._reset()
+        np.add.at(self.document_frequency_, columns, counts)
+        self.n_documents_ += n_documents
+
+    def merge(self, other):
+        '''
+        Combine the statistics of a vectorizer fitted on other documents (e.g. by another worker).
+        '''
+        check_is_fitted(other, 'document_frequency_')
+        if (other.n_features, other.stop_words) != (self.n_features, self.stop_words):
+            raise ValueError("Only vectorizers with the same n_features and stop_words can be merged")
+        if not hasattr(self, 'document_frequency_'):
+            self._reset()
+        self.document_frequency_ += other.document_frequency_
+        self.n_documents_ += other.n_documents_
+        return self
+
+    @property
+    def idf(self):
+        # Same smoothing as TfidfVectorizer(smooth_idf=True)
+        check_is_fitted(self, 'document_frequency_')
+        return (np.log((1 + self.n_documents_) / (1 + self.document_frequency_)) + 1).astype(self.dtype)
+
+    def transform(self, documents, idf=None):
+        '''
+        L2-normalized TF-IDF matrix of a chunk of documents.
+
+        Args:
+            documents (iterable): Raw text documents.
+            idf (np.ndarray, optional): Precomputed `idf`, to avoid recomputing it per chunk.
+
+        Returns:
+            scipy.sparse.csr_matrix: (len(documents), n_features) matrix.
+        '''
+        matrix = self._counts(documents)
+        if self.sublinear_tf:
+            np.log(matrix.data, out=matrix.data)
+            matrix.data += 1
+        matrix.data *= (self.idf if idf is None else idf)[matrix.indices]
+        return normalize(matrix, copy=False)
+
+    def fit_transform(self, documents, y=None):
+        return self.fit(documents).transform(documents)
+
+
+def document_frequencies(vectorizer, documents):
+    '''
+    Columns present in a chunk and in how many of its documents, plus the chunk size.
+    '''
+    matrix = vectorizer._counts(documents)
+    # Hashed rows are summed CSR rows, so every column appears at most once per document
+    columns, counts = np.unique(matrix.indices, return_counts=True)
+    return columns, counts, matrix.shape[0]
+
+
+_worker_vectorizer = None
+_worker_idf = None
+
+
+def _init_worker(vectorizer):
+    global _worker_vectorizer, _worker_idf
+    _worker_vectorizer = vectorizer
+    _worker_idf = vectorizer.idf if getattr(vectorizer, 'n_documents_', 0) else None
+
+
+def _fit_chunk(documents):
+    return document_frequencies(_worker_vectorizer, documents)
+
+
+def _transform_chunk(documents):
+    return _worker_vectorizer.transform(documents, _worker_idf)
+
+
+def _bounded_map(executor, func, chunks, max_pending):
+    # Unlike Pool.imap, never pulls more than max_pending chunks from the generator ahead of the consumer
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, chunk))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def fit_chunks(vectorizer, chunks, n_jobs=1):
+    '''
+    Accumulate document frequencies over a stream of document chunks.
+
+    Args:
+        vectorizer (StreamingTfidf): Vectorizer to update.
+        chunks (iterable): Lists of documents, e.g. from iter_catalog_documents.
+        n_jobs (int): Worker processes; each hashes a chunk and the partial counts are merged here.
+
+    Returns:
+        StreamingTfidf: The updated vectorizer.
+    '''
+    if n_jobs <= 1:
+        for documents in chunks:
+            vectorizer.partial_fit(documents)
+        return vectorizer
+    with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(vectorizer,)) as executor:
+        for partial in _bounded_map(executor, _fit_chunk, chunks, 2 * n_jobs):
+            vectorizer._add_frequencies(*partial)
+    return vectorizer
+
+
+def transform_chunks(vectorizer, chunks, n_jobs=1):
+    '''
+    Yield the TF-IDF matrix of every chunk, in order, holding at most a few chunks in memory.
+    '''
+    if n_jobs <= 1:
+        idf = vectorizer.idf
+        for documents in chunks:
+            yield vectorizer.transform(documents, idf)
+        return
+    with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(vectorizer,)) as executor:
+        yield from _bounded_map(executor, _transform_chunk, chunks, 2 * n_jobs)
+
+
+def catalog_fills(data_dir='data', chunk_size=1000):
+    '''
+    Missing runtime and year fills of the whole merged catalog, as handling_missing_values computes
+    them on the fully loaded catalog, from a pass over the ids, runtimes and release dates only.
+    '''
+    movies_path = os.path.join(data_dir, 'tmdb_5000_movies.csv')
+    credits_path = os.path.join(data_dir, 'tmdb_5000_credits.csv')
+    # Rows per movie id after the merge with the credits
+    with pd.read_csv(credits_path, usecols=['movie_id'], chunksize=chunk_size) as credits:
+        matches = pd.concat(chunk['movie_id'] for chunk in credits).value_counts()
+    totals = {'runtime': [0.0, 0], 'year': [0.0, 0]}
+    with pd.read_csv(movies_path, usecols=['id', 'runtime', 'release_date'], chunksize=chunk_size) as movies:
+        for chunk in movies:
+            weights = chunk['id'].map(matches).fillna(0)
+            values = {'runtime': chunk['runtime'],
+                      'year': pd.to_datetime(chunk['release_date'], errors='coerce').dt.year}
+            for name, column in values.items():
+                known = column.notna()
+                totals[name][0] += float((column[known] * weights[known]).sum())
+                totals[name][1] += int(weights[known].sum())
+    runtime_sum, runtime_count = totals['runtime']
+    year_sum, year_count = totals['year']
+    return {'runtime': runtime_sum / runtime_count if runtime_count else np.nan,
+            'year': round(year_sum / year_count) if year_count else np.nan}
+
+
+def iter_catalog_chunks(data_dir='data', chunk_size=1000, fills=None):
+    '''
+    Read the TMDB movies and credits CSVs in chunks and yield merged, preprocessed catalog chunks.
+
+    The two files are read side by side until both are exhausted. Rows whose counterpart has not
+    been read yet wait in a buffer and are joined on the movie id when it turns up, so the files
+    need not be aligned; memory stays bounded when they are (nearly) in the same order. Missing
+    values are filled with whole-catalog statistics (catalog_fills unless `fills` is given), so
+    the chunks do not depend on the chunk size.
+    '''
+    from src.preprocess import preprocess_and_feature_extraction, handling_missing_values
+    fills = fills or catalog_fills(data_dir, chunk_size)
+    pending_movies, pending_credits = pd.DataFrame(), pd.DataFrame()
+    with pd.read_csv(os.path.join(data_dir, 'tmdb_5000_movies.csv'), chunksize=chunk_size) as movies, \
+            pd.read_csv(os.path.join(data_dir, 'tmdb_5000_credits.csv'), chunksize=chunk_size) as credits:
+        # Whichever file runs out first, the rest of the other is still read and matched
+        for movie_chunk, credit_chunk in zip_longest(movies, credits):
+            if movie_chunk is not None:
+                pending_movies = pd.concat([pending_movies, movie_chunk], ignore_index=True)
+            if credit_chunk is not None:
+                pending_credits = pd.concat([pending_credits, credit_chunk], ignore_index=True)
+            if pending_movies.empty or pending_credits.empty:
+                continue
+            merged = pending_movies.merge(pending_credits, left_on='id', right_on='movie_id')
+            if merged.empty:
+                continue
+            pending_movies = pending_movies[~pending_movies['id'].isin(merged['id'])]
+            pending_credits = pending_credits[~pending_credits['movie_id'].isin(merged['movie_id'])]
+            merged = merged.drop(['id', 'title_y'], axis=1)
+            yield handling_missing_values(preprocess_and_feature_extraction(merged), fills)
+
+
+def iter_catalog_documents(data_dir='data', chunk_size=1000, fills=None):
+    '''
+    Yield (movie_ids, documents) per catalog chunk, documents being the combined text features.
+    '''
+    from src.field_features import combined_features
+    for chunk in iter_catalog_chunks(data_dir, chunk_size, fills):
+        yield chunk['movie_id'].to_numpy(), combined_features(chunk).tolist()
+
+
+def vectorize_catalog(data_dir, output_dir, chunk_size=1000, n_features=DEFAULT_N_FEATURES, n_jobs=1):
+    '''
+    Out-of-core TF-IDF of the whole catalog: one pass to fit document frequencies, one to write
+    a CSR part file per chunk. Memory is bounded by the chunk size and n_features, not the corpus.
+
+    Returns:
+        StreamingTfidf: The fitted vectorizer.
+    '''
+    vectorizer = StreamingTfidf(n_features=n_features)
+    fills = catalog_fills(data_dir, chunk_size)
+    fit_chunks(vectorizer, (documents for _, documents in iter_catalog_documents(data_dir, chunk_size, fills)), n_jobs)
+
+    os.makedirs(output_dir, exist_ok=True)
+    id_chunks = []
+
+    def documents_only():
+        for movie_ids, documents in iter_catalog_documents(data_dir, chunk_size, fills):
+            id_chunks.append(movie_ids)
+            yield documents
+
+    for part, matrix in enumerate(transform_chunks(vectorizer, documents_only(), n_jobs)):
+        sp.save_npz(os.path.join(output_dir, f'part-{part:05d}.npz'), matrix)
+    np.save(os.path.join(output_dir, 'movie_ids.npy'), np.concatenate(id_chunks) if id_chunks else np.empty(0))
+    return vectorizer
+
+
+def load_catalog_matrix(output_dir):
+    '''
+    Stack the part files written by vectorize_catalog into one matrix with its movie ids.
+    '''
+    parts = sorted(name for name in os.listdir(output_dir) if name.startswith('part-'))
+    matrix = sp.vstack([sp.load_npz(os.path.join(output_dir, name)) for name in parts], format='csr')
+    return matrix, np.load(os.path.join(output_dir, 'movie_ids.npy'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorize the movie catalog out of core with hashed TF-IDF.')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--output-dir', default=os.path.join('data', 'hashed_tfidf'))
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    vectorizer = vectorize_catalog(args.data_dir, args.output_dir, args.chunk_size, args.n_features, args.jobs)
+    print(f"Vectorized {vectorizer.n_documents_} movies into {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = 'RECOMM_TRACE'
+_enabled = os.getenv(TRACE_ENV, '0').lower() in ('1', 'true', 'yes')
+_current = contextvars.ContextVar('recomm_span', default=None)
+_roots = []
+_roots_lock = threading.Lock()
+
+
+def enable(flag=True):
+    '''
+    Turn span recording on or off (default from the RECOMM_TRACE environment variable).
+    '''
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+def _max_rss_mb():
+    # Highest RSS of the whole process so far, not of the current span
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _rss_mb():
+    # Current RSS, from /proc on Linux; 0 where it is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+class Span:
+    '''
+    Timing, memory and throughput of one instrumented block, with its nested child spans.
+
+    Memory is process-wide, so it also counts other threads running at the same time:
+    rss_delta_mb is the change of the current RSS between the start and end of the span, and
+    max_rss_growth_mb how much the span raised the process high-water mark (0 unless it set a new one).
+    '''
+    __slots__ = ('name', 'parent', 'children', 'rows', 'wall_s', 'cpu_s', 'rss_delta_mb', 'max_rss_growth_mb',
+                 '_wall_start', '_cpu_start', '_rss_start', '_max_rss_start')
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.rows = None
+        self.wall_s = self.cpu_s = self.rss_delta_mb = self.max_rss_growth_mb = 0.0
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    @property
+    def path(self):
+        names, span = [], self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return '/'.join(reversed(names))
+
+    @property
+    def rows_per_s(self):
+        return self.rows / self.wall_s if self.rows and self.wall_s > 0 else None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'rss_delta_mb': self.rss_delta_mb,
+            'max_rss_growth_mb': self.max_rss_growth_mb,
+            'rows': self.rows,
+            'rows_per_s': self.rows_per_s,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    def set_rows(self, rows):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name, rows=None):
+    '''
+    Record wall time, CPU time, RSS change and rows processed for a block of code.
+
+    Spans opened inside another span become its children. When recording is disabled the
+    block runs unchanged and a no-op span is yielded.
+
+    Args:
+        name (str): Span name.
+        rows (int, optional): Rows processed; can also be set later with `span.set_rows`.
+
+    Yields:
+        Span: The open span.
+    '''
+    if not _enabled:
+        yield _NOOP
+        return
+    parent = _current.get()
+    current = Span(name, parent)
+    current.rows = rows
+    token = _current.set(current)
+    current._rss_start = _rss_mb()
+    current._max_rss_start = _max_rss_mb()
+    current._cpu_start = time.process_time()
+    current._wall_start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.wall_s = time.perf_counter() - current._wall_start
+        # process_time covers every thread of the process, including BLAS and Prefect workers
+        current.cpu_s = time.process_time() - current._cpu_start
+        current.rss_delta_mb = _rss_mb() - current._rss_start
+        current.max_rss_growth_mb = _max_rss_mb() - current._max_rss_start
+        _current.reset(token)
+        if parent is not None:
+            parent.children.append(current)
+        else:
+            with _roots_lock:
+                _roots.append(current)
+
+
+def instrument(name=None, rows=None):
+    '''
+    Decorator recording a span around every call of the function.
+
+    Args:
+        name (str, optional): Span name, defaults to the function's qualified name.
+        rows (callable, optional): Maps the return value to the number of rows processed.
+    '''
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name) as current:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    current.set_rows(rows(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def get_trace():
+    '''
+    Return the finished root spans recorded so far.
+    '''
+    with _roots_lock:
+        return list(_roots)
+
+
+def reset_trace(spans=None):
+    '''
+    Forget recorded root spans: all of them, or only the given ones.
+    '''
+    with _roots_lock:
+        if spans is None:
+            _roots.clear()
+        else:
+            logged = {id(s) for s in spans}
+            _roots[:] = [s for s in _roots if id(s) not in logged]
+
+
+def _walk(spans):
+    for s in spans:
+        yield s
+        yield from _walk(s.children)
+
+
+def trace_metrics(trace=None):
+    '''
+    Flatten a trace into MLflow metric names and values.
+
+    Repeated spans with the same path are summed (time, rows) or maxed (memory changes).
+
+    Returns:
+        dict: Metrics such as 'trace/main_flow/create_tfidf_matrix/wall_s'.
+    '''
+    totals = {}
+    for s in _walk(get_trace() if trace is None else trace):
+        entry = totals.setdefault(s.path, {'wall_s': 0.0, 'cpu_s': 0.0, 'rss_delta_mb': None,
+                                           'max_rss_growth_mb': 0.0, 'rows': 0, 'calls': 0})
+        entry['wall_s'] += s.wall_s
+        entry['cpu_s'] += s.cpu_s
+        entry['rss_delta_mb'] = s.rss_delta_mb if entry['rss_delta_mb'] is None else max(entry['rss_delta_mb'],
+                                                                                          s.rss_delta_mb)
+        entry['max_rss_growth_mb'] = max(entry['max_rss_growth_mb'], s.max_rss_growth_mb)
+        entry['rows'] += s.rows or 0
+        entry['calls'] += 1
+
+    metrics = {}
+    for path, entry in totals.items():
+        if entry['rows'] and entry['wall_s'] > 0:
+            entry['rows_per_s'] = entry['rows'] / entry['wall_s']
+        else:
+            del entry['rows']
+        for key, value in entry.items():
+            metrics[f'trace/{path}/{key}'] = float(value)
+    return metrics
+
+
+def collapsed_stacks(trace=None):
+    '''
+    Render a trace in the collapsed-stack format read by flamegraph.pl and speedscope.
+
+    Each line is 'root;child;grandchild <self time in microseconds>'.
+    '''
+    self_times = Counter()
+    for s in _walk(get_trace() if trace is None else trace):
+        self_time = s.wall_s - sum(child.wall_s for child in s.children)
+        self_times[s.path.replace('/', ';')] += max(int(self_time * 1e6), 0)
+    return '\n'.join(f'{stack} {value}' for stack, value in self_times.items()) + '\n'
+
+
+def log_trace_to_mlflow(trace=None):
+    '''
+    Log the trace as MLflow metrics plus trace.json and trace.folded (flame graph) artifacts.
+
+    The logged spans are then dropped from the recorded trace, so a later run in the same
+    process does not log them again. Does nothing when recording is disabled or nothing was recorded.
+    '''
+    trace = get_trace() if trace is None else trace
+    if not _enabled or not trace:
+        return
+    import mlflow
+    mlflow.log_metrics(trace_metrics(trace))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'trace.json'), 'w') as f:
+            json.dump([s.to_dict() for s in trace], f, indent=2)
+        with open(os.path.join(tmp_dir, 'trace.folded'), 'w') as f:
+            f.write(collapsed_stacks(trace))
+        mlflow.log_artifacts(tmp_dir, 'trace')
+    reset_trace(trace)
+
+
+class SamplingProfiler:
+    '''
+    Low-overhead statistical profiler for one-off deep dives.
+
+    A background thread samples the Python stack of the profiled thread every `interval`
+    seconds and counts identical stacks. The result is written in collapsed-stack format.
+
+    Args:
+        output_path (str): File receiving the collapsed stacks.
+        interval (float): Seconds between samples.
+        thread_id (int, optional): Thread to sample, defaults to the thread that starts the profiler.
+    '''
+    def __init__(self, output_path, interval=0.005, thread_id=None):
+        self.output_path = output_path
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        with open(self.output_path, 'w') as f:
+            f.writelines(f'{stack} {count}\n' for stack, count in self.samples.items())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def sampling_profiler(output_path=None, interval=0.005):
+    '''
+    Profile the enclosed block with SamplingProfiler when output_path is set, otherwise do nothing.
+    '''
+    if not output_path:
+        yield None
+        return
+    with SamplingProfiler(output_path, interval) as profiler:
+        yield profiler
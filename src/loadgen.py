@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import random
+import time
+from src.perf import summarize_latencies
+
+
+async def _client(host, port, paths, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            started = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            content_length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    content_length = int(line.split(b':', 1)[1])
+            await reader.readexactly(content_length)
+            latencies.append(time.perf_counter() - started)
+            if b' 200 ' not in status_line:
+                errors.append(status_line.decode().strip())
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, kind, ids, n_requests=10000, concurrency=64, top_n=10, seed=42):
+    '''
+    Send recommendation requests over persistent connections and measure throughput and tail latency.
+
+    Args:
+        host (str): Service host.
+        port (int): Service port.
+        kind (str): 'cf' (user ids) or 'cb' (movie ids).
+        ids (list): Entity ids to draw requests from.
+        n_requests (int): Total number of requests.
+        concurrency (int): Number of concurrent connections.
+        top_n (int): Recommendations requested per call.
+        seed (int): Seed for the request mix.
+
+    Returns:
+        dict: Throughput, p50/p99 latency and error count.
+    '''
+    rng = random.Random(seed)
+    paths = [f'/recommendations/{kind}/{rng.choice(ids)}?top_n={top_n}' for _ in range(n_requests)]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, paths[i::concurrency], latencies, errors) for i in range(concurrency)))
+    stats = summarize_latencies(latencies, n_requests, time.perf_counter() - started)
+    stats['errors'] = len(errors)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the recommendation service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--kind', choices=['cf', 'cb'], default='cf')
+    parser.add_argument('--ids', required=True, help='Comma separated ids, or a file with one id per line')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--top-n', type=int, default=10)
+    args = parser.parse_args()
+
+    if ',' in args.ids or args.ids.isdigit():
+        ids = [int(i) for i in args.ids.split(',')]
+    else:
+        with open(args.ids) as f:
+            ids = [int(line) for line in f if line.strip()]
+
+    stats = asyncio.run(run_load(args.host, args.port, args.kind, ids, args.requests, args.concurrency, args.top_n))
+    print(f"{stats['requests_per_s']:.1f} requests/s, p50 {stats['p50_ms']:.2f} ms, "
+          f"p99 {stats['p99_ms']:.2f} ms, {stats['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def summarize_latencies(latencies, n_items, wall_time):
+    '''
+    Summarize per-request latencies and overall throughput.
+
+    Args:
+        latencies (list): Latency of each request/batch in seconds.
+        n_items (int): Number of items (rows, records, requests) processed.
+        wall_time (float): Total wall-clock time in seconds.
+
+    Returns:
+        dict: Request count, throughput and p50/p99 latency in milliseconds.
+    '''
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if latencies_ms.size == 0:
+        p50 = p99 = 0.0
+    else:
+        p50, p99 = np.percentile(latencies_ms, [50, 99])
+    return {
+        'requests': int(latencies_ms.size),
+        'items': int(n_items),
+        'wall_time_s': float(wall_time),
+        'throughput_per_s': float(n_items / wall_time) if wall_time > 0 else 0.0,
+        'requests_per_s': float(latencies_ms.size / wall_time) if wall_time > 0 else 0.0,
+        'p50_ms': float(p50),
+        'p99_ms': float(p99),
+    }
@@ -0,0 +1,106 @@
+import os
+import mlflow
+from prefect import flow, task
+from src import cb, cf
+from src.cb import MovieRecommendationSystem
+from src.cf import MovieRecommendationFlow
+from src.instrumentation import span, log_trace_to_mlflow, sampling_profiler
+from src.field_features import tuned_weights
+
+TASK_RUNNER_ENV = 'RECOMM_TASK_RUNNER'
+
+
+def get_task_runner(kind=None):
+    '''
+    Pick the task runner for the combined flow.
+
+    Args:
+        kind (str, optional): 'dask', 'processes', 'threads' or 'auto' (default, from RECOMM_TASK_RUNNER).
+            'auto' uses Dask when prefect-dask is installed and threads otherwise.
+
+    Returns:
+        TaskRunner: A Prefect task runner that runs submitted tasks concurrently.
+    '''
+    kind = kind or os.getenv(TASK_RUNNER_ENV, 'auto')
+    if kind in ('dask', 'auto'):
+        try:
+            from prefect_dask import DaskTaskRunner
+            return DaskTaskRunner()
+        except ImportError:
+            if kind == 'dask':
+                raise
+    if kind == 'processes':
+        from prefect.task_runners import ProcessPoolTaskRunner
+        return ProcessPoolTaskRunner(max_workers=2)
+    from prefect.task_runners import ConcurrentTaskRunner
+    return ConcurrentTaskRunner()
+
+
+@task
+def content_based_branch(movie_id=19995, num_trials=1, lsa_components=None):
+    '''
+    CB pipeline: catalog, field features, similarity, artifacts, recommendations and tuning, in one MLflow run.
+
+    The served similarity is computed on the field-weighted features, with the best weights of
+    the tuning sweep; with lsa_components set, on LSA embeddings of that dimension.
+    '''
+    # Each branch owns its run explicitly; fluent MLflow state is per thread and set_experiment is global
+    experiment_id = mlflow.get_experiment_by_name(cb.EXPERIMENT_NAME).experiment_id
+    with mlflow.start_run(run_name="ContentBased", experiment_id=experiment_id):
+        with span('content_based_branch') as branch_span:
+            processed_df = MovieRecommendationSystem.load_and_preprocess_data()
+            # The full frame is released here; only the feature columns go on
+            catalog, processed_df = MovieRecommendationSystem.log_catalog(processed_df)
+            processed_df = MovieRecommendationSystem.preprocess_text_features(processed_df)
+            # The similarity is served from the field-weighted features with the best weights found
+            best_params = MovieRecommendationSystem.run_optimization(num_trials=num_trials, processed_df=processed_df)
+            field_weights = tuned_weights(best_params)
+            field_matrices = MovieRecommendationSystem.create_field_matrices(processed_df)
+            features_matrix = MovieRecommendationSystem.combine_field_matrices(field_matrices, field_weights)
+            if lsa_components:
+                _, embeddings = MovieRecommendationSystem.create_lsa_embeddings(features_matrix, lsa_components)
+                MovieRecommendationSystem.log_embeddings(embeddings, processed_df, features_matrix)
+                cosine_sim = MovieRecommendationSystem.calculate_embedding_similarity(embeddings)
+            else:
+                cosine_sim = MovieRecommendationSystem.calculate_cosine_similarity(features_matrix)
+            MovieRecommendationSystem.log_model_and_artifacts(field_matrices, processed_df, cosine_sim, field_weights)
+            recommendations = MovieRecommendationSystem.get_content_based_recommendations(
+                movie_id=movie_id, cosine_sim=cosine_sim, catalog=catalog)
+        log_trace_to_mlflow([branch_span])
+        cb.tracker.flush()
+    return {'recommendations': recommendations, 'best_params': best_params}
+
+
+@task
+def collaborative_branch(user_id=1930, num_trials=1):
+    '''
+    CF pipeline: ratings, split, SVD++ fit, export, recommendations, tuning and registration.
+    '''
+    MovieRecommendationFlow.start_mlflow_run()
+    with span('collaborative_branch') as branch_span:
+        data = MovieRecommendationFlow.load_rating_data()
+        train_data, test_data = MovieRecommendationFlow.prepare_data(data)
+        trained_model, n_factors, n_epochs, lr_all, reg_all = MovieRecommendationFlow.train_svd_model(train_data)
+        MovieRecommendationFlow.log_parameters_and_recommendations(
+            trained_model, n_factors, n_epochs, lr_all, reg_all, test_data)
+        MovieRecommendationFlow.export_compact_model(trained_model)
+        recommendations = MovieRecommendationFlow.get_cf_recommendations(user_id=user_id, model=trained_model, data=data)
+        best_params = MovieRecommendationFlow.run_optimization(num_trials=num_trials, train_data=train_data,
+                                                               test_data=test_data)
+        MovieRecommendationFlow.register_and_set_stage_model(cf.client)
+    log_trace_to_mlflow([branch_span])
+    MovieRecommendationFlow.end_mlflow_run()
+    return {'recommendations': recommendations, 'best_params': best_params}
+
+
+@flow(name="recommendation-pipeline", task_runner=get_task_runner())
+def main_flow(movie_id=19995, user_id=1930, num_trials=1, lsa_components=None):
+    # The branches share no data, so they run side by side on the task runner
+    cb_future = content_based_branch.submit(movie_id=movie_id, num_trials=num_trials, lsa_components=lsa_components)
+    cf_future = collaborative_branch.submit(user_id=user_id, num_trials=num_trials)
+    return {'content_based': cb_future.result(), 'collaborative': cf_future.result()}
+
+
+if __name__ == '__main__':
+    with sampling_profiler(os.getenv("RECOMM_PROFILE")):
+        main_flow()
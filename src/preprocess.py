@@ -5,18 +5,22 @@ import json
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
+import os
 import re
 
-def load_movie_data() -> pd.DataFrame:
+def load_movie_data(data_dir: str = 'data') -> pd.DataFrame:
     '''
     Load data from CSV files and merge them.
 
+    Args:
+        data_dir (str): Directory containing the TMDB credits and movies CSV files.
+
     Returns:
         pd.DataFrame: Merged DataFrame containing movie information.
     '''
     try:
-        cred = pd.read_csv('data/tmdb_5000_credits.csv')
-        mov = pd.read_csv('data/tmdb_5000_movies.csv')
+        cred = pd.read_csv(os.path.join(data_dir, 'tmdb_5000_credits.csv'))
+        mov = pd.read_csv(os.path.join(data_dir, 'tmdb_5000_movies.csv'))
         merged_df = mov.merge(cred, left_on='id', right_on='movie_id')
         merged_df.drop(['id','title_y'], axis=1, inplace=True)
         
@@ -28,9 +32,6 @@ def load_movie_data() -> pd.DataFrame:
         print(f"An error occurred: {e}")
         return pd.DataFrame()
 
-# Load the data
-merged_df = load_movie_data()
-
 def preprocess_and_feature_extraction(merged_df: pd.DataFrame) -> pd.DataFrame:
     '''
     Preprocess the movie dataset and extract relevant features.
@@ -67,37 +68,49 @@ def preprocess_and_feature_extraction(merged_df: pd.DataFrame) -> pd.DataFrame:
     
     return merged_df
 
-processed_df = preprocess_and_feature_extraction(merged_df)
+def missing_value_fills(df: pd.DataFrame) -> dict:
+    '''
+    Values handling_missing_values fills missing runtime and year with: the rounded mean year and the mean runtime.
+
+    Args:
+        df (pd.DataFrame): Preprocessed DataFrame with 'runtime' and 'year' columns.
+
+    Returns:
+        dict: {'runtime': float, 'year': int}.
+    '''
+    return {'runtime': df['runtime'].mean(), 'year': round(pd.to_numeric(df['year'], errors='coerce').mean())}
+
 
-def handling_missing_values(df: pd.DataFrame) -> pd.DataFrame:
+def handling_missing_values(df: pd.DataFrame, fills: dict = None) -> pd.DataFrame:
     '''
     Handle missing values in the DataFrame.
 
     Args:
         df (pd.DataFrame): Input DataFrame with missing values.
+        fills (dict, optional): Runtime and year fills from missing_value_fills, e.g. computed over
+            the whole catalog when df is one chunk of it; defaults to the means of df.
 
     Returns:
         pd.DataFrame: DataFrame with missing values handled.
     '''
+    fills = fills or missing_value_fills(df)
     df['has_homepage'] = df['homepage'].notnull().astype(int)
     df['has_tagline'] = df['tagline'].notnull().astype(int)
     df.drop(['homepage', 'tagline'], axis=1, inplace=True)
 
-    df['overview'].fillna(' ', inplace=True)
+    # Assigned back: with copy-on-write (pandas 3) an inplace fillna on a column does nothing
+    df['overview'] = df['overview'].fillna(' ')
     default_date = pd.to_datetime('1900-01-01')  # A default date to replace missing release_date values
     df['release_date'] = df['release_date'].fillna(default_date)
-    df['runtime'].fillna(df['runtime'].mean(), inplace=True)
+    df['runtime'] = df['runtime'].fillna(fills['runtime'])
     
     df['year'] = pd.to_numeric(df['year'], errors='coerce')
-    mean_year = round(df['year'].mean())
-    df['year'].fillna(mean_year, inplace=True)
+    df['year'] = df['year'].fillna(fills['year'])
     
-    df['director'].fillna('Not Available', inplace=True)
+    df['director'] = df['director'].fillna('Not Available')
     
     return df
 
-handled_df = handling_missing_values(processed_df)
-
 def preprocess_text(text):
     '''
     Preprocesses text data by lowercasing and removing special characters and digits.
@@ -134,13 +147,27 @@ def tokenize_and_lemmatize(text):
 
 features_to_preprocess = ['director', 'genre_names', 'cast_names', 'keyword_names', 'language', 'overview']
 
-for feature in features_to_preprocess:
-    if feature in handled_df.columns:
-        handled_df[feature] = handled_df[feature].astype(str).apply(preprocess_text)
-        handled_df[feature] = handled_df[feature].apply(tokenize_and_lemmatize)
+def normalize_text_features(df: pd.DataFrame, features: list = features_to_preprocess) -> pd.DataFrame:
+    '''
+    Normalize, tokenize and lemmatize the text feature columns.
+
+    Args:
+        df (pd.DataFrame): DataFrame with missing values handled.
+        features (list): Columns to normalize.
+
+    Returns:
+        pd.DataFrame: DataFrame with the feature columns replaced by token lists.
+    '''
+    for feature in features:
+        if feature in df.columns:
+            df[feature] = df[feature].astype(str).apply(preprocess_text)
+            df[feature] = df[feature].apply(tokenize_and_lemmatize)
+    return df
 
 
-# Accessing the resulting DataFrames
-merged_df = load_movie_data()
-processed_df = preprocess_and_feature_extraction(merged_df)
-handled_df = handling_missing_values(processed_df)
+if __name__ == '__main__':
+    # Accessing the resulting DataFrames
+    merged_df = load_movie_data()
+    processed_df = preprocess_and_feature_extraction(merged_df)
+    handled_df = handling_missing_values(processed_df)
+    handled_df = normalize_text_features(handled_df)
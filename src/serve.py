@@ -0,0 +1,395 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from src.compact_model import CompactCFModel
+from src.embeddings import load_embeddings
+
+SERVICE_URL_ENV = 'RECOMM_SERVICE_URL'
+
+
+class TTLCache:
+    '''
+    LRU cache whose entries also expire after a fixed time-to-live.
+
+    Args:
+        maxsize (int): Maximum number of entries kept.
+        ttl (float): Seconds an entry stays valid.
+    '''
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MicroBatcher:
+    '''
+    Gather concurrent requests into batches for one vectorized scoring call.
+
+    A batch is flushed when it reaches `max_batch_size` or `max_wait_ms` after its first request.
+    Scoring runs in the default executor so the event loop keeps accepting requests.
+
+    Args:
+        score_fn (callable): Takes a list of (entity_id, top_n) and returns one result per item.
+        max_batch_size (int): Maximum requests per batch.
+        max_wait_ms (float): Maximum time the first request of a batch waits for company.
+    '''
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self.batch_sizes = []
+
+    async def submit(self, entity_id, top_n):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((entity_id, top_n), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batch_sizes.append(len(batch))
+            try:
+                results = await loop.run_in_executor(None, self.score_fn, [item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class ContentBasedIndex:
+    '''
+    Batched lookups in the precomputed content-based similarity matrix, or in LSA embeddings.
+
+    Args:
+        movie_ids (np.ndarray): Movie id of each row of the similarity matrix.
+        similarity (np.ndarray, optional): (n_movies, n_movies) similarity matrix, may be memory-mapped.
+        embeddings (np.ndarray, optional): (n_movies, dim) L2-normalized embeddings used instead of
+            the similarity matrix; a batch of lookups is then one GEMM.
+    '''
+    def __init__(self, movie_ids, similarity=None, embeddings=None):
+        if similarity is None and embeddings is None:
+            raise ValueError("Either a similarity matrix or embeddings are required")
+        order = np.argsort(movie_ids, kind='stable')
+        self.movie_ids = np.asarray(movie_ids)
+        self._sorted_ids = self.movie_ids[order]
+        self._sorted_rows = order
+        self.similarity = similarity
+        self.embeddings = embeddings
+
+    @classmethod
+    def load(cls, movie_ids_path, similarity_path):
+        return cls(np.load(movie_ids_path), np.load(similarity_path, mmap_mode='r'))
+
+    @classmethod
+    def load_embeddings(cls, path):
+        embeddings, movie_ids = load_embeddings(path)
+        return cls(movie_ids, embeddings=embeddings)
+
+    def _scores(self, rows):
+        if self.embeddings is not None:
+            return np.asarray(self.embeddings[rows], dtype=np.float32) @ np.asarray(self.embeddings, dtype=np.float32).T
+        return np.asarray(self.similarity[rows], dtype=np.float32)
+
+    def recommend(self, movie_ids, top_n=10):
+        '''
+        Return the most similar movies for a batch of movie ids, excluding the movie itself.
+
+        Returns:
+            list: One (movie_ids, scores) tuple per query; empty arrays for unknown movies.
+        '''
+        ids = np.asarray(movie_ids, dtype=self._sorted_ids.dtype)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, ids), self._sorted_ids.size - 1)
+        known = self._sorted_ids[positions] == ids
+        rows = self._sorted_rows[positions]
+        scores = self._scores(rows[known])
+        n = min(top_n + 1, self.movie_ids.size)
+
+        results, i = [], 0
+        for row, is_known in zip(rows, known):
+            if not is_known:
+                results.append((self.movie_ids[:0], np.empty(0, dtype=np.float32)))
+                continue
+            row_scores = scores[i]
+            i += 1
+            row_scores[row] = -np.inf
+            top = np.argpartition(-row_scores, n - 1)[:n]
+            top = top[np.argsort(-row_scores[top])][:top_n]
+            results.append((self.movie_ids[top], row_scores[top]))
+        return results
+
+
+def load_compact_model(artifact_uri):
+    '''
+    Load a compact CF model from a local directory or an MLflow artifact URI (e.g. runs:/<id>/compact_model).
+    '''
+    if not os.path.isdir(artifact_uri):
+        import mlflow
+        artifact_uri = mlflow.artifacts.download_artifacts(artifact_uri=artifact_uri)
+    return CompactCFModel.load(artifact_uri)
+
+
+class RecommendationService:
+    '''
+    Serve CF and CB recommendations with micro-batched scoring and a versioned result cache.
+
+    Cache keys are (model version, kind, entity id, top_n). Moving to a new model version swaps
+    the models and clears the cache, so stale recommendations are never served. Every switch also
+    bumps `generation`; a result is only cached if no switch happened while it was being scored,
+    even when the version string stays the same (e.g. when the model behind it is swapped in).
+
+    Args:
+        cf_model (CompactCFModel, optional): Collaborative filtering model.
+        cb_index (ContentBasedIndex, optional): Content-based similarity index.
+        model_version (str): Version of the production model being served.
+        cache_size (int): Maximum cached results.
+        cache_ttl (float): Seconds a cached result stays valid.
+        max_batch_size (int): Maximum requests scored together.
+        max_wait_ms (float): Maximum time a request waits for its batch to fill.
+    '''
+    def __init__(self, cf_model=None, cb_index=None, model_version='0', cache_size=10000, cache_ttl=300.0,
+                 max_batch_size=64, max_wait_ms=2.0):
+        self.cf_model = cf_model
+        self.cb_index = cb_index
+        self.model_version = str(model_version)
+        self.generation = 0
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.batchers = {
+            'cf': MicroBatcher(self._score_cf, max_batch_size, max_wait_ms),
+            'cb': MicroBatcher(self._score_cb, max_batch_size, max_wait_ms),
+        }
+
+    def _score_cf(self, requests):
+        top_n = max(n for _, n in requests)
+        results = self.cf_model.recommend([user_id for user_id, _ in requests], top_n=top_n)
+        return [(items[:n].tolist(), scores[:n].tolist()) for (_, n), (items, scores) in zip(requests, results)]
+
+    def _score_cb(self, requests):
+        top_n = max(n for _, n in requests)
+        results = self.cb_index.recommend([movie_id for movie_id, _ in requests], top_n=top_n)
+        return [(items[:n].tolist(), scores[:n].tolist()) for (_, n), (items, scores) in zip(requests, results)]
+
+    def set_model_version(self, version, cf_model=None, cb_index=None):
+        '''
+        Switch to a new model version, swapping in any new models and invalidating the cache.
+        '''
+        if cf_model is not None:
+            self.cf_model = cf_model
+        if cb_index is not None:
+            self.cb_index = cb_index
+        self.model_version = str(version)
+        self.generation += 1
+        self.cache.clear()
+
+    async def recommend(self, kind, entity_id, top_n=10):
+        if (kind == 'cf' and self.cf_model is None) or (kind == 'cb' and self.cb_index is None):
+            raise LookupError(f"No {kind} model loaded")
+        if top_n < 1:
+            raise ValueError(f"top_n must be positive, got {top_n}")
+        key = (self.model_version, kind, entity_id, top_n)
+        result = self.cache.get(key)
+        if result is None:
+            generation = self.generation
+            result = await self.batchers[kind].submit(entity_id, top_n)
+            # Only cache if no model was swapped in while the request was being scored
+            if generation == self.generation:
+                self.cache.put(key, result)
+        items, scores = result
+        return {'model_version': key[0], 'kind': kind, 'id': entity_id, 'items': items, 'scores': scores}
+
+    def stats(self):
+        batch_sizes = [size for batcher in self.batchers.values() for size in batcher.batch_sizes]
+        return {
+            'model_version': self.model_version,
+            'cache_entries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'batches': len(batch_sizes),
+            'mean_batch_size': float(np.mean(batch_sizes)) if batch_sizes else 0.0,
+        }
+
+    async def handle_request(self, method, path, body):
+        '''
+        Route one HTTP request and return (status, payload).
+
+        Routes:
+            GET /recommendations/{cf|cb}/<id>?top_n=10
+            POST /model-version  {"version": "...", "artifact_uri": "..."}
+            GET /stats, GET /health
+        '''
+        url = urlsplit(path)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if method == 'GET' and len(parts) == 3 and parts[0] == 'recommendations' and parts[1] in self.batchers:
+                top_n = int(parse_qs(url.query).get('top_n', ['10'])[0])
+                return 200, await self.recommend(parts[1], int(parts[2]), top_n)
+            if method == 'POST' and parts == ['model-version']:
+                request = json.loads(body or b'{}')
+                # A new version invalidates cached results even if its model cannot be loaded below
+                self.set_model_version(request['version'])
+                if request.get('artifact_uri'):
+                    try:
+                        cf_model = await asyncio.get_running_loop().run_in_executor(
+                            None, load_compact_model, request['artifact_uri'])
+                    except Exception as e:
+                        return 500, {'error': f"Could not load {request['artifact_uri']}, keeping the current model: {e}",
+                                     'model_version': self.model_version}
+                    # Clears again what the old model scored while the new one was loading
+                    self.set_model_version(request['version'], cf_model=cf_model)
+                return 200, {'model_version': self.model_version}
+            if method == 'GET' and parts == ['stats']:
+                return 200, self.stats()
+            if method == 'GET' and parts == ['health']:
+                return 200, {'status': 'ok'}
+            return 404, {'error': 'not found'}
+        except (ValueError, KeyError) as e:
+            return 400, {'error': str(e)}
+        except LookupError as e:
+            return 503, {'error': str(e)}
+
+    @staticmethod
+    async def _read_request(reader):
+        '''
+        Read one request; returns None at end of stream and raises ValueError if it is malformed.
+        '''
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode().split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, value = line.decode().split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+        return method, path, headers, body
+
+    @staticmethod
+    async def _write_response(writer, status, payload):
+        data = json.dumps(payload).encode()
+        writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                     f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n'.encode() + data)
+        await writer.drain()
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as e:
+                    # The stream position is unknown after a malformed request, so the connection is closed
+                    await self._write_response(writer, 400, {'error': f"Malformed request: {e}"})
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.handle_request(method, path, body)
+                await self._write_response(writer, status, payload)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+
+def notify_model_version(version, artifact_uri=None, service_url=None):
+    '''
+    Tell a running recommendation service that a new model version is in Production.
+
+    Does nothing unless a service URL is given or set in RECOMM_SERVICE_URL.
+    '''
+    service_url = service_url or os.environ.get(SERVICE_URL_ENV)
+    if not service_url:
+        return
+    payload = json.dumps({'version': str(version), 'artifact_uri': artifact_uri}).encode()
+    request = urllib.request.Request(f"{service_url.rstrip('/')}/model-version", data=payload,
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve CF and CB movie recommendations over HTTP.')
+    parser.add_argument('--cf-model', help='Compact CF model directory or MLflow artifact URI')
+    parser.add_argument('--cb-movie-ids', help='movie_ids.npy aligned with the similarity matrix')
+    parser.add_argument('--cb-similarity', help='cosine_similarity.npy')
+    parser.add_argument('--cb-embeddings', help='Directory with embeddings.npy and movie_ids.npy (LSA index)')
+    parser.add_argument('--model-version', default='0')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    cf_model = load_compact_model(args.cf_model) if args.cf_model else None
+    cb_index = ContentBasedIndex.load(args.cb_movie_ids, args.cb_similarity) if args.cb_similarity else None
+    if args.cb_embeddings:
+        cb_index = ContentBasedIndex.load_embeddings(args.cb_embeddings)
+    service = RecommendationService(cf_model, cb_index, model_version=args.model_version)
+
+    async def serve():
+        server = await service.start(args.host, args.port)
+        print(f"Serving recommendations on http://{args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Half-star rating distribution of data/ratings_small.csv
+RATING_VALUES = np.arange(0.5, 5.01, 0.5)
+RATING_SHARE = np.array([0.011, 0.033, 0.017, 0.073, 0.044, 0.201, 0.105, 0.287, 0.077, 0.151])
+# MovieLens only allowed whole stars before half stars were introduced in February 2003
+HALF_STARS_FROM = 1044921600
+FIRST_TIMESTAMP = 789652009
+LAST_TIMESTAMP = 1476640644
+USERS_PER_BLOCK = 1000
+
+GENRES = [(28, 'Action'), (12, 'Adventure'), (16, 'Animation'), (35, 'Comedy'), (80, 'Crime'),
+          (99, 'Documentary'), (18, 'Drama'), (10751, 'Family'), (14, 'Fantasy'), (36, 'History'),
+          (27, 'Horror'), (10402, 'Music'), (9648, 'Mystery'), (10749, 'Romance'), (878, 'Science Fiction'),
+          (10770, 'TV Movie'), (53, 'Thriller'), (10752, 'War'), (37, 'Western'), (10769, 'Foreign')]
+LANGUAGES = [('en', 'English'), ('fr', 'Français'), ('es', 'Español'), ('de', 'Deutsch'), ('it', 'Italiano'),
+             ('ja', '日本語'), ('zh', '普通话'), ('ru', 'Pусский'), ('hi', 'हिन्दी'), ('ko', '한국어/조선말')]
+COUNTRIES = [('US', 'United States of America'), ('GB', 'United Kingdom'), ('FR', 'France'), ('DE', 'Germany'),
+             ('CA', 'Canada'), ('IN', 'India'), ('JP', 'Japan'), ('ES', 'Spain'), ('IT', 'Italy'), ('AU', 'Australia')]
+CREW_JOBS = [('Directing', 'Director'), ('Writing', 'Screenplay'), ('Production', 'Producer'),
+             ('Sound', 'Original Music Composer'), ('Camera', 'Director of Photography'), ('Editing', 'Editor')]
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+               'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Akira', 'Mei', 'Pierre', 'Sofia', 'Hans', 'Lucia', 'Ivan', 'Priya', 'Kenji', 'Ana']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+              'Kurosawa', 'Dubois', 'Rossi', 'Schmidt', 'Petrov', 'Kapoor', 'Tanaka', 'Silva', 'Novak', 'Kowalski']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ne', 'to', 'su', 'vi', 'de', 'an', 'or', 'el', 'us', 'ing', 'ter', 'mon',
+             'gar', 'lin', 'bel', 'dor', 'fen', 'hal', 'jor', 'kel', 'mar', 'nor', 'pel', 'sar', 'tor', 'wen']
+
+
+def default_sizes(n_rows):
+    '''
+    Pick MovieLens-like user and movie counts for a number of ratings.
+
+    ratings_small.csv has ~150 ratings per user and ~9k movies for 100k ratings; the movie
+    count grows with the square root of the number of ratings.
+
+    Args:
+        n_rows (int): Number of ratings.
+
+    Returns:
+        tuple: (n_users, n_movies)
+    '''
+    return max(n_rows // 150, 10), int(min(max(30 * np.sqrt(n_rows), 100), 1_000_000))
+
+
+def _zipf_weights(n, alpha, rng):
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    # Shuffle so popularity is not tied to id order
+    return rng.permutation(weights / weights.sum())
+
+
+def _word(k):
+    # Deterministic pseudo-word for vocabulary entry k
+    word = ''
+    while True:
+        word += SYLLABLES[k % len(SYLLABLES)]
+        k //= len(SYLLABLES)
+        if k == 0:
+            return word
+
+
+def _person(k):
+    name = f'{FIRST_NAMES[k % len(FIRST_NAMES)]} {LAST_NAMES[(k // len(FIRST_NAMES)) % len(LAST_NAMES)]}'
+    suffix = k // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f'{name} {_word(suffix).title()}' if suffix else name
+
+
+class _RatingModel:
+    '''
+    Shared per-user and per-item parameters, derived from the seed alone.
+    '''
+    def __init__(self, n_rows, n_users, n_movies, seed, min_ratings, user_alpha, item_alpha):
+        rng = np.random.default_rng([seed, 0])
+        self.n_users, self.n_movies = n_users, n_movies
+        min_ratings = min(min_ratings, n_rows // n_users, n_movies)
+
+        # Power-law user activity: every user gets min_ratings, the rest is shared by Pareto weights
+        weights = rng.pareto(user_alpha, n_users) + 1.0
+        counts = min_ratings + rng.multinomial(n_rows - min_ratings * n_users, weights / weights.sum())
+        cap = max(n_movies // 4, min_ratings)
+        for _ in range(10):
+            excess = int(np.maximum(counts - cap, 0).sum())
+            if excess == 0:
+                break
+            counts = np.minimum(counts, cap)
+            open_users = counts < cap
+            counts[open_users] += rng.multinomial(excess, weights[open_users] / weights[open_users].sum())
+        self.counts = counts
+
+        self.item_cdf = np.cumsum(_zipf_weights(n_movies, item_alpha, rng))
+        self.item_cdf[-1] = 1.0
+        self.item_quality = rng.normal(0.0, 0.5, n_movies)
+        self.user_bias = rng.normal(0.0, 0.4, n_users)
+        self.user_start = rng.integers(FIRST_TIMESTAMP, LAST_TIMESTAMP, n_users)
+        # Most users rate in a few sessions, some stay active for years
+        self.user_span = np.minimum(rng.exponential(180 * 86400, n_users), LAST_TIMESTAMP - self.user_start)
+
+    def block(self, block_index, seed):
+        '''
+        Generate the ratings of one fixed-size user block, independent of chunking.
+        '''
+        rng = np.random.default_rng([seed, 1, block_index])
+        first = block_index * USERS_PER_BLOCK
+        users = np.arange(first, min(first + USERS_PER_BLOCK, self.n_users))
+        needed = self.counts[users].copy()
+
+        user_parts, item_parts = [], []
+        for attempt in range(6):
+            pending = needed > 0
+            if not pending.any():
+                break
+            # Oversample, then keep the first distinct items per user
+            draws = np.ceil(needed[pending] * 1.2 * 2 ** attempt).astype(np.int64) + 2
+            draw_users = np.repeat(users[pending], draws)
+            if attempt < 5:
+                draw_items = np.searchsorted(self.item_cdf, rng.random(draw_users.size))
+            else:
+                # Heavy users can exhaust the popular head, fill the rest from the whole catalog
+                draw_items = rng.integers(0, self.n_movies, draw_users.size)
+            if user_parts:
+                draw_users = np.concatenate([np.concatenate(user_parts), draw_users])
+                draw_items = np.concatenate([np.concatenate(item_parts), draw_items])
+            keys = draw_users.astype(np.int64) * self.n_movies + draw_items
+            _, first_seen = np.unique(keys, return_index=True)
+            first_seen.sort()
+            draw_users, draw_items = draw_users[first_seen], draw_items[first_seen]
+            # Group by user while keeping draw order within each user
+            by_user = np.argsort(draw_users, kind='stable')
+            draw_users, draw_items = draw_users[by_user], draw_items[by_user]
+            starts = np.searchsorted(draw_users, users)
+            rank = np.arange(draw_users.size) - starts[draw_users - first]
+            keep = rank < self.counts[draw_users]
+            user_parts, item_parts = [draw_users[keep]], [draw_items[keep]]
+            needed = self.counts[users] - np.bincount(draw_users[keep] - first, minlength=users.size)
+
+        block_users = user_parts[0] if user_parts else np.empty(0, dtype=np.int64)
+        block_items = item_parts[0] if item_parts else np.empty(0, dtype=np.int64)
+
+        timestamps = self.user_start[block_users] + (rng.beta(0.5, 2.0, block_users.size)
+                                                     * self.user_span[block_users]).astype(np.int64)
+        latent = 3.5 + self.item_quality[block_items] + self.user_bias[block_users] + rng.normal(0, 0.9, block_users.size)
+        # Map the latent score onto the half-star distribution of the real data
+        ranks = np.argsort(np.argsort(latent, kind='stable'), kind='stable') / max(latent.size - 1, 1)
+        ratings = RATING_VALUES[np.searchsorted(np.cumsum(RATING_SHARE) / RATING_SHARE.sum(), ranks, side='left')
+                                .clip(0, RATING_VALUES.size - 1)]
+        whole_stars = timestamps < HALF_STARS_FROM
+        ratings[whole_stars] = np.clip(np.ceil(ratings[whole_stars]), 1.0, 5.0)
+
+        return pd.DataFrame({
+            'userId': (block_users + 1).astype(np.int32),
+            'movieId': (block_items + 1).astype(np.int32),
+            'rating': ratings,
+            'timestamp': timestamps,
+        })
+
+
+def generate_ratings(n_rows, n_users=None, n_movies=None, seed=42, chunk_size=1_000_000, min_ratings=20,
+                     user_alpha=1.2, item_alpha=0.8):
+    '''
+    Generate MovieLens-style ratings in chunks.
+
+    User activity follows a Pareto law with at least `min_ratings` ratings per user, item
+    popularity a Zipf law, ratings follow the half-star distribution of ratings_small.csv
+    (whole stars before 2003) and timestamps cluster in per-user activity windows.
+    Users are generated in fixed blocks with their own seeds, so the output depends only on the
+    seed and the sizes, not on chunk_size.
+
+    Args:
+        n_rows (int): Target number of ratings.
+        n_users (int, optional): Number of users, see default_sizes.
+        n_movies (int, optional): Number of movies, see default_sizes.
+        seed (int): Random seed.
+        chunk_size (int): Approximate number of rows per yielded chunk.
+        min_ratings (int): Minimum ratings per user.
+        user_alpha (float): Pareto shape of user activity (smaller is heavier tailed).
+        item_alpha (float): Zipf exponent of item popularity.
+
+    Yields:
+        pd.DataFrame: Chunks with userId, movieId, rating and timestamp columns.
+    '''
+    default_users, default_movies = default_sizes(n_rows)
+    model = _RatingModel(n_rows, n_users or default_users, n_movies or default_movies, seed, min_ratings,
+                         user_alpha, item_alpha)
+    pending, pending_rows = [], 0
+    for block_index in range(-(-model.n_users // USERS_PER_BLOCK)):
+        frame = model.block(block_index, seed)
+        pending.append(frame)
+        pending_rows += len(frame)
+        if pending_rows >= chunk_size:
+            yield pd.concat(pending, ignore_index=True)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def _movie_records(movie_ids, seed, vocabulary_size, n_people, n_companies):
+    rng = np.random.default_rng([seed, 2, int(movie_ids[0])])
+    keyword_cdf = np.cumsum(1.0 / np.arange(1, vocabulary_size + 1))
+    keyword_cdf /= keyword_cdf[-1]
+    people_cdf = np.cumsum(1.0 / np.arange(1, n_people + 1) ** 0.8)
+    people_cdf /= people_cdf[-1]
+
+    def zipf_pick(cdf, count):
+        return np.unique(np.searchsorted(cdf, rng.random(count)))
+
+    movies, credits = [], []
+    for movie_id in movie_ids:
+        movie_id = int(movie_id)
+        title = ' '.join(_word(int(k)).title() for k in rng.integers(0, vocabulary_size, rng.integers(1, 4)))
+        genres = [{'id': GENRES[g][0], 'name': GENRES[g][1]}
+                  for g in rng.choice(len(GENRES), rng.integers(1, 5), replace=False)]
+        keywords = [{'id': int(k), 'name': _word(int(k))} for k in zipf_pick(keyword_cdf, rng.integers(0, 16))]
+        companies = [{'name': f'{_word(int(k)).title()} Pictures', 'id': int(k)}
+                     for k in rng.integers(0, n_companies, rng.integers(0, 4))]
+        country = COUNTRIES[min(int(rng.exponential(1.5)), len(COUNTRIES) - 1)]
+        languages = [LANGUAGES[min(int(rng.exponential(1.0)), len(LANGUAGES) - 1)]]
+        if rng.random() < 0.2:
+            languages.append(LANGUAGES[int(rng.integers(len(LANGUAGES)))])
+        languages = list(dict.fromkeys(languages))
+        release = None if rng.random() < 0.001 else (np.datetime64('1916-01-01')
+                                                      + int(100 * 365 * rng.beta(5, 1.5))).astype(str)
+        cast = [{'cast_id': order + 1, 'character': _person(int(k) + 7).split()[0], 'credit_id': f'{movie_id:08x}{order:04x}',
+                 'gender': int(rng.integers(0, 3)), 'id': int(k), 'name': _person(int(k)), 'order': order}
+                for order, k in enumerate(zipf_pick(people_cdf, rng.integers(0, 16)))]
+        crew = [{'credit_id': f'{movie_id:08x}c{i:03x}', 'department': department, 'gender': int(rng.integers(0, 3)),
+                 'id': int(k), 'job': job, 'name': _person(int(k))}
+                for i, ((department, job), k) in enumerate(zip(CREW_JOBS[:int(rng.integers(1, len(CREW_JOBS) + 1))],
+                                                              zipf_pick(people_cdf, len(CREW_JOBS) * 2)))]
+        budget = int(rng.lognormal(16, 1.5)) if rng.random() < 0.75 else 0
+        movies.append({
+            'budget': budget,
+            'genres': json.dumps(genres),
+            'homepage': f'http://www.{title.replace(" ", "").lower()}.com/' if rng.random() < 0.35 else None,
+            'id': movie_id,
+            'keywords': json.dumps(keywords),
+            'original_language': languages[0][0],
+            'original_title': title,
+            'overview': ' '.join(_word(int(k)) for k in rng.integers(0, vocabulary_size, rng.integers(10, 80)))
+                        if rng.random() < 0.999 else None,
+            'popularity': float(rng.pareto(1.5)),
+            'production_companies': json.dumps(companies),
+            'production_countries': json.dumps([{'iso_3166_1': country[0], 'name': country[1]}]),
+            'release_date': release,
+            'revenue': int(budget * rng.lognormal(0.5, 1.0)) if budget else 0,
+            'runtime': float(int(rng.normal(107, 22))) if rng.random() < 0.995 else None,
+            'spoken_languages': json.dumps([{'iso_639_1': code, 'name': name} for code, name in languages]),
+            'status': 'Released' if rng.random() < 0.998 else 'Rumored',
+            'tagline': ' '.join(_word(int(k)) for k in rng.integers(0, vocabulary_size, 6)) if rng.random() < 0.8 else None,
+            'title': title,
+            'vote_average': round(float(np.clip(rng.normal(6.1, 1.0), 0, 10)), 1),
+            'vote_count': int(rng.pareto(1.2) * 50),
+        })
+        credits.append({'movie_id': movie_id, 'title': title, 'cast': json.dumps(cast), 'crew': json.dumps(crew)})
+    return pd.DataFrame(movies), pd.DataFrame(credits)
+
+
+def generate_movies(n_movies, seed=42, chunk_size=10_000, vocabulary_size=20_000):
+    '''
+    Generate TMDB-style movie metadata and credits in chunks.
+
+    The genres, keywords, cast, crew, production_companies and spoken_languages columns hold
+    JSON strings in the same format as the TMDB 5000 CSVs, so they go through
+    `preprocess_and_feature_extraction` unchanged. Movie ids run from 1 to n_movies, matching
+    the movieId values of `generate_ratings`.
+
+    Args:
+        n_movies (int): Number of movies.
+        seed (int): Random seed.
+        chunk_size (int): Movies per yielded chunk.
+        vocabulary_size (int): Size of the pseudo-word vocabulary for titles, overviews and keywords.
+
+    Yields:
+        tuple: (movies, credits) DataFrame chunks.
+    '''
+    n_people = max(n_movies * 3, 1000)
+    n_companies = max(n_movies // 5, 100)
+    # Blocks of 1000 movies get their own seeds, keeping the output independent of chunk_size
+    movies, credits = [], []
+    for start in range(1, n_movies + 1, 1000):
+        block_movies, block_credits = _movie_records(np.arange(start, min(start + 1000, n_movies + 1)), seed,
+                                                     vocabulary_size, n_people, n_companies)
+        movies.append(block_movies)
+        credits.append(block_credits)
+        if sum(len(m) for m in movies) >= chunk_size:
+            yield pd.concat(movies, ignore_index=True), pd.concat(credits, ignore_index=True)
+            movies, credits = [], []
+    if movies:
+        yield pd.concat(movies, ignore_index=True), pd.concat(credits, ignore_index=True)
+
+
+def write_ratings_csv(path, n_rows, **kwargs):
+    '''
+    Stream generated ratings to a CSV file one chunk at a time.
+
+    Returns:
+        int: Number of rows written.
+    '''
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    written = 0
+    for i, chunk in enumerate(generate_ratings(n_rows, **kwargs)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        written += len(chunk)
+    return written
+
+
+def write_tmdb_csvs(data_dir, n_movies, **kwargs):
+    '''
+    Stream generated movies and credits to the CSV files `load_movie_data` reads.
+
+    Returns:
+        int: Number of movies written.
+    '''
+    os.makedirs(data_dir, exist_ok=True)
+    movies_path = os.path.join(data_dir, 'tmdb_5000_movies.csv')
+    credits_path = os.path.join(data_dir, 'tmdb_5000_credits.csv')
+    written = 0
+    for i, (movies, credits) in enumerate(generate_movies(n_movies, **kwargs)):
+        movies.to_csv(movies_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        credits.to_csv(credits_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        written += len(movies)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic MovieLens ratings and TMDB metadata.')
+    parser.add_argument('--ratings', type=int, default=100_000, help='Number of ratings to generate')
+    parser.add_argument('--users', type=int, help='Number of users (default scales with --ratings)')
+    parser.add_argument('--movies', type=int, help='Number of movies (default scales with --ratings)')
+    parser.add_argument('--out', default='data/synthetic')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--skip-metadata', action='store_true', help='Only write ratings')
+    args = parser.parse_args()
+
+    n_users, n_movies = default_sizes(args.ratings)
+    n_users, n_movies = args.users or n_users, args.movies or n_movies
+    rows = write_ratings_csv(os.path.join(args.out, 'ratings.csv'), args.ratings, n_users=n_users,
+                             n_movies=n_movies, seed=args.seed, chunk_size=args.chunk_size)
+    print(f"Wrote {rows} ratings for {n_users} users and {n_movies} movies")
+    if not args.skip_metadata:
+        movies = write_tmdb_csvs(args.out, n_movies, seed=args.seed)
+        print(f"Wrote metadata for {movies} movies")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,17 @@
+import json
+import random
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from src.perf import summarize_latencies
+
+# Magic number that starts every record in a recordio-protobuf stream
+RECORDIO_MAGIC = 0xced7230a
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'Throttling', 'TooManyRequestsException', 'ServiceUnavailable'}
+
 
 def fetch_protobuf_data_from_s3(bucket, key):
     """
@@ -9,18 +22,116 @@ def fetch_protobuf_data_from_s3(bucket, key):
     protobuf_data = response['Body'].read()
     return protobuf_data
 
+
+def split_recordio(protobuf_data, records_per_request):
+    """
+    Splits a recordio-protobuf body into chunks of at most `records_per_request` records.
+
+    Only the recordio framing is walked, the protobuf records themselves are not decoded. A record
+    split over several frames (continuation flag 1 = first, 2 = middle, 3 = last part) counts once
+    and is never cut across chunks.
+    """
+    chunks, offset, chunk_start, n_records = [], 0, 0, 0
+    while offset < len(protobuf_data):
+        magic, header = struct.unpack_from('<II', protobuf_data, offset)
+        if magic != RECORDIO_MAGIC:
+            raise ValueError(f"Invalid recordio magic number at byte {offset}")
+        length, continuation = header & ((1 << 29) - 1), header >> 29
+        # Records are padded to a 4 byte boundary
+        offset += 8 + length + (-length % 4)
+        if continuation in (1, 2):
+            continue
+        n_records += 1
+        if n_records == records_per_request:
+            chunks.append(protobuf_data[chunk_start:offset])
+            chunk_start, n_records = offset, 0
+    if chunk_start < len(protobuf_data):
+        chunks.append(protobuf_data[chunk_start:])
+    return chunks
+
+
+class EndpointInvoker:
+    """
+    Reusable SageMaker endpoint client with a shared connection pool.
+
+    Large bodies are split by record count, fanned out over a bounded thread pool and
+    reassembled in order. Throttled requests are retried with jittered exponential backoff.
+    """
+    def __init__(self, endpoint_name, max_concurrency=8, records_per_request=500, max_retries=5,
+                 base_delay=0.05, max_delay=2.0, endpoint_url=None, client=None):
+        self.endpoint_name = endpoint_name
+        self.max_concurrency = max_concurrency
+        self.records_per_request = records_per_request
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # One client for all threads; botocore clients are thread safe and share the urllib3 pool
+        self.client = client or boto3.client(
+            'sagemaker-runtime',
+            endpoint_url=endpoint_url,
+            # Throttling is retried with backoff in invoke; botocore makes a single attempt per call
+            config=Config(max_pool_connections=max_concurrency, retries={'total_max_attempts': 1}),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def invoke(self, body):
+        """
+        Invokes the endpoint once, retrying throttled requests with full-jitter exponential backoff.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.invoke_endpoint(
+                    EndpointName=self.endpoint_name,
+                    ContentType='application/x-recordio-protobuf',
+                    Accept='application/json',
+                    Body=body
+                )
+                return response['Body'].read().decode()
+            except ClientError as e:
+                if e.response['Error']['Code'] not in RETRYABLE_ERROR_CODES or attempt == self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def predict(self, protobuf_data):
+        """
+        Scores a recordio-protobuf body of any size and returns the predictions in record order.
+        """
+        chunks = split_recordio(protobuf_data, self.records_per_request)
+        responses = self._executor.map(self.invoke, chunks)
+        predictions = []
+        for response in responses:
+            predictions.extend(json.loads(response)['predictions'])
+        return predictions
+
+    def load_test(self, body, n_requests=1000):
+        """
+        Sends `n_requests` copies of `body` with the configured concurrency and reports requests/second.
+        """
+        def timed_invoke(_):
+            started = time.perf_counter()
+            self.invoke(body)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = list(self._executor.map(timed_invoke, range(n_requests)))
+        return summarize_latencies(latencies, n_requests, time.perf_counter() - started)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+_default_invokers = {}
+
+
 def invoke_endpoint(endpoint_name, protobuf_data):
     """
     Invokes the specified SageMaker endpoint with the provided protobuf data.
     """
-    sagemaker_client = boto3.client('sagemaker-runtime')
-    response = sagemaker_client.invoke_endpoint(
-        EndpointName=endpoint_name,
-        ContentType='application/x-recordio-protobuf',
-        Body=protobuf_data
-    )
-    prediction = response['Body'].read().decode()
-    return prediction
+    if endpoint_name not in _default_invokers:
+        _default_invokers[endpoint_name] = EndpointInvoker(endpoint_name)
+    predictions = _default_invokers[endpoint_name].predict(protobuf_data)
+    return json.dumps({'predictions': predictions})
+
 
 def main():
     # Specify endpoint details
@@ -0,0 +1,424 @@
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import RESOURCE_DOES_NOT_EXIST
+from mlflow.tracking import MlflowClient
+
+SPOOL_ENV = 'MLFLOW_SPOOL_PATH'
+DEFAULT_SPOOL_PATH = '.mlflow_spool.jsonl'
+# Operations that failed permanently are kept here, next to the spool, for inspection
+REJECTED_SUFFIX = '.rejected'
+# log_batch request limits of the tracking server
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+# Errors that will fail again on retry; everything else (connection errors, 5xx) is spooled
+PERMANENT_ERROR_CODES = {
+    'INVALID_PARAMETER_VALUE', 'RESOURCE_DOES_NOT_EXIST', 'RESOURCE_ALREADY_EXISTS',
+    'BAD_REQUEST', 'INVALID_STATE', 'PERMISSION_DENIED', 'UNAUTHENTICATED',
+}
+_HANDLE_PREFIX = 'handle:'
+_STOP = object()
+
+
+def _is_permanent(error):
+    return isinstance(error, MlflowException) and error.error_code in PERMANENT_ERROR_CODES
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class RunHandle:
+    '''
+    Reference to a run created by AsyncTracker.start_run.
+
+    The run is created by the background thread, so its id is not known when the handle is
+    returned; everything logged through the handle is queued behind the creation.
+    Used as a context manager, the run is ended on exit (FAILED if an exception escaped).
+    '''
+    def __init__(self, tracker, ref):
+        self._tracker = tracker
+        self.ref = ref
+
+    @property
+    def run_id(self):
+        '''The MLflow run id, or None while the run has not been created yet.'''
+        return self._tracker.resolve(self.ref)
+
+    def log_params(self, params):
+        self._tracker.log_params(params, run=self)
+
+    def log_metric(self, key, value, step=None):
+        self._tracker.log_metrics({key: value}, step=step, run=self)
+
+    def log_metrics(self, metrics, step=None):
+        self._tracker.log_metrics(metrics, step=step, run=self)
+
+    def set_tags(self, tags):
+        self._tracker.set_tags(tags, run=self)
+
+    def end(self, status='FINISHED'):
+        self._tracker.end_run(self, status)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end('FAILED' if exc_type else 'FINISHED')
+
+
+class AsyncTracker:
+    '''
+    Non-blocking MLflow logging facade.
+
+    Params, metrics, tags and run lifecycle calls are put on a queue and sent by a background
+    thread. Everything that piles up while a request is in flight is merged per run into
+    `log_batch` calls, so a slow tracking server lowers the number of requests instead of
+    stalling training. When the server cannot be reached the operations are appended to a
+    local spool file (with their original timestamps) and replayed in order once it is back,
+    either by this process or by the next one that uses the same spool file.
+
+    Args:
+        tracking_uri (str, optional): Tracking server, defaults to mlflow.get_tracking_uri().
+        spool_path (str, optional): Spool file, defaults to $MLFLOW_SPOOL_PATH or .mlflow_spool.jsonl.
+        retry_interval (float): Seconds between replay attempts while the server is down.
+    '''
+    def __init__(self, tracking_uri=None, spool_path=None, retry_interval=30.0):
+        self.tracking_uri = tracking_uri or mlflow.get_tracking_uri()
+        self.spool_path = spool_path or os.getenv(SPOOL_ENV, DEFAULT_SPOOL_PATH)
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue()
+        self._client = None
+        self._run_ids = {}
+        self._offline = False
+        self._retry_at = 0.0
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --- Caller side ---------------------------------------------------------------------------
+
+    def _ref(self, run):
+        if run is None:
+            # Same semantics as the fluent mlflow.log_* calls: log to the active run, starting one if needed
+            active = mlflow.active_run() or mlflow.start_run()
+            return active.info.run_id
+        return run.ref if isinstance(run, RunHandle) else run
+
+    def _put(self, op):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, name='mlflow-async-tracker', daemon=True)
+                    self._thread.start()
+        with self._pending_cond:
+            self._pending += 1
+        self._queue.put(op)
+
+    def log_params(self, params, run=None):
+        self._put({'op': 'log', 'run': self._ref(run), 'params': {k: str(v) for k, v in params.items()}})
+
+    def log_metric(self, key, value, step=None, run=None):
+        self.log_metrics({key: value}, step=step, run=run)
+
+    def log_metrics(self, metrics, step=None, run=None):
+        timestamp = _now_ms()
+        self._put({'op': 'log', 'run': self._ref(run),
+                   'metrics': [[k, float(v), timestamp, step or 0] for k, v in metrics.items()]})
+
+    def set_tags(self, tags, run=None):
+        self._put({'op': 'log', 'run': self._ref(run), 'tags': {k: str(v) for k, v in tags.items()}})
+
+    def start_run(self, run_name=None, experiment_name=None, experiment_id=None, tags=None, parent=None, nested=True):
+        '''
+        Queue the creation of a run and return its handle immediately.
+
+        Args:
+            run_name (str, optional): Run name.
+            experiment_name (str, optional): Experiment, created if missing.
+            experiment_id (str, optional): Experiment id, used when no name is given.
+            tags (dict, optional): Initial tags.
+            parent (RunHandle or str, optional): Parent run, defaults to the active run when nested.
+            nested (bool): Attach the run to the active run when no parent is given.
+
+        Returns:
+            RunHandle: Handle to log to; the run is created in the background.
+        '''
+        if parent is None and nested and mlflow.active_run() is not None:
+            parent = mlflow.active_run().info.run_id
+        handle = RunHandle(self, _HANDLE_PREFIX + uuid.uuid4().hex)
+        self._put({
+            'op': 'create', 'handle': handle.ref, 'run_name': run_name,
+            'experiment_name': experiment_name, 'experiment_id': experiment_id,
+            'parent': self._ref(parent) if parent is not None else None,
+            'tags': {k: str(v) for k, v in (tags or {}).items()}, 'start_time': _now_ms(),
+        })
+        return handle
+
+    def end_run(self, run, status='FINISHED'):
+        self._put({'op': 'end', 'run': self._ref(run), 'status': status, 'end_time': _now_ms()})
+
+    def resolve(self, ref):
+        return self._run_ids.get(ref) if ref.startswith(_HANDLE_PREFIX) else ref
+
+    def flush(self, timeout=None):
+        '''
+        Wait until everything queued so far has been sent or spooled.
+
+        Returns:
+            bool: False if the timeout expired first.
+        '''
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=10.0):
+        '''
+        Flush and stop the background thread. Operations still queued after the timeout are spooled.
+        '''
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Stuck on an unresponsive server: keep what has not been picked up yet for a later replay
+            leftover = []
+            while True:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is not _STOP:
+                    leftover.append(op)
+            self._spool(leftover)
+            print(f"MLflow tracking server did not respond, {len(leftover)} operations spooled to {self.spool_path}")
+        self._thread = None
+
+    # --- Background thread ---------------------------------------------------------------------
+
+    def _worker(self):
+        self._client = MlflowClient(self.tracking_uri)
+        if os.path.exists(self.spool_path):
+            self._replay()
+        while True:
+            try:
+                ops = [self._queue.get(timeout=self.retry_interval if self._offline else None)]
+            except queue.Empty:
+                ops = []
+            while True:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(op is _STOP for op in ops)
+            ops = [op for op in ops if op is not _STOP]
+
+            if self._offline and time.monotonic() >= self._retry_at:
+                self._replay()
+            try:
+                self._process(ops)
+            finally:
+                with self._pending_cond:
+                    self._pending -= len(ops)
+                    self._pending_cond.notify_all()
+            if stop:
+                return
+
+    def _process(self, ops):
+        # Merge consecutive log calls per run into one batch; create/end keep their position
+        batches = {}
+        for op in ops:
+            if op['op'] == 'log':
+                batch = batches.setdefault(op['run'], {'op': 'log', 'run': op['run'], 'metrics': [],
+                                                       'params': {}, 'tags': {}})
+                batch['metrics'].extend(op.get('metrics', ()))
+                batch['params'].update(op.get('params', {}))
+                batch['tags'].update(op.get('tags', {}))
+                continue
+            if op['op'] == 'end' and op['run'] in batches:
+                self._send(batches.pop(op['run']))
+            self._send(op)
+        for batch in batches.values():
+            self._send(batch)
+
+    def _send(self, op):
+        if self._offline:
+            self._spool([op])
+            return
+        try:
+            self._apply(op)
+        except Exception as e:
+            if _is_permanent(e):
+                self._reject(op, e)
+                return
+            print(f"MLflow tracking server unavailable, spooling to {self.spool_path}: {e}")
+            self._offline = True
+            self._retry_at = time.monotonic() + self.retry_interval
+            self._spool([op])
+
+    def _apply(self, op):
+        client = self._client
+        if op['op'] == 'create':
+            experiment_id = op['experiment_id']
+            if op['experiment_name']:
+                experiment = client.get_experiment_by_name(op['experiment_name'])
+                experiment_id = (experiment.experiment_id if experiment
+                                 else client.create_experiment(op['experiment_name']))
+            tags = dict(op['tags'])
+            if op['parent']:
+                parent_id = self.resolve(op['parent'])
+                if parent_id is None:
+                    raise MlflowException(f"Parent run {op['parent']} was never created",
+                                          error_code=RESOURCE_DOES_NOT_EXIST)
+                tags['mlflow.parentRunId'] = parent_id
+                if experiment_id is None:
+                    experiment_id = client.get_run(parent_id).info.experiment_id
+            run = client.create_run(experiment_id or '0', start_time=op['start_time'], tags=tags,
+                                    run_name=op['run_name'])
+            self._run_ids[op['handle']] = run.info.run_id
+            return
+
+        run_id = self.resolve(op['run'])
+        if run_id is None:
+            raise MlflowException(f"Run {op['run']} was never created", error_code=RESOURCE_DOES_NOT_EXIST)
+        if op['op'] == 'end':
+            client.set_terminated(run_id, op['status'], end_time=op['end_time'])
+            return
+
+        metrics = [Metric(key, value, timestamp, step) for key, value, timestamp, step in op.get('metrics', ())]
+        params = [Param(key, value) for key, value in op.get('params', {}).items()]
+        tags = [RunTag(key, value) for key, value in op.get('tags', {}).items()]
+        while metrics or params or tags:
+            client.log_batch(run_id, metrics=metrics[:MAX_METRICS_PER_BATCH],
+                             params=params[:MAX_PARAMS_PER_BATCH], tags=tags[:MAX_TAGS_PER_BATCH])
+            metrics = metrics[MAX_METRICS_PER_BATCH:]
+            params = params[MAX_PARAMS_PER_BATCH:]
+            tags = tags[MAX_TAGS_PER_BATCH:]
+
+    # --- Spool ---------------------------------------------------------------------------------
+
+    @contextmanager
+    def _locked_spool(self):
+        # Serialize spool access between threads and between processes sharing the file
+        with self._spool_lock, open(self.spool_path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spool(self, ops):
+        if not ops:
+            return
+        with self._locked_spool(), open(self.spool_path, 'a') as f:
+            for op in ops:
+                # Handles only mean something to this process; spool the run ids already known
+                f.write(json.dumps({'tracking_uri': self.tracking_uri, **self._resolved(op)}) + '\n')
+
+    def _reject(self, op, error):
+        print(f"Setting aside MLflow {op['op']} operation in {self.spool_path + REJECTED_SUFFIX}: {error}")
+        with open(self.spool_path + REJECTED_SUFFIX, 'a') as f:
+            f.write(json.dumps({'tracking_uri': self.tracking_uri, 'error': str(error), **self._resolved(op)}) + '\n')
+
+    def _resolved(self, op):
+        # Replace handles of runs that have been created with their run ids
+        op = dict(op)
+        for key in ('run', 'parent'):
+            if op.get(key) and self.resolve(op[key]):
+                op[key] = self.resolve(op[key])
+        return op
+
+    def _replay(self):
+        '''
+        Send spooled operations for this tracking server in order. Stops at the first
+        connection failure and keeps the rest of the file for the next attempt.
+        '''
+        with self._locked_spool():
+            if not os.path.exists(self.spool_path):
+                self._offline = False
+                return
+            with open(self.spool_path) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+
+            remaining, failed = [], False
+            for record in records:
+                if failed or record.get('tracking_uri') != self.tracking_uri:
+                    remaining.append(record)
+                    continue
+                op = {k: v for k, v in record.items() if k != 'tracking_uri'}
+                try:
+                    self._apply(op)
+                except Exception as e:
+                    if _is_permanent(e):
+                        # Would fail on every replay; set it aside so the operations behind it are not blocked
+                        self._reject(op, e)
+                        continue
+                    failed = True
+                    remaining.append(record)
+
+            if remaining:
+                tmp_path = self.spool_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    for record in remaining:
+                        f.write(json.dumps(self._resolved(record)) + '\n')
+                os.replace(tmp_path, self.spool_path)
+            else:
+                os.remove(self.spool_path)
+
+            self._offline = failed
+            if failed:
+                self._retry_at = time.monotonic() + self.retry_interval
+            else:
+                print(f"Replayed spooled MLflow operations from {self.spool_path}")
+
+
+_default_tracker = None
+_default_lock = threading.Lock()
+
+
+def get_tracker():
+    '''
+    Return the process-wide AsyncTracker, flushed when the interpreter exits.
+    '''
+    global _default_tracker
+    if _default_tracker is None:
+        with _default_lock:
+            if _default_tracker is None:
+                _default_tracker = AsyncTracker()
+                atexit.register(_default_tracker.close)
+    return _default_tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay MLflow operations spooled while the tracking server was down.')
+    parser.add_argument('--tracking-uri', default=os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5000'))
+    parser.add_argument('--spool', default=os.getenv(SPOOL_ENV, DEFAULT_SPOOL_PATH))
+    args = parser.parse_args()
+
+    tracker = AsyncTracker(args.tracking_uri, args.spool)
+    tracker._client = MlflowClient(args.tracking_uri)
+    tracker._replay()
+    return 1 if os.path.exists(args.spool) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
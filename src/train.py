@@ -12,6 +12,7 @@ from sagemaker.session import s3_input
 from sagemaker.estimator import Estimator
 import sagemaker.amazon.common as smac
 import time
+from src.fm_engine import FactorizationMachineEngine
 
 
 class MovieRecommendationFlowSageMaker:
@@ -117,8 +118,15 @@ class MovieRecommendationFlowSageMaker:
 
         # Fit the estimator
         estimator.fit({'train': train_records})
+        return estimator.model_data
 
 
+    @staticmethod
+    def score_offline(model_artifact, X, batch_size=65536):
+        # Score locally from the trained artifact instead of one endpoint round trip per request
+        engine = FactorizationMachineEngine.from_artifact(model_artifact)
+        return engine.predict(X, batch_size=batch_size)
+
 
     @classmethod
     def main_flow(cls):
@@ -156,6 +164,8 @@ class MovieRecommendationFlowSageMaker:
             hyperparameters=hyperparameters,
             X_train=train_data
         )
+        test_scores = MovieRecommendationFlowSageMaker.score_offline(model_artifact_task, X_test)
+        print("Offline test accuracy:", accuracy_score(y_test, (test_scores > 0.5).astype('float32')))
         # Load the SageMaker Predictor
         predictor = sagemaker.predictor.Predictor(
         endpoint_name="movie-recommender-endpoint-config",
@@ -0,0 +1,105 @@
+"""
+Module: recommend_function.py
+
+This module contains a cold-start-optimized Lambda handler serving collaborative filtering recommendations.
+
+The model is the compact export written by `src/compact_model.py`, and the handler loads and scores it
+with that same module, which is packaged next to this file (`src/__init__.py` and `src/compact_model.py`
+in the deployment zip). NumPy is imported lazily on the first invocation, the arrays are memory-mapped
+and the loaded model is cached at module scope for warm invocations.
+"""
+
+import os
+import time
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+TMP_MODEL_DIR = '/tmp/compact_model'
+
+_STATE = {}
+
+
+def _download_model(s3_uri, target_dir, array_names):
+    """
+    Download the compact model files under an S3 prefix into `target_dir` (once per container).
+    """
+    import boto3  # pylint: disable=import-outside-toplevel
+
+    bucket, prefix = s3_uri[len('s3://'):].split('/', 1)
+    s3 = boto3.client('s3')
+    os.makedirs(target_dir, exist_ok=True)
+    for name in ['meta.json'] + [f'{array}.npy' for array in array_names]:
+        s3.download_file(bucket, f"{prefix.rstrip('/')}/{name}", os.path.join(target_dir, name))
+    return target_dir
+
+
+def _resolve_model_dir(array_names):
+    """
+    Resolve the model directory: MODEL_DIR, else a /tmp copy of MODEL_S3_URI, else the packaged model.
+    """
+    if os.environ.get('MODEL_DIR'):
+        return os.environ['MODEL_DIR']
+    if os.environ.get('MODEL_S3_URI'):
+        if not os.path.exists(os.path.join(TMP_MODEL_DIR, 'meta.json')):
+            _download_model(os.environ['MODEL_S3_URI'], TMP_MODEL_DIR, array_names)
+        return TMP_MODEL_DIR
+    return DEFAULT_MODEL_DIR
+
+
+def _init():
+    """
+    Import the compact model module (and NumPy) and memory-map the model, timing both against the INIT_BUDGET_MS budget.
+    """
+    started = time.perf_counter()
+    from src.compact_model import ARRAY_NAMES, CompactCFModel  # pylint: disable=import-outside-toplevel
+    imported = time.perf_counter()
+
+    model = CompactCFModel.load(_resolve_model_dir(ARRAY_NAMES))
+    loaded = time.perf_counter()
+
+    timings = {
+        'import_ms': (imported - started) * 1000,
+        'model_load_ms': (loaded - imported) * 1000,
+        'init_ms': (loaded - started) * 1000,
+        'budget_ms': float(os.environ.get('INIT_BUDGET_MS', 1000)),
+    }
+    timings['within_budget'] = timings['init_ms'] <= timings['budget_ms']
+    if not timings['within_budget']:
+        print(f"Init took {timings['init_ms']:.1f} ms, over the {timings['budget_ms']:.0f} ms budget")
+
+    _STATE.update(model=model, timings=timings)
+
+
+def _recommend(user_ids, top_n, exclude_seen):
+    """
+    Top items per user from CompactCFModel.recommend, as JSON-serializable lists.
+    """
+    recommendations = _STATE['model'].recommend(user_ids, top_n=top_n, exclude_seen=exclude_seen)
+    return [{'user_id': user_id, 'items': items.tolist(), 'scores': scores.tolist()}
+            for user_id, (items, scores) in zip(user_ids, recommendations)]
+
+
+def lambda_handler(event, context):
+    """
+    Lambda function handler returning top-N movie recommendations for a batch of users.
+
+    Parameters:
+        event (dict): The event data passed to the Lambda function.
+            It should contain 'user_ids' (list) or a single 'user_id', and optionally
+            'top_n' (default 10) and 'exclude_seen' (default True).
+        context (LambdaContext): The runtime information about the Lambda function invocation.
+
+    Returns:
+        dict: 'recommendations' with one entry per requested user (empty for unknown users),
+              'cold_start' telling whether this invocation initialized the container, and
+              'timings' with import, model load and request times in milliseconds.
+    """
+    started = time.perf_counter()
+    cold_start = 'model' not in _STATE
+    if cold_start:
+        _init()
+
+    user_ids = event['user_ids'] if 'user_ids' in event else [event['user_id']]
+    recommendations = _recommend(user_ids, int(event.get('top_n', 10)), bool(event.get('exclude_seen', True)))
+
+    timings = dict(_STATE['timings'], request_ms=(time.perf_counter() - started) * 1000)
+    return {'recommendations': recommendations, 'cold_start': cold_start, 'timings': timings}